@@ -20,6 +20,7 @@ import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -27,6 +28,9 @@ import requests
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+sys.path.insert(0, str(Path(__file__).parent))
+from payload_cache import cached_parse
+
 # ─────────────────────────────────────────────
 # CONFIG
 # ─────────────────────────────────────────────
@@ -47,6 +51,7 @@ COMMODITIES = {
 BASE_DIR = Path(os.environ.get("AGRIMACRO_DATA_DIR", "data"))
 OUTPUT_DIR = BASE_DIR / "comexstat"
 CACHE_DIR = OUTPUT_DIR / "cache"
+PARSE_VERSION = 1   # subir ao mudar process_* (invalida cache/parsed/)
 
 # Logging
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
@@ -302,11 +307,14 @@ def collect(year=None, months_back=12):
     all_headings = [info["heading"] for info in COMMODITIES.values()]
 
     try:
-        # Call 1: Monthly totals (with month detail, no country breakdown)
-        monthly_raw = fetch_monthly_totals(all_headings, period_from, period_to)
-
-        # Call 2: Annual by country (no month detail, with country breakdown)
-        country_raw = fetch_by_country(all_headings, period_from, period_to)
+        # As duas chamadas sao independentes: em paralelo
+        #   1: totais mensais (com mes, sem pais)
+        #   2: anual por pais (sem mes, com pais)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            monthly_job = pool.submit(fetch_monthly_totals, all_headings, period_from, period_to)
+            country_job = pool.submit(fetch_by_country, all_headings, period_from, period_to)
+        monthly_raw = monthly_job.result()
+        country_raw = country_job.result()
 
     except Exception as e:
         logger.error(f"API error: {e}")
@@ -318,9 +326,17 @@ def collect(year=None, months_back=12):
             return cached
         return {"source": "comexstat", "status": "error", "error": str(e), "data": {}}
 
-    # Process
-    monthly_data = process_monthly(monthly_raw)
-    country_data = process_by_country(country_raw)
+    # Process (reaproveita o processamento anterior se a API devolveu o mesmo payload)
+    processed, hit = cached_parse(
+        CACHE_DIR, f"comexstat_{period_from}_{period_to}",
+        {"monthly": monthly_raw, "by_country": country_raw},
+        lambda raw: {"monthly": process_monthly(raw["monthly"]),
+                     "by_country": process_by_country(raw["by_country"])},
+        PARSE_VERSION)
+    if hit:
+        logger.info("API payload unchanged, reusing processed cache")
+    monthly_data = processed["monthly"]
+    country_data = processed["by_country"]
     current_year = year or now.year
     ytd = compute_ytd(monthly_data, current_year)
     totals = compute_totals(monthly_data, country_data)
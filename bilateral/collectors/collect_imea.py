@@ -11,8 +11,10 @@ Dados extraídos dos Boletins Semanais (PDF):
   - Dólar PTAX
   - Estimativas de safra (área, produtividade, produção)
 
-Estratégia: busca o boletim mais recente por número incremental,
-baixa o PDF, extrai texto com pdfplumber, parseia com regex.
+Estratégia: busca o boletim mais recente por número incremental
+(sondagem em paralelo a partir do último número em cache), baixa o PDF,
+extrai texto com pdfplumber, parseia com regex. PDF com o mesmo hash da
+coleta anterior reaproveita o parse (cache/parsed/).
 
 Principio: ZERO MOCK — apenas dados reais do IMEA
 """
@@ -22,6 +24,7 @@ import logging
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
@@ -36,6 +39,9 @@ except ImportError:
     print("ERROR: pdfplumber required. Run: pip install pdfplumber")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).parent))
+from payload_cache import cached_parse
+
 # ─────────────────────────────────────────────
 # CONFIG
 # ─────────────────────────────────────────────
@@ -60,6 +66,9 @@ OUTPUT_DIR = BASE_DIR / "imea"
 CACHE_DIR = OUTPUT_DIR / "cache"
 PDF_DIR = OUTPUT_DIR / "pdfs"
 
+PROBE_WORKERS = 8   # HEADs simultaneos por janela de busca
+PARSE_VERSION = 1   # subir ao mudar parse_boletim_* (invalida cache/parsed/)
+
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger("collect_imea")
@@ -69,47 +78,45 @@ logger = logging.getLogger("collect_imea")
 # PDF DOWNLOAD & TEXT EXTRACTION
 # ─────────────────────────────────────────────
 
+def _probe(slug, n):
+    """(n, url) se o boletim n existe, senão None."""
+    url = f"{BASE_PUB_URL}/{slug}/{n}"
+    try:
+        resp = requests.head(url, timeout=10, allow_redirects=True, verify=False)
+    except Exception:
+        return None
+    if resp.status_code != 200:
+        return None
+    final_url = resp.url
+    return n, (final_url if ".pdf" in final_url or "s3" in final_url else url)
+
+
 def find_latest_number(slug, start_from, max_search=40):
     """
-    Search for the latest boletim by trying numbers from start_from upward.
+    Search for the latest boletim from start_from (last known number) upward.
+    Probes windows of PROBE_WORKERS numbers concurrently and stops at the
+    first window with no hit once a report was found. Numbers are shared
+    across report types, so a single 404 does not mean "past the latest"
+    (which also rules out a plain binary search). Falls back to going down.
     Returns (number, pdf_url) or (None, None) if not found.
     """
-    # First try going up from known number
-    best_num = None
-    best_url = None
-
-    for n in range(start_from, start_from + max_search):
-        url = f"{BASE_PUB_URL}/{slug}/{n}"
-        try:
-            resp = requests.head(url, timeout=10, allow_redirects=True, verify=False)
-            if resp.status_code == 200:
-                final_url = resp.url
-                if ".pdf" in final_url or "s3" in final_url:
-                    best_num = n
-                    best_url = final_url
-                else:
-                    best_num = n
-                    best_url = url
-            elif resp.status_code == 404 and best_num is not None:
-                # We've gone past the latest
+    best = None
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+        for lo in range(start_from, start_from + max_search, PROBE_WORKERS):
+            window = range(lo, min(lo + PROBE_WORKERS, start_from + max_search))
+            hits = [h for h in pool.map(lambda n: _probe(slug, n), window) if h]
+            if hits:
+                best = max(hits)
+            elif best is not None:
                 break
-        except Exception:
-            continue
 
-    if best_num is None:
-        # Try going down from known number
-        for n in range(start_from - 1, start_from - 20, -1):
-            url = f"{BASE_PUB_URL}/{slug}/{n}"
-            try:
-                resp = requests.head(url, timeout=10, allow_redirects=True, verify=False)
-                if resp.status_code == 200:
-                    best_num = n
-                    best_url = resp.url if ".pdf" in resp.url or "s3" in resp.url else url
-                    break
-            except Exception:
-                continue
+        if best is None:
+            # Try going down from known number
+            below = range(start_from - 1, start_from - 20, -1)
+            hits = [h for h in pool.map(lambda n: _probe(slug, n), below) if h]
+            best = max(hits) if hits else None
 
-    return best_num, best_url
+    return best if best else (None, None)
 
 
 def download_pdf(url, save_path=None, timeout=30):
@@ -397,57 +404,66 @@ def collect(report_types=None, save_pdfs=True):
         "bs_milho": parse_boletim_milho,
     }
 
-    parsed = {}
-    errors = {}
+    # Ultimo numero coletado de cada tipo: ponto de partida da busca
+    last = {k: v.get("report_number")
+            for k, v in (load_cache().get("data") or {}).items() if isinstance(v, dict)}
+
+    def parse_pdf(key, pdf_bytes):
+        text = extract_text(pdf_bytes)
+        if not text or len(text) < 100:
+            raise ValueError(f"PDF text extraction failed (got {len(text)} chars)")
+        logger.info(f"  {key}: extracted {len(text)} chars of text")
+        return parsers[key](text)
 
-    for key in report_types:
-        if key not in REPORT_TYPES:
-            continue
+    def fetch(key):
         info = REPORT_TYPES[key]
         slug = info["slug"]
-        label = info["label"]
-        start = KNOWN_NUMBERS.get(key, 860)
+        start = max(KNOWN_NUMBERS.get(key, 860), last.get(key) or 0)
 
-        logger.info(f"Processing {key}: {label}")
+        logger.info(f"Processing {key}: {info['label']}")
         logger.info(f"  Searching for latest report (starting from #{start})...")
 
-        try:
-            num, pdf_url = find_latest_number(slug, start)
-            if num is None:
-                logger.warning(f"  Could not find any report for {slug}")
-                errors[key] = "No report found"
-                continue
-
-            logger.info(f"  Found: #{num}")
-
-            # Download PDF
-            page_url = f"{BASE_PUB_URL}/{slug}/{num}"
+        num, pdf_url = find_latest_number(slug, start)
+        if num is None:
+            raise LookupError("No report found")
+        logger.info(f"  {key}: found #{num}")
+
+        # Boletim numerado nao muda: se ja temos o PDF, nao baixa de novo
+        page_url = f"{BASE_PUB_URL}/{slug}/{num}"
+        pdf_path = PDF_DIR / f"{slug}_{num}.pdf"
+        if pdf_path.exists() and pdf_path.stat().st_size > 0:
+            pdf_bytes = pdf_path.read_bytes()
+            logger.info(f"  Using saved PDF: {pdf_path}")
+        else:
             resp = requests.get(page_url, timeout=30, allow_redirects=True, verify=False)
             resp.raise_for_status()
-
             pdf_bytes = resp.content
-            pdf_path = PDF_DIR / f"{slug}_{num}.pdf" if save_pdfs else None
-            if pdf_path:
+            if save_pdfs:
                 pdf_path.parent.mkdir(parents=True, exist_ok=True)
                 with open(pdf_path, "wb") as f:
                     f.write(pdf_bytes)
                 logger.info(f"  Saved PDF: {pdf_path}")
 
-            # Extract text
-            text = extract_text(pdf_bytes)
-            if not text or len(text) < 100:
-                logger.warning(f"  Could not extract text from PDF (got {len(text)} chars)")
-                errors[key] = "PDF text extraction failed"
-                continue
-
-            logger.info(f"  Extracted {len(text)} chars of text")
+        data, hit = cached_parse(CACHE_DIR, key, pdf_bytes,
+                                 lambda b: parse_pdf(key, b), PARSE_VERSION)
+        if hit:
+            logger.info(f"  {key}: PDF unchanged, reusing parsed cache")
+        data["source_url"] = page_url
+        data["report_number"] = num
+        return data
 
-            # Parse
-            data = parsers[key](text)
-            data["source_url"] = page_url
-            data["report_number"] = num
-            parsed[key] = data
+    parsed = {}
+    errors = {}
 
+    keys = [k for k in report_types if k in REPORT_TYPES]
+    with ThreadPoolExecutor(max_workers=max(len(keys), 1)) as pool:
+        futures = {key: pool.submit(fetch, key) for key in keys}
+    for key, fut in futures.items():
+        try:
+            parsed[key] = fut.result()
+        except LookupError as e:
+            logger.warning(f"  Could not find any report for {REPORT_TYPES[key]['slug']}")
+            errors[key] = str(e)
         except Exception as e:
             logger.error(f"  Error on {key}: {e}")
             errors[key] = str(e)
@@ -20,6 +20,7 @@ import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
@@ -34,6 +35,9 @@ except ImportError:
     print("ERROR: openpyxl required. Run: pip install openpyxl")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).parent))
+from payload_cache import cached_parse
+
 # ─────────────────────────────────────────────
 # CONFIG
 # ─────────────────────────────────────────────
@@ -73,6 +77,9 @@ OUTPUT_DIR = BASE_DIR / "usda_brazil_transport"
 CACHE_DIR = OUTPUT_DIR / "cache"
 RAW_DIR = OUTPUT_DIR / "raw_xlsx"
 
+DOWNLOAD_WORKERS = 5
+PARSE_VERSION = 2   # subir ao mudar parse_* (invalida cache/parsed/)
+
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger("collect_usda_brazil")
@@ -94,16 +101,25 @@ def download_xlsx(url, save_path=None, timeout=60):
     return resp.content
 
 
+def iter_sheet(content, sheet_ref, min_row=1, max_col=None):
+    """
+    Stream one sheet (values only) in read-only mode. sheet_ref can be name
+    (str) or index (int). reset_dimensions(): read-only trusts the
+    <dimension> tag, unreliable in these workbooks. max_col pads/trims rows
+    to the columns the parser uses.
+    """
+    wb = openpyxl.load_workbook(BytesIO(content), read_only=True, data_only=True)
+    try:
+        ws = wb[wb.sheetnames[sheet_ref]] if isinstance(sheet_ref, int) else wb[sheet_ref]
+        ws.reset_dimensions()
+        yield from ws.iter_rows(min_row=min_row, max_col=max_col, values_only=True)
+    finally:
+        wb.close()
+
+
 def open_sheet(content, sheet_ref):
-    """Open xlsx sheet. sheet_ref can be name (str) or index (int)."""
-    wb = openpyxl.load_workbook(BytesIO(content), data_only=True)
-    if isinstance(sheet_ref, int):
-        ws = wb[wb.sheetnames[sheet_ref]]
-    else:
-        ws = wb[sheet_ref]
-    rows = list(ws.iter_rows(values_only=True))
-    wb.close()
-    return rows
+    """Whole sheet as a list (parsers that look ahead across rows)."""
+    return list(iter_sheet(content, sheet_ref))
 
 
 def _j(val):
@@ -245,17 +261,10 @@ def parse_ocean_freight(content):
       Row: Rio Grande | China (Shanghai) | values...
       (+ São Luís, Barcarena, Santarém in later years)
     """
-    rows = open_sheet(content, "Table 9")
-    
     records = []
     current_year = None
     
-    i = 0
-    while i < len(rows):
-        row = rows[i]
-        if not row or len(row) < 8:
-            i += 1
-            continue
+    for row in iter_sheet(content, "Table 9", max_col=8):
         
         # Detect header row: contains "Port" and quarter labels
         if row[1] and str(row[1]).strip() == "Port":
@@ -272,7 +281,6 @@ def parse_ocean_freight(content):
                             pass
                 if current_year:
                     break
-            i += 1
             continue
         
         # Data row: port name in col 1, destination in col 2
@@ -294,8 +302,6 @@ def parse_ocean_freight(content):
                 "avg_usd_mt": _j(row[7]) if len(row) > 7 else None,
             }
             records.append(rec)
-        
-        i += 1
     
     logger.info(f"  Ocean freight: {len(records)} port-destination-year records")
     
@@ -319,12 +325,8 @@ def parse_truck_index(content):
       Row 5: headers (MONTH, Freight price US$/mt/100mi, Index variation %, Index value)
       Row 6+: monthly data from 2003
     """
-    rows = open_sheet(content, "Table 8")
-    
     records = []
-    for row in rows[6:]:
-        if not row or len(row) < 3:
-            continue
+    for row in iter_sheet(content, "Table 8", min_row=7, max_col=5):
         date_val = row[1]
         if not isinstance(date_val, datetime):
             continue
@@ -355,12 +357,8 @@ def parse_truck_routes(content):
       Row 2: sub-headers (1st qtr, 2nd qtr, 3rd qtr, 4th qtr)
       Row 3+: route data
     """
-    rows = open_sheet(content, "Table 7")
-    
     records = []
-    for row in rows[3:]:
-        if not row or len(row) < 10:
-            continue
+    for row in iter_sheet(content, "Table 7", min_row=4, max_col=10):
         route_num = row[1]
         if not isinstance(route_num, (int, float)):
             continue
@@ -467,15 +465,22 @@ def collect(datasets=None, save_raw=True):
     parsed = {}
     errors = {}
     
-    for key in datasets:
-        if key not in DATASETS:
-            continue
+    def fetch(key):
         info = DATASETS[key]
         logger.info(f"Processing {key}: {info['label']}")
+        raw_path = RAW_DIR / f"{key}.xlsx" if save_raw else None
+        content = download_xlsx(info["url"], save_path=raw_path)
+        data, hit = cached_parse(CACHE_DIR, key, content, parsers[key], PARSE_VERSION)
+        if hit:
+            logger.info(f"  {key}: workbook unchanged, reusing parsed cache")
+        return data
+
+    keys = [k for k in datasets if k in DATASETS]
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {key: pool.submit(fetch, key) for key in keys}
+    for key, fut in futures.items():
         try:
-            raw_path = RAW_DIR / f"{key}.xlsx" if save_raw else None
-            content = download_xlsx(info["url"], save_path=raw_path)
-            parsed[key] = parsers[key](content)
+            parsed[key] = fut.result()
         except Exception as e:
             logger.error(f"  Error on {key}: {e}")
             errors[key] = str(e)
@@ -19,6 +19,7 @@ import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
@@ -33,6 +34,9 @@ except ImportError:
     print("ERROR: openpyxl required. Run: pip install openpyxl")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).parent))
+from payload_cache import cached_parse
+
 # ─────────────────────────────────────────────
 # CONFIG
 # ─────────────────────────────────────────────
@@ -55,6 +59,9 @@ OUTPUT_DIR = BASE_DIR / "usda_gtr"
 CACHE_DIR = OUTPUT_DIR / "cache"
 RAW_DIR = OUTPUT_DIR / "raw_xlsx"
 
+DOWNLOAD_WORKERS = 4
+PARSE_VERSION = 2   # subir ao mudar parse_table* (invalida cache/parsed/)
+
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger("collect_usda_gtr")
@@ -76,13 +83,20 @@ def download_xlsx(url, save_path=None, timeout=60):
     return resp.content
 
 
-def open_sheet(content, sheet_name):
-    """Open xlsx with read_only=False (required for correct parsing)."""
-    wb = openpyxl.load_workbook(BytesIO(content), data_only=True)
-    ws = wb[sheet_name]
-    rows = list(ws.iter_rows(values_only=True))
-    wb.close()
-    return rows
+def iter_sheet(content, sheet_name, min_row=1, max_col=None):
+    """
+    Stream one sheet (values only) in read-only mode: memory stays flat.
+    Read-only trusts the <dimension> tag, which is unreliable in these
+    workbooks (the reason a full load was used before) -- reset_dimensions()
+    makes it read every row. max_col pads/trims rows to the columns used.
+    """
+    wb = openpyxl.load_workbook(BytesIO(content), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        ws.reset_dimensions()
+        yield from ws.iter_rows(min_row=min_row, max_col=max_col, values_only=True)
+    finally:
+        wb.close()
 
 
 def _j(val):
@@ -112,12 +126,8 @@ def parse_table1(content):
       Row 6: Date | Price | Rail | River | Gulf | PNW  (headers)
       Row 7+: weekly data from 2002-08-21
     """
-    rows = open_sheet(content, "Data")
-
     records = []
-    for row in rows[7:]:
-        if len(row) < 6:
-            continue
+    for row in iter_sheet(content, "Data", min_row=8, max_col=6):
         if not isinstance(row[0], datetime):
             continue
         rec = {
@@ -144,15 +154,10 @@ def parse_table2(content):
       Row 2+: data grouped in blocks of 5 per date
         Corn IL-Gulf, Corn NE-Gulf, Soybean IA-Gulf, HRW KS-Gulf, HRS ND-Portland
     """
-    rows = open_sheet(content, "Data")
-
     records = []
     current_date = None
 
-    for row in rows[2:]:
-        if len(row) < 6:
-            continue
-
+    for row in iter_sheet(content, "Data", min_row=3, max_col=6):
         if isinstance(row[0], datetime):
             current_date = row[0].strftime("%Y-%m-%d")
 
@@ -192,16 +197,15 @@ def parse_table7(content):
       Row 1: _ | Commodity | Railroad | Origin | Destination | Car Ownership | Tariff | Fuel surcharge
       Row 2+: current month snapshot (~40 routes)
     """
-    rows = open_sheet(content, "GTR Table 7")
-
-    title = str(rows[0][1]) if rows[0] and len(rows[0]) > 1 and rows[0][1] else ""
+    rows = iter_sheet(content, "GTR Table 7", max_col=8)
+    head = next(rows, (None, None))
+    title = str(head[1]) if head[1] else ""
+    next(rows, None)  # column headers
 
     records = []
     current_commodity = None
 
-    for row in rows[2:]:
-        if len(row) < 8:
-            continue
+    for row in rows:
         if all(row[i] is None for i in range(1, 8)):
             continue
 
@@ -233,18 +237,17 @@ def parse_table9(content):
       Row 0: headers (Week Ending, Corn_Lock 27, Corn_Lock 52, Corn_Lock 1, Corn_Total, ...)
       Row 1+: weekly data from 2003
     """
-    rows = open_sheet(content, "Socrata_Data")
+    rows = iter_sheet(content, "Socrata_Data")
 
-    headers = [str(h).strip() if h else f"col_{i}" for i, h in enumerate(rows[0])]
+    headers = [str(h).strip() if h else f"col_{i}" for i, h in enumerate(next(rows, ()))]
 
     records = []
-    for row in rows[1:]:
-        if not row[0] or not isinstance(row[0], datetime):
+    for row in rows:
+        if not row or not isinstance(row[0], datetime):
             continue
         rec = {"date": row[0].strftime("%Y-%m-%d")}
         for i, h in enumerate(headers[1:], 1):
-            if i < len(row):
-                rec[h] = _j(row[i])
+            rec[h] = _j(row[i]) if i < len(row) else None  # read-only rows end at the last filled cell
         records.append(rec)
 
     logger.info(f"  Table 9: {len(records)} weekly barge movement records")
@@ -317,15 +320,22 @@ def collect(tables=None, save_raw=True):
     parsed = {}
     errors = {}
 
-    for key in tables:
-        if key not in TABLES:
-            continue
+    def fetch(key):
         info = TABLES[key]
         logger.info(f"Processing {key}: {info['label']}")
+        raw_path = RAW_DIR / f"{key}.xlsx" if save_raw else None
+        content = download_xlsx(info["url"], save_path=raw_path)
+        data, hit = cached_parse(CACHE_DIR, key, content, parsers[key], PARSE_VERSION)
+        if hit:
+            logger.info(f"  {key}: workbook unchanged, reusing parsed cache")
+        return data
+
+    keys = [k for k in tables if k in TABLES]
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {key: pool.submit(fetch, key) for key in keys}
+    for key, fut in futures.items():
         try:
-            raw_path = RAW_DIR / f"{key}.xlsx" if save_raw else None
-            content = download_xlsx(info["url"], save_path=raw_path)
-            parsed[key] = parsers[key](content)
+            parsed[key] = fut.result()
         except Exception as e:
             logger.error(f"  Error on {key}: {e}")
             errors[key] = str(e)
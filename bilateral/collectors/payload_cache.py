@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+payload_cache.py — AgriMacro Intelligence
+Cache de parse por hash do payload bruto, usado pelos collectors bilaterais.
+
+Cada collector baixa o payload (XLSX, PDF, JSON da API) e chama
+cached_parse(): se o sha256 do conteudo e a versao do parser sao os mesmos
+da ultima coleta, devolve o resultado parseado em disco sem rodar o parser
+(pdfplumber/openpyxl sao a parte cara). Os GTR/USDA semanais mudam uma vez
+por semana; o resto dos runs vira download + hash.
+
+Layout: <CACHE_DIR do collector>/parsed/<chave>.json
+  {"hash": ..., "version": ..., "parsed_at": ..., "data": ...}
+
+Principio: ZERO MOCK — o cache so guarda o parse de um payload real ja baixado.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+def digest(content):
+    """sha256 (16 hex) de bytes, str ou objeto JSON-serializavel."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    elif not isinstance(content, (bytes, bytearray)):
+        content = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def _path(cache_dir, key):
+    return Path(cache_dir) / "parsed" / f"{key}.json"
+
+
+def load_parsed(cache_dir, key):
+    try:
+        with open(_path(cache_dir, key), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_parsed(cache_dir, key, content_hash, data, version=1):
+    path = _path(cache_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"hash": content_hash, "version": version,
+                   "parsed_at": datetime.now().isoformat(), "data": data},
+                  f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def cached_parse(cache_dir, key, content, parser, version=1):
+    """
+    (data, hit): parser(content) ou o parse anterior se o hash do payload e a
+    versao nao mudaram. Suba `version` ao mudar o parser para invalidar.
+    Resultado e gravado ja JSON-normalizado (datetime -> str), o mesmo que o
+    save_json dos collectors produziria.
+    """
+    h = digest(content)
+    prev = load_parsed(cache_dir, key)
+    if prev and prev.get("hash") == h and prev.get("version") == version:
+        return prev["data"], True
+    data = json.loads(json.dumps(parser(content), ensure_ascii=False, default=str))
+    save_parsed(cache_dir, key, h, data, version)
+    return data, False
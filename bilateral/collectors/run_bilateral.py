@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+run_bilateral.py — AgriMacro Intelligence
+Roda os 4 collectors bilaterais em paralelo e, depois que todos terminam,
+opcionalmente os indicadores bilaterais (que dependem deles).
+
+  IMEA                  boletins PDF (busca do número em paralelo)
+  USDA GTR              4 workbooks XLSX
+  USDA Brazil transport 5 workbooks XLSX
+  Comex Stat            2 chamadas à API
+
+As fontes não dependem umas das outras: cada collector roda numa thread e
+baixa seus payloads também em paralelo. Payload com o mesmo hash da coleta
+anterior não é reparseado (payload_cache.py).
+
+Uso:
+  python bilateral/collectors/run_bilateral.py
+  python bilateral/collectors/run_bilateral.py --sources imea comexstat
+  python bilateral/collectors/run_bilateral.py --indicators   # + generate_bilateral
+
+Principio: ZERO MOCK — só orquestra os collectors reais.
+"""
+
+import importlib
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+COLLECTORS_DIR = Path(__file__).parent
+PIPELINE_DIR = COLLECTORS_DIR.parent.parent / "pipeline"
+sys.path.insert(0, str(COLLECTORS_DIR))
+
+SOURCES = {
+    "imea": "collect_imea",
+    "usda_gtr": "collect_usda_gtr",
+    "usda_brazil_transport": "collect_usda_brazil_transport",
+    "comexstat": "collect_comexstat",
+}
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger("run_bilateral")
+
+
+def _load(name):
+    """Importa o collector; ImportError/SystemExit (dependência ausente) vira erro da fonte."""
+    try:
+        return importlib.import_module(SOURCES[name]), None
+    except SystemExit:
+        return None, "missing dependency (see message above)"
+    except Exception as e:
+        return None, f"import failed: {e}"
+
+
+def _run(name, module):
+    t0 = time.perf_counter()
+    try:
+        result = module.collect()
+        status = result.get("status", "error")
+        error = result.get("errors") or result.get("error")
+    except Exception as e:
+        status, error = "error", str(e)
+    return {"status": status, "error": error, "seconds": round(time.perf_counter() - t0, 1)}
+
+
+def run(sources=None):
+    """{fonte: {status, error, seconds}} com as fontes coletadas em paralelo."""
+    sources = [s for s in (sources or SOURCES) if s in SOURCES]
+    results, modules = {}, {}
+    # Import serial: mensagens de dependência ausente não se misturam
+    for name in sources:
+        modules[name], err = _load(name)
+        if err:
+            results[name] = {"status": "error", "error": err, "seconds": 0.0}
+
+    with ThreadPoolExecutor(max_workers=max(len(modules), 1)) as pool:
+        futures = {name: pool.submit(_run, name, mod) for name, mod in modules.items() if mod}
+    for name, fut in futures.items():
+        results[name] = fut.result()
+    return {name: results[name] for name in sources}
+
+
+def run_indicators():
+    """Indicadores bilaterais: só depois de todas as fontes terminarem."""
+    sys.path.insert(0, str(PIPELINE_DIR))
+    try:
+        from generate_bilateral import main as generate_bilateral
+    except SystemExit:
+        return 1
+    return generate_bilateral()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="AgriMacro - Bilateral collectors (parallel)")
+    parser.add_argument("--sources", nargs="+", default=None, choices=list(SOURCES.keys()))
+    parser.add_argument("--indicators", action="store_true",
+                        help="run generate_bilateral after collection")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    results = run(args.sources)
+
+    logger.info("=" * 60)
+    logger.info(f"BILATERAL COLLECTION - {time.perf_counter() - t0:.1f}s wall")
+    logger.info("=" * 60)
+    for name, r in results.items():
+        logger.info(f"  {name:.<28} {r['status']:<7} {r['seconds']:>6.1f}s"
+                    + (f"  {r['error']}" if r["error"] and r["status"] != "ok" else ""))
+    logger.info("=" * 60)
+
+    ok = all(r["status"] in ("ok", "cached") for r in results.values())
+    if args.indicators:
+        ok = run_indicators() == 0 and ok
+    sys.exit(0 if ok else 1)
@@ -398,14 +398,22 @@ def indicator_argentina_trilateral():
 # ============================================================
 # 8. DROUGHT ACCUMULATOR
 # ============================================================
+# Historico diario local (pipeline/weather_archive.py): chuva/GDD observados
+# da safra, anomalia vs normal 1991-2020 e veranicos -- sem chamada de API
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "pipeline"))
+try:
+    import weather_archive
+except ImportError:
+    weather_archive = None
+
 def indicator_drought_accumulator(weather):
     print("\n  [8/9] Drought Accumulator...")
-    REGIONS = {
-        "cerrado_soja":  {"name": "Soja Cerrado (MT/GO)", "pm": 10, "norm": 1200},
-        "sul_soja":      {"name": "Soja Sul (PR/RS)",     "pm": 10, "norm": 1000},
-        "cornbelt_corn": {"name": "Milho Corn Belt",      "pm": 5,  "norm": 650},
-        "pampas_soja":   {"name": "Soja Pampas (AR)",     "pm": 11, "norm": 900},
-        "minas_cafe":    {"name": "Café Minas Gerais",    "pm": 9,  "norm": 1400},
+    REGIONS = {   # wx = regiao do weather_archive / collect_weather
+        "cerrado_soja":  {"name": "Soja Cerrado (MT/GO)", "pm": 10, "norm": 1200, "wx": "cerrado_mt"},
+        "sul_soja":      {"name": "Soja Sul (PR/RS)",     "pm": 10, "norm": 1000, "wx": "sul_pr_rs"},
+        "cornbelt_corn": {"name": "Milho Corn Belt",      "pm": 5,  "norm": 650,  "wx": "corn_belt"},
+        "pampas_soja":   {"name": "Soja Pampas (AR)",     "pm": 11, "norm": 900,  "wx": "pampas_arg"},
+        "minas_cafe":    {"name": "Café Minas Gerais",    "pm": 9,  "norm": 1400, "wx": "minas_cafe"},
     }
     now = datetime.now()
     results = {}
@@ -424,7 +432,22 @@ def indicator_drought_accumulator(weather):
             "days": days, "pct_season": round(pct, 0),
             "stage": stage, "expected_mm": round(exp_mm, 0), "normal_mm": cfg["norm"],
         }
-        print(f"    {cfg['name']}: day {days} ({pct:.0f}%) | {stage}")
+        obs = ""
+        if weather_archive is not None:
+            try:
+                sig = weather_archive.stress_signals(cfg["wx"], season_start=datetime(py, cfg["pm"], 15).date())
+            except Exception as e:
+                sig = None
+                print(f"    [WARN] weather archive {cfg['wx']}: {e}")
+            if sig:
+                results[rid]["observed"] = sig
+                if sig.get("season_normal_mm") and sig.get("season_precip_mm") is not None:
+                    results[rid]["season_pct_normal"] = round(sig["season_precip_mm"] / sig["season_normal_mm"] * 100, 0)
+                if sig.get("season_precip_mm") is not None:
+                    obs = f" | obs {sig['season_precip_mm']:.0f}mm, veranico {sig['dry_spell_days']}d"
+                else:
+                    obs = f" | obs incompleto ({sig.get('season_obs_days')}/{sig.get('season_days')}d), veranico {sig['dry_spell_days']}d"
+        print(f"    {cfg['name']}: day {days} ({pct:.0f}%) | {stage}{obs}")
     save("drought_accumulator.json", {
         "indicator": "drought_accumulator", "generated": datetime.now().isoformat(), "regions": results,
     })
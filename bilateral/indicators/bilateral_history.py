@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+AgriMacro Intelligence — Bilateral Indicator History
+Series historicas do Landed Cost Spread (LCS) e do Brazil Competitiveness
+Index (BCI) sobre todas as datas em que os insumos existem.
+
+Arquivo colunar data/bilateral_archive.npz, uma linha por dia, append a
+cada run (a historia cresce com o tempo). Insumos com serie nos JSONs:
+  ptax    BCB/SGS brl_usd            (bcb_data.json)
+  cbot    ZS close, ¢/bu             (price_history.json)
+  cepea   CEPEA Paranaguá, R$/sc     (physical_br.json / physical_intl.json)
+Insumos de snapshot, gravados na data da coleta so quando reais (is_real no
+data_quality de run_lcs/run_bci; valor padrao nao entra):
+  gulf_basis, barge_freight, ocean_gulf, ocean_santos     (LCS)
+  bci_basis_spread, bci_freight_adv, bci_selling_pace,
+  bci_crush_margin                                        (raw_value do BCI)
+
+Cada data usa so o que estava arquivado ate ela (forward-fill limitado a
+MAX_GAP_DAYS); insumo sem valor arquivado deixa a data NaN. Calculo
+vetorizado (numpy) em landed_cost_spread_series e calculate_bci_series;
+percentis pela distribuicao observada ate cada data (janela expansiva: o
+passado nao ve dado futuro).
+
+  python bilateral/indicators/bilateral_history.py [--data-dir DIR]
+"""
+
+import json
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from brazil_competitiveness_index import calculate_bci_series, percentile_scores
+from landed_cost_shanghai import landed_cost_spread_series
+
+ARCHIVE_PATH = Path(__file__).resolve().parents[2] / "data" / "bilateral_archive.npz"
+SERIES = ("ptax", "cbot", "cepea")
+LCS_INPUTS = ("gulf_basis", "barge_freight", "ocean_gulf", "ocean_santos")
+BCI_INPUTS = {   # coluna -> componente do BCI (raw_value)
+    "bci_basis_spread": "Basis Spread",
+    "bci_freight_adv": "Freight Advantage",
+    "bci_selling_pace": "Farmer Selling Pace",
+    "bci_crush_margin": "Crush Margin",
+}
+COLUMNS = SERIES + LCS_INPUTS + tuple(BCI_INPUTS)
+# dias corridos que um valor vale para frente (feriados BR x US, fim de
+# semana; snapshot: runs perdidos)
+MAX_GAP_DAYS = {"ptax": 5, "cbot": 5, "cepea": 7, **{c: 10 for c in LCS_INPUTS + tuple(BCI_INPUTS)}}
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(d):
+    return (d - EPOCH).days
+
+
+def day_date(n):
+    return EPOCH + timedelta(days=int(n))
+
+
+def _load_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _points(rows, value_key="value", date_keys=("date", "period")):
+    """[(dia, valor)] de [{date, value}]; ignora datas que nao sao YYYY-MM-DD."""
+    out = []
+    for r in rows or []:
+        if not isinstance(r, dict):
+            continue
+        d = next((r[k] for k in date_keys if r.get(k)), None)
+        v = r.get(value_key, r.get("valor"))
+        try:
+            out.append((day_number(date.fromisoformat(str(d)[:10])), float(v)))
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+def load_inputs(data_dir):
+    """{serie: [(dia, valor)]} lidos dos JSONs processados."""
+    data_dir = Path(data_dir)
+    bcb = _load_json(data_dir / "bcb_data.json").get("brl_usd", [])
+    if isinstance(bcb, dict):
+        bcb = bcb.get("data", [])
+
+    zs = _load_json(data_dir / "price_history.json").get("ZS", [])
+    if isinstance(zs, dict):
+        zs = zs.get("bars", [])
+
+    cepea = []
+    for name, section in (("physical_br.json", "products"), ("physical_intl.json", "international")):
+        p = (_load_json(data_dir / name).get(section) or {}).get("ZS_BR") or {}
+        cepea += _points(p.get("history"))
+        cepea += _points([{"date": p.get("period"), "value": p.get("price")}])
+
+    return {"ptax": _points(bcb), "cbot": _points(zs, "close"), "cepea": cepea}
+
+
+def snapshot_inputs(lcs_result, bci_result, asof):
+    """{coluna: [(dia, valor)]} dos insumos reais do snapshot, na data `asof`."""
+    day = day_number(asof)
+    out = {}
+    if lcs_result.get("status") == "OK":
+        dq = lcs_result.get("data_quality", {})
+        for c in LCS_INPUTS:
+            q = dq.get(c, {})
+            if q.get("is_real") and q.get("value") is not None:
+                out[c] = [(day, float(q["value"]))]
+    if bci_result.get("status") == "OK":
+        raw = {c["name"]: c["raw_value"] for c in bci_result.get("components", [])}
+        quality = bci_result.get("data_quality", {}).get("components", {})
+        for c, name in BCI_INPUTS.items():
+            if quality.get(name, {}).get("is_real") and raw.get(name) is not None:
+                out[c] = [(day, float(raw[name]))]
+    return out
+
+
+# ── arquivo colunar ──
+
+def load_archive(path=ARCHIVE_PATH):
+    if not Path(path).exists():
+        return {"date": np.empty(0, np.int32), **{c: np.empty(0) for c in COLUMNS}}
+    with np.load(path) as z:   # coluna nova ausente num arquivo antigo: NaN
+        return {"date": z["date"],
+                **{c: z[c] if c in z.files else np.full(z["date"].size, np.nan) for c in COLUMNS}}
+
+
+def save_archive(cols, path=ARCHIVE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp, **cols)
+    os.replace(tmp, path)
+
+
+def _columns(inputs):
+    """Pontos por serie -> bloco colunar (uma linha por dia, NaN onde a serie nao tem)."""
+    days = np.unique(np.array([d for pts in inputs.values() for d, _ in pts], np.int32))
+    cols = {"date": days}
+    for c in COLUMNS:
+        col = np.full(days.size, np.nan)
+        pts = inputs.get(c) or []
+        if pts:
+            d, v = np.array(pts).T
+            col[np.searchsorted(days, d.astype(np.int32))] = v   # repetido: vale o ultimo
+        cols[c] = col
+    return cols
+
+
+def merge(old, new):
+    """Uniao por dia; valor novo (nao NaN) substitui o antigo da mesma data."""
+    days = np.union1d(old["date"], new["date"]).astype(np.int32)
+    out = {"date": days}
+    for c in COLUMNS:
+        col = np.full(days.size, np.nan)
+        for block in (old, new):
+            ok = ~np.isnan(block[c])
+            col[np.searchsorted(days, block["date"][ok])] = block[c][ok]
+        out[c] = col
+    return out
+
+
+def ffill(days, values, max_gap):
+    """Repete o ultimo valor valido por ate max_gap dias corridos."""
+    idx = np.where(~np.isnan(values), np.arange(values.size), -1)
+    idx = np.maximum.accumulate(idx)
+    filled = np.where(idx >= 0, values[np.maximum(idx, 0)], np.nan)
+    gap = days - days[np.maximum(idx, 0)]
+    return np.where((idx >= 0) & (gap <= max_gap), filled, np.nan)
+
+
+def _clean(a, nd=2):
+    return [None if np.isnan(x) else round(float(x), nd) for x in a]
+
+
+def build_history(data_dir, lcs_result, bci_result, path=ARCHIVE_PATH, save=True, asof=None):
+    """
+    Atualiza o arquivo com os insumos do dia (series dos JSONs + insumos reais
+    do snapshot de run_lcs / run_bci na data `asof`, padrao hoje) e calcula
+    as series a partir do que esta arquivado em cada data.
+    """
+    inputs = load_inputs(data_dir)
+    inputs.update(snapshot_inputs(lcs_result, bci_result, asof or date.today()))
+    cols = merge(load_archive(path), _columns(inputs))
+    if save and cols["date"].size:
+        save_archive(cols, path)
+
+    days = cols["date"]
+    x = {c: ffill(days, cols[c], MAX_GAP_DAYS[c]) for c in COLUMNS}
+
+    lcs = landed_cost_spread_series(
+        cbot_cents_bu=x["cbot"],
+        gulf_basis_cents_bu=x["gulf_basis"],
+        barge_freight_usd_mt=x["barge_freight"],
+        ocean_gulf_shanghai=x["ocean_gulf"],
+        ptax=x["ptax"],
+        ocean_santos_shanghai=x["ocean_santos"],
+        cepea_paranagua_rs_sc=x["cepea"],
+    )
+
+    # BCI: FX e FOB da serie; demais componentes pelo raw_value arquivado (diferenca ja pronta)
+    bci = calculate_bci_series(
+        ptax=x["ptax"],
+        santos_premium_cents_bu=x["bci_basis_spread"],
+        us_total_freight_usd_mt=x["bci_freight_adv"],
+        imea_comercializacao_pct=x["bci_selling_pace"],
+        gulf_fob_usd_mt=lcs["us_fob"],
+        santos_fob_usd_mt=lcs["br_fob"],
+        br_crush_margin_usd_mt=x["bci_crush_margin"],
+    )
+
+    keep = ~np.isnan(lcs["spread"]) | ~np.isnan(bci["bci_score"])
+    spread_pct_rank = percentile_scores(lcs["spread"])
+    last_lcs = np.flatnonzero(~np.isnan(lcs["spread"]))
+    last_bci = np.flatnonzero(~np.isnan(bci["bci_score"]))
+
+    return {
+        "dates": [day_date(d).isoformat() for d in days[keep]],
+        "lcs_spread_usd_mt": _clean(lcs["spread"][keep]),
+        "lcs_spread_pct": _clean(lcs["spread_pct"][keep]),
+        "lcs_spread_percentile": _clean(spread_pct_rank[keep], 1),
+        "bci_score": _clean(bci["bci_score"][keep], 1),
+        "bci_signal": [s or None for s in bci["bci_signal"][keep].tolist()],
+        "bci_components": {
+            name: {"score": _clean(c["score"][keep], 1), "method": c["method"]}
+            for name, c in bci["components"].items()
+        },
+        "latest": {
+            "lcs_date": day_date(days[last_lcs[-1]]).isoformat() if last_lcs.size else None,
+            "lcs_spread_usd_mt": _clean(lcs["spread"][last_lcs[-1:]])[0] if last_lcs.size else None,
+            "lcs_spread_percentile": _clean(spread_pct_rank[last_lcs[-1:]], 1)[0] if last_lcs.size else None,
+            "bci_date": day_date(days[last_bci[-1]]).isoformat() if last_bci.size else None,
+            "bci_score": _clean(bci["bci_score"][last_bci[-1:]], 1)[0] if last_bci.size else None,
+        },
+        "observations": {c: int(np.count_nonzero(~np.isnan(cols[c]))) for c in COLUMNS},
+    }
+
+
+if __name__ == "__main__":
+    data_dir = Path(sys.argv[sys.argv.index("--data-dir") + 1]) if "--data-dir" in sys.argv else \
+        Path(__file__).resolve().parents[2] / "agrimacro-dash" / "public" / "data" / "processed"
+    bilateral = _load_json(data_dir / "bilateral_indicators.json")
+    h = build_history(data_dir, bilateral.get("lcs", {}), bilateral.get("bci", {}), save=False)
+    print(f"  {len(h['dates'])} datas | observacoes: {h['observations']}")
+    print(f"  ultimo: {h['latest']}")
+    for name, c in h["bci_components"].items():
+        print(f"    {name:<22} {c['method']}")
@@ -15,7 +15,10 @@ Components (weighted):
   6. Crush Margin (10%)     — BR crush economics vs US
 
 Each component is normalized to 0-100 using historical percentiles,
-then weighted to produce the final BCI.
+then weighted to produce the final BCI. The snapshot (calculate_bci) uses
+the static HISTORICAL_RANGES; the time series (calculate_bci_series) ranks
+each component within its own observed distribution when there is enough
+history, falling back to the static ranges otherwise.
 
 Signal Interpretation:
   80-100: STRONG — Brazil highly competitive, expect large exports
@@ -34,6 +37,8 @@ from datetime import datetime, date
 from dataclasses import dataclass, field
 from typing import Optional, Dict, List
 
+import numpy as np
+
 # ============================================================
 # HISTORICAL RANGES (for percentile normalization)
 # Based on 2019-2025 weekly observations
@@ -139,6 +144,57 @@ def normalize_to_score(value: float, hist_key: str, invert: bool = False) -> flo
     return max(0, min(100, round(score, 1)))
 
 
+# Minimum distinct observations for an empirical percentile; below that
+# (or for a component held constant) the static range above is used.
+MIN_HISTORY_OBS = 52
+PERCENTILE_CHUNK = 1024      # rows per broadcast block in percentile_scores
+
+
+def normalize_series(values, hist_key: str, invert: bool = False) -> np.ndarray:
+    """normalize_to_score over an array (static HISTORICAL_RANGES z-score)."""
+    values = np.asarray(values, dtype=float)
+    hist = HISTORICAL_RANGES.get(hist_key)
+    if not hist or hist["std"] <= 0:
+        return np.where(np.isnan(values), np.nan, 50.0)
+    z = (values - hist["mean"]) / hist["std"]
+    if invert:
+        z = -z
+    return np.clip(np.round(50 + z * 20, 1), 0, 100)
+
+
+def percentile_scores(values, invert: bool = False) -> np.ndarray:
+    """
+    Expanding-window empirical percentile (0-100): each value is ranked only
+    against the valid values up to and including its own position, so a
+    past date never sees later data (the last value is ranked against the
+    whole series). Ties take the mid rank. NaN stays NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    valid = ~np.isnan(values)
+    v = values[valid]
+    if v.size == 0:
+        return out
+    pct = np.empty(v.size)
+    for a in range(0, v.size, PERCENTILE_CHUNK):
+        b = min(a + PERCENTILE_CHUNK, v.size)
+        past = np.arange(b)[None, :] <= np.arange(a, b)[:, None]       # j <= i
+        below = ((v[None, :b] < v[a:b, None]) & past).sum(axis=1)
+        upto = ((v[None, :b] <= v[a:b, None]) & past).sum(axis=1)
+        pct[a:b] = (below + upto) / 2 / np.arange(a + 1, b + 1) * 100
+    out[valid] = np.round(100 - pct if invert else pct, 1)
+    return out
+
+
+def score_series(values, hist_key: str, invert: bool = False):
+    """(scores, method): empirical percentile with enough history, else static range."""
+    values = np.asarray(values, dtype=float)
+    distinct = np.unique(values[~np.isnan(values)]).size
+    if distinct >= MIN_HISTORY_OBS:
+        return percentile_scores(values, invert), "percentile"
+    return normalize_series(values, hist_key, invert), "static_range"
+
+
 # ============================================================
 # DATA CLASSES
 # ============================================================
@@ -362,6 +418,71 @@ def calculate_bci(
     return bci
 
 
+# ============================================================
+# TIME SERIES (vectorized)
+# ============================================================
+
+# (component name, weight key, hist key, invert) in calculate_bci order
+SERIES_COMPONENTS = [
+    ("FX (BRL/USD)", "fx", "ptax", False),
+    ("Basis Spread", "basis", "basis_spread_cents_bu", True),
+    ("Freight Advantage", "freight", "freight_spread_usd_mt", False),
+    ("Farmer Selling Pace", "selling_pace", "selling_pace_deviation_pp", False),
+    ("FOB Spread", "fob_premium", "fob_spread_usd_mt", False),
+    ("Crush Margin", "crush_margin", "crush_margin_spread_usd_mt", False),
+]
+
+
+def bci_signal_series(scores) -> np.ndarray:
+    """bci_signal of BrazilCompetitivenessIndex.calculate for an array ("" where NaN)."""
+    scores = np.asarray(scores, dtype=float)
+    bins = np.digitize(np.nan_to_num(scores, nan=-1), [0, 20, 40, 60, 80])
+    labels = np.array(["", "VERY_WEAK", "WEAK", "NEUTRAL", "MODERATE", "STRONG"])
+    return labels[bins]
+
+
+def calculate_bci_series(
+    ptax,
+    santos_premium_cents_bu=0.0,
+    gulf_basis_cents_bu=0.0,
+    br_total_freight_usd_mt=0.0,
+    us_total_freight_usd_mt=0.0,
+    imea_comercializacao_pct=0.0,
+    seasonal_avg_comercializacao=0.0,
+    santos_fob_usd_mt=0.0,
+    gulf_fob_usd_mt=0.0,
+    br_crush_margin_usd_mt=0.0,
+    us_crush_margin_usd_mt=0.0,
+) -> dict:
+    """
+    BCI for every date of aligned input arrays (scalars broadcast), same
+    components and weights as calculate_bci. Scores come from score_series:
+    expanding-window percentiles for components with history, static
+    ranges for components held constant. BCI is NaN where any component is.
+
+    Returns {"bci_score", "bci_signal", "components": {name: {"raw", "score",
+    "method", "weight"}}}.
+    """
+    raw = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (
+        ptax,
+        np.subtract(santos_premium_cents_bu, gulf_basis_cents_bu),
+        np.subtract(us_total_freight_usd_mt, br_total_freight_usd_mt),
+        np.subtract(imea_comercializacao_pct, seasonal_avg_comercializacao),
+        np.subtract(gulf_fob_usd_mt, santos_fob_usd_mt),
+        np.subtract(br_crush_margin_usd_mt, us_crush_margin_usd_mt),
+    )))
+
+    components = {}
+    total = np.zeros(raw[0].shape)
+    for values, (name, wkey, hist_key, invert) in zip(raw, SERIES_COMPONENTS):
+        scores, method = score_series(values, hist_key, invert)
+        components[name] = {"raw": values, "score": scores, "method": method, "weight": WEIGHTS[wkey]}
+        total = total + np.round(scores * WEIGHTS[wkey], 2)
+
+    bci = np.round(total, 1)
+    return {"bci_score": bci, "bci_signal": bci_signal_series(bci), "components": components}
+
+
 # ============================================================
 # OUTPUT FORMATTERS
 # ============================================================
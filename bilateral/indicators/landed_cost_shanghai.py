@@ -35,6 +35,8 @@ from datetime import datetime, date
 from dataclasses import dataclass, field, asdict
 from typing import Optional
 
+import numpy as np
+
 # ============================================================
 # CONVERSION CONSTANTS
 # ============================================================
@@ -254,6 +256,72 @@ def calculate_landed_cost_spread(
     return lcs
 
 
+# ============================================================
+# TIME SERIES (vectorized)
+# ============================================================
+
+def landed_cost_spread_series(
+    cbot_cents_bu,
+    gulf_basis_cents_bu,
+    barge_freight_usd_mt,
+    ocean_gulf_shanghai,
+    ptax,
+    ocean_santos_shanghai,
+    cepea_paranagua_rs_sc=0.0,
+    imea_mt_rs_sc=0.0,
+    frete_interior_rs_mt=0.0,
+    premio_santos_cents_bu=0.0,
+) -> dict:
+    """
+    Same math as calculate_landed_cost_spread over aligned arrays (one
+    element per date); scalars broadcast. Per date the BR price method is
+    chosen as in the snapshot: CEPEA Paranaguá if > 0, else IMEA MT.
+    Dates without PTAX or without a BR price come out as NaN.
+
+    Returns dict of float arrays: us_fob, br_fob, us_landed, br_landed,
+    us_ocean, br_ocean, spread, spread_pct, fob_spread, ocean_advantage,
+    plus br_method ("paranagua" / "mt_interior" / "").
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (
+        cbot_cents_bu, gulf_basis_cents_bu, barge_freight_usd_mt, ocean_gulf_shanghai,
+        ptax, ocean_santos_shanghai, cepea_paranagua_rs_sc, imea_mt_rs_sc,
+        frete_interior_rs_mt, premio_santos_cents_bu)))
+    cbot, basis, barge, ocean_us, fx, ocean_br, cepea, imea, frete, premio = arrays
+
+    # --- US Route ---
+    us_fob = (cbot + basis) / 100 * BU_PER_MT
+    us_landed = us_fob + barge + ocean_us
+
+    # --- BR Route ---
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fx = np.where(fx > 0, fx, np.nan)
+        paranagua = cepea / fx * SC_PER_MT
+        mt_interior = imea / fx * SC_PER_MT + frete / fx + premio / 100 * BU_PER_MT
+    use_cepea = np.nan_to_num(cepea) > 0
+    use_imea = ~use_cepea & (np.nan_to_num(imea) > 0)
+    br_fob = np.where(use_cepea, paranagua, np.where(use_imea, mt_interior, np.nan))
+    br_landed = br_fob + ocean_br
+
+    # --- Spread (rounded like the snapshot) ---
+    us_landed, br_landed = np.round(us_landed, 2), np.round(br_landed, 2)
+    spread = us_landed - br_landed
+    avg = (us_landed + br_landed) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread_pct = np.where(avg > 0, spread / avg * 100, 0.0)
+    spread_pct[np.isnan(spread)] = np.nan
+
+    us_fob, br_fob = np.round(us_fob, 2), np.round(br_fob, 2)
+    return {
+        "us_fob": us_fob, "br_fob": br_fob,
+        "us_landed": us_landed, "br_landed": br_landed,
+        "us_ocean": np.round(ocean_us, 2), "br_ocean": np.round(ocean_br, 2),
+        "spread": spread, "spread_pct": spread_pct,
+        "fob_spread": us_fob - br_fob,
+        "ocean_advantage": np.round(ocean_us, 2) - np.round(ocean_br, 2),
+        "br_method": np.where(use_cepea, "paranagua", np.where(use_imea, "mt_interior", "")),
+    }
+
+
 # ============================================================
 # OUTPUT FORMATTERS
 # ============================================================
@@ -2,26 +2,132 @@
 AgriMacro - Webhook API v2.0
 Script principal para integração com n8n via webhook
 Inclui coleta de dados reais de 21 commodities via Stooq
+
+Camada de dados assíncrona: um httpx.AsyncClient compartilhado (pool de
+conexões), as 21 consultas ao Stooq em paralelo com limite de concorrência
+e um cache TTL em memória com coalescência — chamadas simultâneas do n8n
+esperam o mesmo fetch em andamento em vez de disparar outro.
+
+/data/{artefato}[/sub/caminho] serve os JSONs processados do pipeline
+(somente leitura) com cache por mtime, ETag forte/304 e gzip/brotli.
+
+/pipeline/events transmite via SSE os eventos de step gravados pelo
+run_pipeline em pipeline/logs/pipeline_events.jsonl.
 """
 
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, nullcontext
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pathlib import Path
+import asyncio
+import gzip
+import hashlib
+import httpx
 import requests
+import time
 from datetime import datetime
+from email.utils import formatdate
 import uvicorn
 from io import StringIO
 import csv
 import json
 import os
 
-# Armazenamento das respostas da Claude (em memória e arquivo)
-CLAUDE_RESPONSES = []
-RESPONSES_FILE = "/tmp/claude_responses.json"
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Respostas da Claude: log append-only em JSONL + últimas N em memória
+RESPONSES_FILE = os.getenv("AGRIMACRO_RESPONSES_FILE", "/tmp/claude_responses.jsonl")
+LEGACY_RESPONSES_FILE = "/tmp/claude_responses.json"
+RESPONSES_MEMORY = 100
+RESPONSES_PAGE_MAX = 100
+
+# Cache dos preços Stooq (segundos) e limite de requisições simultâneas ao Stooq
+COMMODITIES_TTL = int(os.getenv("AGRIMACRO_COMMODITIES_TTL", "60"))
+STOOQ_CONCURRENCY = int(os.getenv("AGRIMACRO_STOOQ_CONCURRENCY", "8"))
+STOOQ_TIMEOUT = 10
+STOOQ_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+class TTLCache:
+    """
+    Cache em memória com expiração e coalescência de requisições.
+    Falhas (exceção ou valor None) não são cacheadas.
+    """
+
+    def __init__(self):
+        self._values = {}      # key -> (expires_at, value)
+        self._inflight = {}    # key -> asyncio.Task
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def peek(self, key):
+        entry = self._values.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def get_or_fetch(self, key, ttl, fetch):
+        value = self.peek(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        self.stats["misses"] += 1
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+        if value is not None:
+            self._values[key] = (time.monotonic() + ttl, value)
+        return value
+
+    def clear(self):
+        self._values.clear()
+
+
+CACHE = TTLCache()
+HTTP = {"client": None}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente HTTP compartilhado (criado no startup; sob demanda fora do lifespan)."""
+    if HTTP["client"] is None or HTTP["client"].is_closed:
+        HTTP["client"] = httpx.AsyncClient(
+            timeout=STOOQ_TIMEOUT,
+            headers=STOOQ_HEADERS,
+            limits=httpx.Limits(max_connections=STOOQ_CONCURRENCY * 2,
+                                max_keepalive_connections=STOOQ_CONCURRENCY),
+        )
+    return HTTP["client"]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    yield
+    if HTTP["client"] is not None:
+        await HTTP["client"].aclose()
+        HTTP["client"] = None
+
 
 app = FastAPI(
     title="AgriMacro API",
     description="API webhook para integração com n8n - Dados de Commodities",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 # ============================================================================
@@ -59,98 +165,101 @@ COMMODITIES = [
 ]
 
 
-def fetch_stooq_data(stooq_symbol: str) -> dict | None:
-    """Busca dados de uma commodity no Stooq"""
-    url = f"https://stooq.com/q/l/?s={stooq_symbol}&f=sd2t2ohlcv&h&e=csv"
+def stooq_url(stooq_symbol: str) -> str:
+    return f"https://stooq.com/q/l/?s={stooq_symbol}&f=sd2t2ohlcv&h&e=csv"
+
+
+def parse_stooq_csv(text: str) -> dict | None:
+    """Converte o CSV de cotação do Stooq no dict de preço (None se inválido)"""
+    # Parse CSV
+    reader = csv.DictReader(StringIO(text))
+    rows = list(reader)
+    
+    if not rows:
+        return None
+    
+    row = rows[0]
+    
+    # Validar dados
+    close = row.get('Close', '')
+    date = row.get('Date', '')
+    
+    if not close or close == 'N/D' or not date or date == 'N/D':
+        return None
+    
+    try:
+        close_val = float(close)
+        open_val = float(row.get('Open', 0)) or None
+        high_val = float(row.get('High', 0)) or None
+        low_val = float(row.get('Low', 0)) or None
+        volume_val = int(row.get('Volume', 0)) if row.get('Volume') else None
+    except (ValueError, TypeError):
+        return None
     
+    # Calcular variação
+    change = None
+    change_pct = None
+    if open_val and close_val:
+        change = round(close_val - open_val, 4)
+        change_pct = round((change / open_val) * 100, 4)
+    
+    return {
+        "open": open_val,
+        "high": high_val,
+        "low": low_val,
+        "close": close_val,
+        "volume": volume_val,
+        "date": date,
+        "change": change,
+        "change_pct": change_pct
+    }
+
+
+def fetch_stooq_data(stooq_symbol: str) -> dict | None:
+    """Busca dados de uma commodity no Stooq (síncrono, para uso em scripts)"""
     try:
-        response = requests.get(url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        response = requests.get(stooq_url(stooq_symbol), timeout=STOOQ_TIMEOUT, headers=STOOQ_HEADERS)
         response.raise_for_status()
-        
-        # Parse CSV
-        reader = csv.DictReader(StringIO(response.text))
-        rows = list(reader)
-        
-        if not rows:
-            return None
-        
-        row = rows[0]
-        
-        # Validar dados
-        close = row.get('Close', '')
-        date = row.get('Date', '')
-        
-        if not close or close == 'N/D' or not date or date == 'N/D':
-            return None
-        
-        try:
-            close_val = float(close)
-            open_val = float(row.get('Open', 0)) or None
-            high_val = float(row.get('High', 0)) or None
-            low_val = float(row.get('Low', 0)) or None
-            volume_val = int(row.get('Volume', 0)) if row.get('Volume') else None
-        except (ValueError, TypeError):
-            return None
-        
-        # Calcular variação
-        change = None
-        change_pct = None
-        if open_val and close_val:
-            change = round(close_val - open_val, 4)
-            change_pct = round((change / open_val) * 100, 4)
-        
-        return {
-            "open": open_val,
-            "high": high_val,
-            "low": low_val,
-            "close": close_val,
-            "volume": volume_val,
-            "date": date,
-            "change": change,
-            "change_pct": change_pct
-        }
-        
+        return parse_stooq_csv(response.text)
     except Exception:
         return None
 
 
-def collect_all_commodities() -> dict:
-    """Coleta dados de todas as 21 commodities"""
-    results = {}
-    successful = 0
-    failed = 0
-    
-    for commodity in COMMODITIES:
-        data = fetch_stooq_data(commodity["stooq"])
-        
-        if data:
-            results[commodity["symbol"]] = {
-                "symbol": commodity["symbol"],
-                "name": commodity["name"],
-                "exchange": commodity["exchange"],
-                "unit": commodity["unit"],
-                "price": data,
-                "price_date": data["date"],
-                "source": "stooq",
-                "timestamp": datetime.now().isoformat()
-            }
-            successful += 1
+async def fetch_stooq_data_async(stooq_symbol: str, semaphore: asyncio.Semaphore | None = None) -> dict | None:
+    """Busca dados de uma commodity no Stooq pelo cliente HTTP compartilhado"""
+    try:
+        if semaphore is None:
+            response = await get_http_client().get(stooq_url(stooq_symbol))
         else:
-            results[commodity["symbol"]] = {
-                "symbol": commodity["symbol"],
-                "name": commodity["name"],
-                "exchange": commodity["exchange"],
-                "unit": commodity["unit"],
-                "price": None,
-                "price_date": None,
-                "source": "failed",
-                "error": "Falha ao coletar dados",
-                "timestamp": datetime.now().isoformat()
-            }
-            failed += 1
-    
+            async with semaphore:
+                response = await get_http_client().get(stooq_url(stooq_symbol))
+        response.raise_for_status()
+        return parse_stooq_csv(response.text)
+    except Exception:
+        return None
+
+
+def commodity_record(commodity: dict, data: dict | None) -> dict:
+    """Registro de saída de uma commodity (com ou sem preço)"""
+    record = {
+        "symbol": commodity["symbol"],
+        "name": commodity["name"],
+        "exchange": commodity["exchange"],
+        "unit": commodity["unit"],
+        "price": data,
+        "price_date": data["date"] if data else None,
+        "source": "stooq" if data else "failed",
+        "timestamp": datetime.now().isoformat()
+    }
+    if not data:
+        record["error"] = "Falha ao coletar dados"
+    return record
+
+
+def summarize_commodities(results: dict) -> dict:
+    """Monta metadata + commodities a partir dos registros por símbolo"""
+    successful = sum(1 for r in results.values() if r["price"])
+    failed = len(results) - successful
     return {
         "metadata": {
             "timestamp": datetime.now().isoformat(),
@@ -167,6 +276,45 @@ def collect_all_commodities() -> dict:
     }
 
 
+def collect_all_commodities() -> dict:
+    """Coleta dados de todas as 21 commodities (síncrono, sequencial)"""
+    results = {
+        commodity["symbol"]: commodity_record(commodity, fetch_stooq_data(commodity["stooq"]))
+        for commodity in COMMODITIES
+    }
+    return summarize_commodities(results)
+
+
+async def collect_all_commodities_async() -> dict | None:
+    """Coleta as 21 commodities em paralelo (até STOOQ_CONCURRENCY simultâneas)"""
+    semaphore = asyncio.Semaphore(STOOQ_CONCURRENCY)
+    prices = await asyncio.gather(*(fetch_stooq_data_async(c["stooq"], semaphore) for c in COMMODITIES))
+    results = {c["symbol"]: commodity_record(c, data) for c, data in zip(COMMODITIES, prices)}
+    data = summarize_commodities(results)
+    # Nada coletado: não cachear, a próxima chamada tenta de novo
+    return data if data["metadata"]["successful"] else None
+
+
+async def get_all_commodities() -> dict:
+    """Snapshot das 21 commodities via cache TTL (fetches simultâneos coalescidos)"""
+    data = await CACHE.get_or_fetch("commodities", COMMODITIES_TTL, collect_all_commodities_async)
+    if data is None:
+        return summarize_commodities({c["symbol"]: commodity_record(c, None) for c in COMMODITIES})
+    return data
+
+
+async def get_commodity_price(commodity: dict) -> dict | None:
+    """Preço de uma commodity: reaproveita o snapshot completo se estiver em cache"""
+    snapshot = CACHE.peek("commodities")
+    if snapshot is not None:
+        record = snapshot["commodities"].get(commodity["symbol"])
+        if record and record["price"]:
+            CACHE.stats["hits"] += 1
+            return record["price"]
+    return await CACHE.get_or_fetch(f"commodity:{commodity['symbol']}", COMMODITIES_TTL,
+                                    lambda: fetch_stooq_data_async(commodity["stooq"]))
+
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -181,8 +329,11 @@ async def root():
         "endpoints": {
             "/webhook": "GET para dados completos das commodities, POST para receber dados",
             "/commodities": "Lista todas as 21 commodities com preços atuais",
-            "/claude-response": "POST para receber respostas da Claude, GET para consultar histórico",
+            "/claude-response": "POST para receber respostas da Claude, GET para o histórico paginado (?limit, ?before, ?since, ?until, ?q)",
             "/claude-response/latest": "GET para consultar a última resposta da Claude",
+            "/data": "Lista os artefatos processados do pipeline",
+            "/data/{artefato}/{caminho}": "JSON processado (ou um trecho dele) com ETag e gzip/brotli",
+            "/pipeline/events": "SSE com o progresso do pipeline por step (inicio/fim, duração, status)",
             "/health": "Verificação de saúde da API"
         },
         "timestamp": datetime.now().isoformat()
@@ -192,7 +343,7 @@ async def root():
 @app.get("/webhook")
 async def webhook_get():
     """Endpoint webhook GET - retorna dados completos das 21 commodities"""
-    data = collect_all_commodities()
+    data = await get_all_commodities()
     return JSONResponse(content={
         "projeto": "AgriMacro",
         "status": "sucesso",
@@ -224,7 +375,7 @@ async def webhook_post(request: Request):
 @app.get("/commodities")
 async def get_commodities():
     """Endpoint para obter dados de todas as commodities"""
-    return JSONResponse(content=collect_all_commodities())
+    return JSONResponse(content=await get_all_commodities())
 
 
 @app.get("/commodity/{symbol}")
@@ -241,19 +392,10 @@ async def get_commodity(symbol: str):
             content={"error": f"Commodity '{symbol}' não encontrada"}
         )
     
-    data = fetch_stooq_data(commodity["stooq"])
+    data = await get_commodity_price(commodity)
     
     if data:
-        return JSONResponse(content={
-            "symbol": commodity["symbol"],
-            "name": commodity["name"],
-            "exchange": commodity["exchange"],
-            "unit": commodity["unit"],
-            "price": data,
-            "price_date": data["date"],
-            "source": "stooq",
-            "timestamp": datetime.now().isoformat()
-        })
+        return JSONResponse(content=commodity_record(commodity, data))
     else:
         return JSONResponse(
             status_code=503,
@@ -268,6 +410,8 @@ async def health_check():
         "status": "healthy",
         "servico": "AgriMacro API",
         "versao": "2.1.0",
+        "cache": {**CACHE.stats, "ttl_seconds": COMMODITIES_TTL},
+        "claude_responses": len(RESPONSES),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -276,6 +420,140 @@ async def health_check():
 # ENDPOINTS PARA RECEBER RESPOSTAS DA CLAUDE (n8n)
 # ============================================================================
 
+class ResponseStore:
+    """
+    Histórico das respostas da Claude em JSONL append-only.
+    Cada POST anexa uma linha (O(1) de I/O, qualquer que seja o histórico);
+    o índice id -> offset lê respostas antigas com um seek, e as últimas
+    RESPONSES_MEMORY ficam num deque em memória.
+    """
+
+    def __init__(self, path, memory: int = RESPONSES_MEMORY):
+        self.path = Path(path)
+        self.recent = deque(maxlen=memory)
+        self.ids = []          # ids em ordem de chegada (crescentes)
+        self.offsets = {}      # id -> offset da linha no arquivo (None = só em memória)
+        self._loaded = False
+        self._torn = False     # última linha sem '\n' (queda no meio de uma escrita)
+
+    def _index(self, record: dict, offset: int | None):
+        self.ids.append(record["id"])
+        self.offsets[record["id"]] = offset
+        self.recent.append(record)
+
+    def load(self):
+        """Varre o arquivo uma vez (startup) montando o índice; importa o JSON legado."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists() and os.path.exists(LEGACY_RESPONSES_FILE):
+            self._import_legacy(LEGACY_RESPONSES_FILE)
+        if not self.path.exists():
+            return
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if not self.ids or record["id"] > self.ids[-1]:
+                        self._index(record, offset)
+                except (ValueError, KeyError, TypeError):
+                    pass
+                offset += len(line)
+                self._torn = not line.endswith(b"\n")
+
+    def _import_legacy(self, legacy_path: str):
+        # O arquivo antigo reiniciava os ids a cada restart: renumera em ordem de chegada
+        try:
+            with open(legacy_path, "r") as f:
+                legacy = json.load(f)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                for i, record in enumerate(legacy, 1):
+                    f.write(json.dumps({**record, "id": i}, ensure_ascii=False) + "\n")
+            print(f"Respostas migradas de {legacy_path}: {len(legacy)}")
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Erro ao migrar {legacy_path}: {e}")
+
+    def append(self, data) -> dict:
+        self.load()
+        record = {
+            "id": self.ids[-1] + 1 if self.ids else 1,
+            "received_at": datetime.now().isoformat(),
+            "data": data,
+        }
+        offset = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.seek(0, os.SEEK_END)
+                if self._torn:
+                    f.write(b"\n")
+                    self._torn = False
+                offset = f.tell()
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Erro ao salvar resposta: {e}")
+        self._index(record, offset)
+        return record
+
+    def get(self, response_id: int, f=None) -> dict | None:
+        self.load()
+        if self.recent:
+            i = response_id - self.recent[0]["id"]
+            if 0 <= i < len(self.recent) and self.recent[i]["id"] == response_id:
+                return self.recent[i]
+        offset = self.offsets.get(response_id)
+        if offset is None:
+            return None
+        if f is None:
+            with open(self.path, "rb") as f:
+                return self.get(response_id, f)
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def latest(self) -> dict | None:
+        self.load()
+        return self.recent[-1] if self.recent else None
+
+    def page(self, limit: int = 10, before: int | None = None, since: str | None = None,
+             until: str | None = None, q: str | None = None) -> dict:
+        """
+        Página de respostas mais recentes que `before`, em ordem cronológica.
+        since/until filtram received_at (data ou datetime ISO, inclusivos);
+        q busca texto no payload. next_before é o cursor da página anterior.
+        """
+        self.load()
+        end = bisect_left(self.ids, before) if before is not None else len(self.ids)
+        needle = q.lower() if q else None
+        out, more = [], False
+        with open(self.path, "rb") if self.path.exists() else nullcontext() as f:
+            for pos in range(end - 1, -1, -1):
+                record = self.get(self.ids[pos], f)
+                if record is None:
+                    continue
+                stamp = record.get("received_at", "")
+                if since and stamp < since:
+                    break  # ids e received_at crescem juntos
+                if until and stamp[:len(until)] > until:
+                    continue
+                if needle and needle not in json.dumps(record.get("data"), ensure_ascii=False).lower():
+                    continue
+                if len(out) == limit:
+                    more = True
+                    break
+                out.append(record)
+        out.reverse()
+        return {"responses": out, "next_before": out[0]["id"] if more else None}
+
+    def __len__(self):
+        self.load()
+        return len(self.ids)
+
+
+RESPONSES = ResponseStore(RESPONSES_FILE)
+
+
 @app.post("/claude-response")
 async def receive_claude_response(request: Request):
     """Endpoint para receber respostas processadas pela Claude via n8n"""
@@ -283,27 +561,10 @@ async def receive_claude_response(request: Request):
         body = await request.json()
     except Exception:
         body = {}
-    
-    # Criar registro da resposta
-    response_record = {
-        "id": len(CLAUDE_RESPONSES) + 1,
-        "received_at": datetime.now().isoformat(),
-        "data": body
-    }
-    
-    # Armazenar em memória
-    CLAUDE_RESPONSES.append(response_record)
-    
-    # Manter apenas as últimas 100 respostas em memória
-    if len(CLAUDE_RESPONSES) > 100:
-        CLAUDE_RESPONSES.pop(0)
-    
-    # Salvar em arquivo para persistência
-    try:
-        save_response_to_file(response_record)
-    except Exception as e:
-        print(f"Erro ao salvar resposta: {e}")
-    
+
+    # Anexa ao log (uma linha) e ao deque das últimas respostas
+    response_record = RESPONSES.append(body)
+
     return JSONResponse(content={
         "projeto": "AgriMacro",
         "status": "sucesso",
@@ -314,13 +575,21 @@ async def receive_claude_response(request: Request):
 
 
 @app.get("/claude-response")
-async def get_claude_responses():
-    """Endpoint para consultar as últimas respostas da Claude"""
+async def get_claude_responses(limit: int = 10, before: int | None = None, since: str | None = None,
+                               until: str | None = None, q: str | None = None):
+    """
+    Histórico paginado das respostas da Claude (padrão: últimas 10).
+    ?before=<id> pagina para trás; ?since/?until filtram por data; ?q busca no payload.
+    """
+    limit = max(1, min(limit, RESPONSES_PAGE_MAX))
+    page = RESPONSES.page(limit=limit, before=before, since=since, until=until, q=q)
     return JSONResponse(content={
         "projeto": "AgriMacro",
         "status": "sucesso",
-        "total_responses": len(CLAUDE_RESPONSES),
-        "responses": CLAUDE_RESPONSES[-10:],  # Últimas 10 respostas
+        "total_responses": len(RESPONSES),
+        "count": len(page["responses"]),
+        "next_before": page["next_before"],
+        "responses": page["responses"],
         "timestamp": datetime.now().isoformat()
     })
 
@@ -328,16 +597,17 @@ async def get_claude_responses():
 @app.get("/claude-response/latest")
 async def get_latest_claude_response():
     """Endpoint para consultar a última resposta da Claude"""
-    if not CLAUDE_RESPONSES:
+    latest = RESPONSES.latest()
+    if latest is None:
         return JSONResponse(
             status_code=404,
             content={"error": "Nenhuma resposta da Claude recebida ainda"}
         )
-    
+
     return JSONResponse(content={
         "projeto": "AgriMacro",
         "status": "sucesso",
-        "latest_response": CLAUDE_RESPONSES[-1],
+        "latest_response": latest,
         "timestamp": datetime.now().isoformat()
     })
 
@@ -345,14 +615,14 @@ async def get_latest_claude_response():
 @app.get("/claude-response/{response_id}")
 async def get_claude_response_by_id(response_id: int):
     """Endpoint para consultar uma resposta específica da Claude por ID"""
-    response = next((r for r in CLAUDE_RESPONSES if r["id"] == response_id), None)
-    
+    response = RESPONSES.get(response_id)
+
     if not response:
         return JSONResponse(
             status_code=404,
             content={"error": f"Resposta com ID {response_id} não encontrada"}
         )
-    
+
     return JSONResponse(content={
         "projeto": "AgriMacro",
         "status": "sucesso",
@@ -361,28 +631,231 @@ async def get_claude_response_by_id(response_id: int):
     })
 
 
-def save_response_to_file(response: dict):
-    """Salva resposta em arquivo JSON para persistência"""
-    try:
-        # Carregar respostas existentes
-        if os.path.exists(RESPONSES_FILE):
-            with open(RESPONSES_FILE, 'r') as f:
-                responses = json.load(f)
+# ============================================================================
+# ARTEFATOS DO PIPELINE (somente leitura)
+# ============================================================================
+
+PROCESSED_DIR = Path(os.getenv(
+    "AGRIMACRO_PROCESSED_DIR",
+    Path(__file__).parent / "agrimacro-dash" / "public" / "data" / "processed",
+))
+COMPRESS_MIN_BYTES = 1024
+SLICE_CACHE_SIZE = 256
+
+# nome -> {"mtime_ns", "size", "raw", "data", "etag"}; recarregado quando o mtime muda
+ARTIFACTS = {}
+# (nome, mtime_ns, caminho, encoding) -> (corpo, etag); LRU
+SLICES = OrderedDict()
+
+
+def artifact_path(name: str) -> Path | None:
+    """Arquivo do artefato (com ou sem .json); None se não existir no diretório processado"""
+    name = name if name.endswith(".json") else f"{name}.json"
+    path = PROCESSED_DIR / name
+    if "/" in name or "\\" in name or name.startswith(".") or not path.is_file():
+        return None
+    return path
+
+
+def load_artifact(path: Path) -> dict:
+    """JSON parseado do artefato, em cache enquanto o mtime/tamanho não mudar"""
+    st = path.stat()
+    entry = ARTIFACTS.get(path.name)
+    if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+        return entry
+    raw = path.read_bytes()
+    entry = {
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "raw": raw,
+        "data": json.loads(raw.decode("utf-8-sig")),
+        "etag": hashlib.sha256(raw).hexdigest()[:32],
+    }
+    ARTIFACTS[path.name] = entry
+    return entry
+
+
+def resolve_subpath(data, subpath: str, wrapper: str | None = None):
+    """
+    Navega dicts por chave e listas por índice; KeyError se o caminho não existir.
+    Chave ausente na raiz cai no wrapper homônimo do artefato
+    ({"spreads": {"soy_crush": ...}} -> /data/spreads/soy_crush).
+    """
+    node = data
+    segs = [s for s in subpath.split("/") if s]
+    if (segs and isinstance(data, dict) and segs[0] not in data
+            and isinstance(data.get(wrapper), dict) and segs[0] in data[wrapper]):
+        node = data[wrapper]
+    for seg in segs:
+        if isinstance(node, dict) and seg in node:
+            node = node[seg]
+        elif isinstance(node, list) and seg.lstrip("-").isdigit() and -len(node) <= int(seg) < len(node):
+            node = node[int(seg)]
         else:
-            responses = []
-        
-        # Adicionar nova resposta
-        responses.append(response)
-        
-        # Manter apenas as últimas 1000 respostas no arquivo
-        if len(responses) > 1000:
-            responses = responses[-1000:]
-        
-        # Salvar
-        with open(RESPONSES_FILE, 'w') as f:
-            json.dump(responses, f, indent=2)
-    except Exception as e:
-        print(f"Erro ao salvar em arquivo: {e}")
+            raise KeyError(seg)
+    return node
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    accepted = {p.split(";")[0].strip().lower() for p in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def artifact_body(name: str, entry: dict, subpath: str, encoding: str | None) -> tuple[bytes, str, str | None]:
+    """(corpo, etag forte, encoding efetivo) da representação pedida, via LRU"""
+    key = (name, entry["mtime_ns"], subpath, encoding)
+    if key in SLICES:
+        SLICES.move_to_end(key)
+        return SLICES[key]
+
+    if subpath:
+        body = json.dumps(resolve_subpath(entry["data"], subpath, Path(name).stem), ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+    else:
+        body, digest = entry["raw"], entry["etag"]
+
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        body = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+        etag = f'"{digest}-{encoding}"'
+    else:
+        encoding, etag = None, f'"{digest}"'
+
+    SLICES[key] = (body, etag, encoding)
+    if len(SLICES) > SLICE_CACHE_SIZE:
+        SLICES.popitem(last=False)
+    return body, etag, encoding
+
+
+@app.get("/data")
+async def list_artifacts():
+    """Lista os artefatos processados disponíveis"""
+    files = sorted(PROCESSED_DIR.glob("*.json")) if PROCESSED_DIR.is_dir() else []
+    return JSONResponse(content={
+        "projeto": "AgriMacro",
+        "status": "sucesso",
+        "total": len(files),
+        "artifacts": [{
+            "name": p.stem,
+            "bytes": p.stat().st_size,
+            "modified_at": datetime.fromtimestamp(p.stat().st_mtime).isoformat(),
+        } for p in files],
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@app.get("/data/{name}")
+@app.get("/data/{name}/{subpath:path}")
+async def get_artifact(name: str, request: Request, subpath: str = ""):
+    """Artefato processado (ou trecho: /data/spreads/soy_crush) com ETag/304 e compressão"""
+    path = artifact_path(name)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": f"Artefato '{name}' não encontrado"})
+    try:
+        entry = await asyncio.to_thread(load_artifact, path)
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        body, etag, encoding = artifact_body(path.name, entry, subpath.strip("/"), encoding)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"error": f"Caminho '{subpath}' não encontrado em '{name}' ({e})"})
+    except (OSError, ValueError) as e:
+        return JSONResponse(status_code=500, content={"error": f"Falha ao ler '{name}': {e}"})
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "Last-Modified": formatdate(entry["mtime_ns"] / 1e9, usegmt=True),
+    }
+    inm = request.headers.get("if-none-match", "")
+    if inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ============================================================================
+# EVENTOS DO PIPELINE (SSE)
+# ============================================================================
+
+EVENTS_FILE = Path(os.getenv(
+    "AGRIMACRO_EVENTS_FILE",
+    Path(__file__).parent / "pipeline" / "logs" / "pipeline_events.jsonl",
+))
+EVENTS_POLL_SECONDS = 0.5
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_REPLAY_BYTES = 256 * 1024
+
+
+def last_run_offset(path: Path) -> int:
+    """Offset do último run_start (procura só no fim do arquivo); sem run_start, o fim"""
+    size = path.stat().st_size
+    start = max(0, size - EVENTS_REPLAY_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        tail = f.read()
+    i = tail.rfind(b'"type": "run_start"')
+    if i < 0:
+        return size
+    return start + tail.rfind(b"\n", 0, i) + 1
+
+
+def sse_message(event: dict) -> str:
+    return (f"id: {event.get('run_id')}:{event.get('seq')}\n"
+            f"event: {event.get('type', 'message')}\n"
+            f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+
+
+async def tail_events(request: Request, replay: bool):
+    """
+    Acompanha o JSONL gravado pelo run_pipeline (outro processo) e repassa
+    cada linha nova como evento SSE; comentário de heartbeat quando ocioso.
+    """
+    offset, pending = None, b""
+    last_sent = time.monotonic()
+    while not await request.is_disconnected():
+        if EVENTS_FILE.exists():
+            size = EVENTS_FILE.stat().st_size
+            if offset is None:
+                offset = last_run_offset(EVENTS_FILE) if replay else size
+            elif size < offset:
+                offset, pending = 0, b""   # arquivo truncado/rotacionado
+            if size > offset:
+                with open(EVENTS_FILE, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+                offset += len(chunk)
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    try:
+                        yield sse_message(json.loads(line))
+                        last_sent = time.monotonic()
+                    except ValueError:
+                        continue
+        elif offset is None:
+            offset = 0
+        if time.monotonic() - last_sent > EVENTS_HEARTBEAT_SECONDS:
+            yield ": ping\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+
+@app.get("/pipeline/events")
+async def pipeline_events(request: Request, replay: bool = True):
+    """
+    Progresso do pipeline em tempo real (text/event-stream): step_start,
+    step_end (status, duração, registros), log e run_end.
+    replay=true reenvia antes os eventos do run mais recente.
+    """
+    return StreamingResponse(
+        tail_events(request, replay),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
@@ -12,19 +12,40 @@
    python aa_qa_engine.py              # Roda auditoria completa
    python aa_qa_engine.py --force      # Gera relatório mesmo com WARNs
    python aa_qa_engine.py --dry-run    # Só mostra resultado, não bloqueia
+   python aa_qa_engine.py --full       # Ignora o cache incremental
+   python aa_qa_engine.py --history    # Achados recorrentes (ver abaixo)
 
  Severidade:
    INFO  — Apenas log
    WARN  — Publica com nota
    FLAG  — Marca "sob revisão"
    BLOCK — Impede publicação
+
+ Checks: métodos decorados com @qa_check(nome, needs=(...)) entram no
+ registro na ordem de definição. `needs` declara as chaves de dados
+ (DATA_FILES) que o check lê — só esses arquivos são carregados, uma vez,
+ num contexto compartilhado; os checks rodam em paralelo (QA_WORKERS) e os
+ achados são consolidados na ordem do registro (saída determinística).
+
+ Incremental: cada check é cacheado por (versão + bytecode do check e dos
+ helpers/constantes do módulo que ele usa + hash dos arquivos em `needs` +
+ symbols.yml). Só rodam de novo os checks cujas
+ entradas mudaram; os demais reaproveitam os achados do cache. Checks
+ `volatile` (dependem do relógio) sempre rodam. --full ignora o cache.
+ Histórico compacto de achados: logs/qa_findings_history.jsonl
+   python aa_qa_engine.py --history [CODE] [--days 30]
 ═══════════════════════════════════════════════════════════════════
 """
 
-import json, os, sys, re, math, traceback
-from datetime import datetime, timezone
+import json, os, sys, re, math, traceback, threading, hashlib, types
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from freshness_manifest import entry as manifest_entry, refresh as manifest_refresh
+
 # ── Tenta importar YAML; fallback p/ parser simples se não tiver ──
 try:
     import yaml
@@ -42,6 +63,11 @@ DATA_PROC    = PIPELINE_DIR.parent / "agrimacro-dash" / "public" / "data" / "pro
 REPORTS_DIR  = PIPELINE_DIR.parent / "agrimacro-dash" / "public" / "data" / "reports"
 LOGS_DIR     = PIPELINE_DIR / "logs"
 SYMBOLS_FILE = PIPELINE_DIR / "symbols.yml"
+QA_WORKERS   = int(os.getenv("QA_WORKERS", "8"))
+QA_CACHE_DIR = PIPELINE_DIR / "cache" / "qa"
+QA_CACHE_FILE = QA_CACHE_DIR / "check_cache.json"
+HISTORY_FILE = LOGS_DIR / "qa_findings_history.jsonl"
+QA_CACHE_VERSION = 1
 
 LOGS_DIR.mkdir(exist_ok=True)
 
@@ -55,7 +81,8 @@ def load_symbols():
         return None
     with open(SYMBOLS_FILE, "r", encoding="utf-8") as f:
         if HAS_YAML:
-            return yaml.safe_load(f)
+            # Loader em C (libyaml) quando disponível: ~7x mais rápido que o puro-Python
+            return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
         else:
             # Fallback: parse manual básico (ranges e display_names)
             return _parse_symbols_fallback(f.read())
@@ -121,43 +148,264 @@ def _parse_symbols_fallback(text):
 # CARREGAMENTO DE DADOS
 # ══════════════════════════════════════════════════════════════
 
-def load_json(filename):
+DATA_FILES = {
+    "pr":   "price_history.json",
+    "sd":   "spreads.json",
+    "ed":   "eia_data.json",
+    "cd":   "cot.json",
+    "sw":   "stocks_watch.json",
+    "bcb":  "bcb_data.json",
+    "phys": "physical_intl.json",
+    "cal":  "calendar.json",
+    "dr":   "daily_reading.json",
+    "rd":   "report_daily.json",
+    "wt":   "weather_agro.json",
+    "nw":   "news.json",
+    "sabr": "sugar_alcohol_br.json",
+}
+
+def data_file_index():
+    """nome -> Path, listando cada diretório uma vez (raw > processed > pipeline)."""
+    index = {}
+    for base in [PIPELINE_DIR, DATA_PROC, DATA_RAW]:   # ordem inversa: o primeiro sobrescreve
+        if base.is_dir():
+            for entry in os.scandir(base):
+                if entry.name.endswith(".json") and entry.is_file():
+                    index[entry.name] = Path(entry.path)
+    return index
+
+def load_json(filename, index=None):
     """Carrega JSON de data/raw ou data/processed."""
-    for base in [DATA_RAW, DATA_PROC, PIPELINE_DIR]:
-        fp = base / filename
-        if fp.exists():
-            with open(fp, "r", encoding="utf-8") as f:
-                return json.load(f)
-    return None
+    fp = (index if index is not None else data_file_index()).get(filename)
+    if fp is None:
+        return None
+    with open(fp, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-def load_all_data():
-    """Carrega todos os JSONs do pipeline."""
-    files = {
-        "pr":   "price_history.json",
-        "sd":   "spreads.json",
-        "ed":   "eia_data.json",
-        "cd":   "cot.json",
-        "sw":   "stocks_watch.json",
-        "bcb":  "bcb_data.json",
-        "phys": "physical_intl.json",
-        "cal":  "calendar.json",
-        "dr":   "daily_reading.json",
-        "rd":   "report_daily.json",
-        "wt":   "weather_agro.json",
-        "nw":   "news.json",
-        "sabr": "sugar_alcohol_br.json",
-    }
+def load_all_data(keys=None, index=None):
+    """
+    Carrega os JSONs do pipeline (só `keys`, se dado) — leituras em paralelo
+    sobre um índice de arquivos resolvido uma única vez. `missing` sempre
+    cobre todos os DATA_FILES (presença não exige decodificar).
+    """
+    index = data_file_index() if index is None else index
+    files = {k: v for k, v in DATA_FILES.items() if keys is None or k in keys}
+    if not files:
+        return {}, [f for f in DATA_FILES.values() if f not in index]
+
+    def _load(fname):
+        try:
+            return load_json(fname, index)
+        except (OSError, ValueError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(QA_WORKERS, len(files)))) as pool:
+        loaded = dict(zip(files, pool.map(_load, files.values())))
     data = {}
     missing = []
-    for key, fname in files.items():
-        d = load_json(fname)
-        if d is not None:
-            data[key] = d
-        else:
+    for key, fname in DATA_FILES.items():
+        if loaded.get(key) is not None:
+            data[key] = loaded[key]
+        elif key in files or fname not in index:
             missing.append(fname)
     return data, missing
 
 
+# ══════════════════════════════════════════════════════════════
+# REGISTRO DE CHECKS
+# ══════════════════════════════════════════════════════════════
+
+_CHECK_SEQ = [0]
+
+def _const_repr(v):
+    """repr estável de constante de módulo (sets ordenados); None se não for dado."""
+    if isinstance(v, (set, frozenset)):
+        return "{" + ",".join(sorted(_const_repr(x) or "?" for x in v)) + "}"
+    if isinstance(v, dict):
+        return "{" + ",".join(f"{_const_repr(k)}:{_const_repr(x)}" for k, x in v.items()) + "}"
+    if isinstance(v, (list, tuple)):
+        return "[" + ",".join(_const_repr(x) or "?" for x in v) + "]"
+    if isinstance(v, re.Pattern):
+        return f"re({v.pattern!r},{v.flags})"
+    if v is None or isinstance(v, (bool, int, float, str, bytes, Path)):
+        return repr(v)
+    return None
+
+def _code_digest(code, ns=None, _seen=None):
+    """
+    Hash estável do bytecode (inclui funções aninhadas): mudou o check, muda a
+    chave. Com `ns` (globais do módulo + métodos da classe), os nomes usados
+    que são funções deste módulo entram recursivamente e constantes pelo
+    valor — mudar language_matcher ou uma faixa/lista global invalida o
+    cache. Dependência fora do módulo: suba `version` no @qa_check.
+    """
+    _seen = set() if _seen is None else _seen
+    _seen.add(code)
+    h = hashlib.sha256(code.co_code)
+    for c in code.co_consts:
+        h.update(_code_digest(c, ns, _seen).encode() if isinstance(c, types.CodeType) else repr(c).encode())
+    h.update(" ".join(code.co_names).encode())
+    for name in code.co_names if ns else ():
+        if name not in ns:
+            continue
+        v = ns[name]
+        f = getattr(getattr(v, "__func__", v), "__wrapped__", getattr(v, "__func__", v))
+        if isinstance(f, types.FunctionType) and f.__module__ == __name__:
+            if f.__code__ not in _seen:
+                h.update(f"{name}={_code_digest(f.__code__, ns, _seen)}".encode())
+        else:
+            r = _const_repr(v)
+            if r is not None:
+                h.update(f"{name}={r}".encode())
+    return h.hexdigest()[:16]
+
+def qa_check(name, needs=(), symbols=False, volatile=False, version=1):
+    """
+    Registra um método de AAQAEngine como check.
+    needs:    chaves de DATA_FILES lidas pelo check (carga seletiva/cache)
+    symbols:  True se depende do symbols.yml
+    volatile: resultado depende de algo fora dos arquivos (relógio) -> nunca cacheado
+    version:  subir invalida o cache do check mesmo sem mudança de bytecode
+              (ex.: dependência fora deste módulo)
+    O digest do código é calculado em registered_checks(), com o módulo todo
+    carregado (helpers e constantes definidos depois da classe entram).
+    """
+    def deco(func):
+        _CHECK_SEQ[0] += 1
+        func._qa_check = {"name": name, "needs": tuple(needs), "symbols": symbols,
+                          "volatile": volatile, "version": version, "code": None,
+                          "order": _CHECK_SEQ[0], "id": func.__name__}
+        return func
+    return deco
+
+
+# ══════════════════════════════════════════════════════════════
+# CACHE INCREMENTAL + HISTÓRICO DE ACHADOS
+# ══════════════════════════════════════════════════════════════
+
+def _file_sha(path, memo):
+    """sha256 do conteúdo; stat (tamanho, mtime) igual ao memo reaproveita sem reler."""
+    st = path.stat()
+    m = memo.get(str(path))
+    if m and m[0] == st.st_size and m[1] == st.st_mtime_ns:
+        return m[2]
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    memo[str(path)] = [st.st_size, st.st_mtime_ns, digest]
+    return digest
+
+def artifact_hashes(index, memo):
+    """nome do arquivo -> hash, para os DATA_FILES presentes + symbols.yml."""
+    out = {}
+    for fname in DATA_FILES.values():
+        if fname in index:
+            out[fname] = _file_sha(index[fname], memo)
+    if SYMBOLS_FILE.exists():
+        out[SYMBOLS_FILE.name] = _file_sha(SYMBOLS_FILE, memo)
+    return out
+
+def check_cache_key(spec, hashes):
+    parts = [str(QA_CACHE_VERSION), spec["id"], str(spec["version"]), spec["code"]]
+    parts += [f"{k}={hashes.get(DATA_FILES[k], '-')}" for k in spec["needs"]]
+    if spec["symbols"]:
+        parts.append(f"symbols={hashes.get(SYMBOLS_FILE.name, '-')}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+def load_qa_cache():
+    try:
+        with open(QA_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == QA_CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"version": QA_CACHE_VERSION, "files": {}, "checks": {}}
+
+def save_qa_cache(cache):
+    QA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = QA_CACHE_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, QA_CACHE_FILE)
+
+def _subject(finding):
+    d = finding.get("details") or {}
+    for k in ("file", "symbol", "spread", "key", "commodity", "word"):
+        if d.get(k) is not None:
+            return str(d[k])
+    return ""
+
+def append_history(report, path=None):
+    """Uma linha por auditoria: status, confiança e [sev, code, assunto] de cada achado."""
+    rec = {
+        "ts": report.get("timestamp"),
+        "date": report.get("date"),
+        "status": report.get("status"),
+        "confidence": report.get("confidence"),
+        "cached_checks": report.get("incremental", {}).get("cached", 0),
+        "f": [[f["severity"], f["code"], _subject(f)] for f in report.get("findings", [])],
+    }
+    path = Path(path or HISTORY_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+def load_history(days=30, path=None):
+    path = Path(path or HISTORY_FILE)
+    if not path.exists():
+        return []
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    runs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if (rec.get("date") or "") >= cutoff:
+                runs.append(rec)
+    return runs
+
+def recurring_findings(days=30, code=None, path=None):
+    """
+    Achados recorrentes por (code, assunto): em quantos dias apareceu, última
+    data e sequência atual de dias consecutivos (no último run de cada dia).
+    """
+    runs = load_history(days, path)
+    last_per_day = {}
+    for rec in runs:
+        last_per_day[rec["date"]] = rec
+    dates = sorted(last_per_day)
+    seen = {}
+    for day in dates:
+        for sev, c, subj in {tuple(x) for x in last_per_day[day]["f"]}:
+            if code and c != code:
+                continue
+            e = seen.setdefault((c, subj), {"code": c, "subject": subj, "severity": sev,
+                                             "days": 0, "last": day, "streak": 0})
+            e["days"] += 1
+            e["last"] = day
+            e["severity"] = sev
+    for e in seen.values():
+        streak = 0
+        for day in reversed(dates):
+            if any(x[1] == e["code"] and x[2] == e["subject"] for x in last_per_day[day]["f"]):
+                streak += 1
+            else:
+                break
+        e["streak"] = streak
+    return sorted(seen.values(), key=lambda e: (-e["days"], e["code"], e["subject"])), len(dates)
+
+
+@lru_cache(maxsize=32)
+def language_matcher(words):
+    """
+    Regex única (pré-compilada) para o conjunto de palavras; o lookahead casa
+    em toda posição, então nenhuma ocorrência sobreposta escapa.
+    """
+    alts = "|".join(re.escape(w) for w in sorted(set(words), key=len, reverse=True) if w)
+    return re.compile(f"(?=({alts}))") if alts else None
+
+
 # ══════════════════════════════════════════════════════════════
 # CLASSE PRINCIPAL — AA+QA ENGINE
 # ══════════════════════════════════════════════════════════════
@@ -174,10 +422,30 @@ class AAQAEngine:
         self.findings = []   # Lista de {severity, code, message, details}
         self.timestamp = datetime.now(timezone.utc).isoformat()
         self.date_str = datetime.now().strftime("%Y-%m-%d")
+        self._local = threading.local()   # lista de achados do check em execução na thread
+        self.results = {}                 # id do check -> (achados, erro) do que rodou agora
+        self.incremental = None           # {"cached": n, "ran": n} quando o cache foi usado
+
+    @classmethod
+    def registered_checks(cls):
+        """Specs dos checks decorados, na ordem de definição."""
+        specs = [getattr(f, "_qa_check") for f in vars(cls).values() if hasattr(f, "_qa_check")]
+        ns = None
+        for f in vars(cls).values():
+            spec = getattr(f, "_qa_check", None)
+            if spec is not None and spec["code"] is None:
+                ns = ns or {**globals(), **vars(cls)}
+                spec["code"] = _code_digest(f.__code__, ns)
+        return sorted(specs, key=lambda c: c["order"])
+
+    @classmethod
+    def required_data(cls):
+        """União das chaves de dados declaradas pelos checks."""
+        return {k for c in cls.registered_checks() for k in c["needs"]}
 
     def add(self, severity, code, message, details=None):
         """Registra um achado de auditoria."""
-        self.findings.append({
+        getattr(self._local, "findings", self.findings).append({
             "severity": severity,
             "code": code,
             "message": message,
@@ -189,6 +457,7 @@ class AAQAEngine:
     # GATE 1: Verificação de arquivos e fontes
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Disponibilidade de dados", volatile=True)
     def check_data_availability(self):
         """Verifica se todos os arquivos de dados existem."""
         critical = ["price_history.json", "bcb_data.json", "physical_intl.json"]
@@ -212,15 +481,22 @@ class AAQAEngine:
     # GATE 2: Verificação de timestamp / freshness
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Freshness dos dados", needs=("pr",), volatile=True)
     def check_data_freshness(self):
         """Verifica se os dados são do dia."""
         pr = self.data.get("pr")
         if not pr:
             return
 
-        # Checa timestamp do price_history
+        # Checa timestamp do price_history: source_ts do freshness manifest,
+        # com fallback para o _meta.collected_at do próprio arquivo
+        try:
+            e = manifest_entry("price_history.json",
+                               manifest_refresh(["raw/price_history.json", "processed/price_history.json"]))
+        except OSError:
+            e = None
         meta = pr.get("_meta", {})
-        collected = meta.get("collected_at", "")
+        collected = (e or {}).get("source_ts") or meta.get("collected_at", "")
         if collected:
             try:
                 dt = datetime.fromisoformat(collected.replace("Z", "+00:00"))
@@ -241,6 +517,7 @@ class AAQAEngine:
     # GATE 3.5a: RANGE VALIDATION (4.1)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Range de preços", needs=("pr", "phys"), symbols=True)
     def check_price_ranges(self):
         """Valida se preços estão dentro das faixas plausíveis."""
         pr = self.data.get("pr", {})
@@ -316,6 +593,7 @@ class AAQAEngine:
     # GATE 3.5b: UNIT CHECK (4.2)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Coerência de unidades", symbols=True)
     def check_unit_coherence(self):
         """Valida se unidades são coerentes com a categoria."""
         if not self.symbols:
@@ -343,6 +621,7 @@ class AAQAEngine:
     # GATE 3.5c: SPREAD VALIDATION (4.3)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Validação de spreads", needs=("pr", "sd"), symbols=True)
     def check_spreads(self):
         """Recalcula spreads e compara com valores armazenados."""
         pr = self.data.get("pr", {})
@@ -450,6 +729,7 @@ class AAQAEngine:
     # GATE 3.5d: ESTOQUES vs MÉDIA 5 ANOS (4.4)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Estoques vs média 5a", needs=("sw",))
     def check_stocks(self):
         """Verifica estoques USDA vs média 5 anos."""
         sw = self.data.get("sw", {})
@@ -499,6 +779,7 @@ class AAQAEngine:
     # GATE 3.5e: CROSS-PAGE CONSISTENCY (4.5)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Consistência cross-page", needs=("pr", "rd"))
     def check_cross_consistency(self):
         """Compara dados entre diferentes fontes para mesmo símbolo."""
         pr = self.data.get("pr", {})
@@ -547,6 +828,7 @@ class AAQAEngine:
     # GATE 3.5f: AUDITORIA SEMÂNTICA (4.6)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Auditoria semântica", needs=("dr", "pr"), symbols=True)
     def check_language(self):
         """Verifica se linguagem é compatível com magnitude da variação."""
         dr = self.data.get("dr", {})
@@ -600,10 +882,12 @@ class AAQAEngine:
                         pass
 
         extreme_words = self.symbols.get("language_audit", {}).get("extreme_words", [])
+        matcher = language_matcher(tuple(r.get("word", "") for r in extreme_words))
+        found = {m.group(1) for m in matcher.finditer(full_text)} if matcher else set()
         for rule in extreme_words:
             word = rule.get("word", "")
             min_pct = rule.get("min_change_pct", 2.0)
-            if word in full_text and max_change < min_pct:
+            if word and any(word in f for f in found) and max_change < min_pct:
                 self.add("FLAG", "LANGUAGE_OVERSTATEMENT",
                          f"Texto usa '{word}' mas maior variação diária é {max_change:.2f}% (mínimo: {min_pct}%)",
                          {"word": word, "max_change_pct": round(max_change, 2),
@@ -613,6 +897,7 @@ class AAQAEngine:
     # GATE 3.5g: FONTE / RASTREABILIDADE (4.7)
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Rastreabilidade", needs=("pr", "bcb"))
     def check_traceability(self):
         """Verifica se dados têm metadata de fonte e timestamp."""
         pr = self.data.get("pr", {})
@@ -643,6 +928,7 @@ class AAQAEngine:
     # GATE 3.5h: EIA DATA VALIDATION
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Dados EIA", needs=("ed",), symbols=True)
     def check_eia(self):
         """Valida dados EIA contra faixas do symbols.yml."""
         ed = self.data.get("ed", {})
@@ -683,6 +969,7 @@ class AAQAEngine:
     # GATE 3.5i: MACRO BRASIL VALIDATION
     # ──────────────────────────────────────────────────────────
 
+    @qa_check("Macro Brasil", needs=("bcb",), symbols=True)
     def check_macro_br(self):
         """Valida câmbio e indicadores macro Brasil."""
         bcb = self.data.get("bcb", {})
@@ -721,39 +1008,58 @@ class AAQAEngine:
     # CONSOLIDAÇÃO E OUTPUT
     # ──────────────────────────────────────────────────────────
 
-    def run_all(self):
-        """Executa todas as verificações."""
+    def run_all(self, cached=None):
+        """
+        Executa as verificações. cached: {id do check: achados} reaproveitados
+        do cache incremental — esses checks não rodam de novo.
+        """
+        cached = cached or {}
         print("=" * 60)
         print("  AgriMacro AA+QA Engine v1.0")
         print(f"  {self.date_str} — Auditoria iniciada")
         print("=" * 60)
 
-        checks = [
-            ("Disponibilidade de dados", self.check_data_availability),
-            ("Freshness dos dados", self.check_data_freshness),
-            ("Range de preços", self.check_price_ranges),
-            ("Coerência de unidades", self.check_unit_coherence),
-            ("Validação de spreads", self.check_spreads),
-            ("Estoques vs média 5a", self.check_stocks),
-            ("Consistência cross-page", self.check_cross_consistency),
-            ("Auditoria semântica", self.check_language),
-            ("Rastreabilidade", self.check_traceability),
-            ("Dados EIA", self.check_eia),
-            ("Macro Brasil", self.check_macro_br),
-        ]
-
-        for name, func in checks:
-            try:
-                func()
-                print(f"  ✓ {name}")
-            except Exception as e:
-                self.add("WARN", "CHECK_ERROR",
-                         f"Erro ao executar '{name}': {str(e)}",
-                         {"traceback": traceback.format_exc()})
-                print(f"  ✗ {name} — ERRO: {e}")
+        checks = self.registered_checks()
+        pending = [c for c in checks if c["id"] not in cached]
+        workers = max(1, min(QA_WORKERS, len(pending)))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = dict(zip([c["id"] for c in pending], pool.map(self._run_check, pending)))
+        else:
+            results = {c["id"]: self._run_check(c) for c in pending}
+        self.results = results
+
+        # Consolida na ordem do registro, independente de quem terminou primeiro
+        for spec in checks:
+            if spec["id"] in cached:
+                # achado reaproveitado vale para esta auditoria: carimbo da rodada atual
+                self.findings.extend({**f, "timestamp": self.timestamp} for f in cached[spec["id"]])
+                print(f"  ✓ {spec['name']} (cache)")
+                continue
+            found, error = results[spec["id"]]
+            self.findings.extend(found)
+            if error is None:
+                print(f"  ✓ {spec['name']}")
+            else:
+                print(f"  ✗ {spec['name']} — ERRO: {error}")
 
         return self.get_status()
 
+    def _run_check(self, spec):
+        """Executa um check isolando seus achados; retorna (achados, erro)."""
+        self._local.findings = found = []
+        error = None
+        try:
+            getattr(self, spec["id"])()
+        except Exception as e:
+            error = e
+            self.add("WARN", "CHECK_ERROR",
+                     f"Erro ao executar '{spec['name']}': {str(e)}",
+                     {"traceback": traceback.format_exc()})
+        finally:
+            del self._local.findings
+        return found, error
+
     def get_status(self):
         """Retorna status geral: PASS, WARN, FLAG, BLOCK."""
         if any(f["severity"] == "BLOCK" for f in self.findings):
@@ -792,6 +1098,8 @@ class AAQAEngine:
             "findings": self.findings,
             "confidence": self._calc_confidence(),
         }
+        if self.incremental is not None:
+            report["incremental"] = self.incremental
         return report
 
     def _calc_confidence(self):
@@ -906,9 +1214,11 @@ class AAQAEngine:
 # FUNÇÃO PRINCIPAL — Chamável pelo pipeline ou standalone
 # ══════════════════════════════════════════════════════════════
 
-def run_audit(force=False, dry_run=False):
+def run_audit(force=False, dry_run=False, incremental=True):
     """
     Executa auditoria completa.
+    incremental: reaproveita achados de checks cujas entradas não mudaram
+    (hash dos arquivos + versão do check); False = --full.
     Retorna: (status, report_dict)
     status: "PASS", "WARN", "FLAG", "BLOCK"
     """
@@ -917,17 +1227,43 @@ def run_audit(force=False, dry_run=False):
     if symbols is None:
         print("⚠️  symbols.yml não encontrado — auditoria parcial (sem range/unit checks)")
 
-    # Carrega dados
-    data, missing = load_all_data()
-    if not data:
+    index = data_file_index()
+    if not any(fname in index for fname in DATA_FILES.values()):
         print("🛑 Nenhum dado encontrado! Verifique os caminhos.")
         return "BLOCK", {"status": "BLOCK", "error": "no_data"}
 
+    # Chave de cada check: versão + bytecode + hash dos arquivos que ele lê
+    cache = load_qa_cache()
+    hashes = artifact_hashes(index, cache["files"])
+    checks = AAQAEngine.registered_checks()
+    keys = {c["id"]: check_cache_key(c, hashes) for c in checks}
+    cached = {}
+    if incremental:
+        for c in checks:
+            hit = cache["checks"].get(c["id"])
+            if not c["volatile"] and hit and hit["key"] == keys[c["id"]]:
+                cached[c["id"]] = hit["findings"]
+
+    # Carrega só os dados dos checks que vão rodar
+    pending = [c for c in checks if c["id"] not in cached]
+    data, missing = load_all_data({k for c in pending for k in c["needs"]}, index)
+
     # Cria engine e roda
     engine = AAQAEngine(symbols, data, missing)
-    status = engine.run_all()
+    engine.incremental = {"cached": len(cached), "ran": len(pending)} if incremental else None
+    status = engine.run_all(cached)
     engine.print_summary()
 
+    # Atualiza o cache (checks que deram erro ou voláteis não entram)
+    for spec in pending:
+        found, error = engine.results[spec["id"]]
+        if error is None and not spec["volatile"]:
+            cache["checks"][spec["id"]] = {"key": keys[spec["id"]], "findings": found}
+    try:
+        save_qa_cache(cache)
+    except OSError as e:
+        print(f"  ⚠️  cache QA não salvo: {e}")
+
     if not dry_run:
         print("\n  Salvando outputs...")
         report = engine.save_outputs()
@@ -935,16 +1271,43 @@ def run_audit(force=False, dry_run=False):
         report = engine.generate_report()
         print("\n  [DRY RUN — nada salvo]")
 
+    if not dry_run:
+        try:
+            append_history(report)
+        except OSError as e:
+            print(f"  ⚠️  histórico QA não salvo: {e}")
+
     return status, report
 
 
+def print_history(days=30, code=None):
+    """Achados recorrentes nos últimos `days` dias (um run por dia: o último)."""
+    rows, n_days = recurring_findings(days, code)
+    print(f"  Histórico QA — {n_days} dias com auditoria nos últimos {days}")
+    if not rows:
+        print("  Nenhum achado registrado")
+        return rows
+    print(f"  {'code':<28}{'assunto':<22}{'sev':<6}{'dias':>5}{'seq':>5}  último")
+    for e in rows:
+        print(f"  {e['code'][:27]:<28}{e['subject'][:21]:<22}{e['severity']:<6}"
+              f"{e['days']:>5}{e['streak']:>5}  {e['last']}")
+    return rows
+
+
 def main():
     """Entry point CLI."""
     force = "--force" in sys.argv
     dry_run = "--dry-run" in sys.argv
     verbose = "--verbose" in sys.argv
 
-    status, report = run_audit(force=force, dry_run=dry_run)
+    if "--history" in sys.argv:
+        i = sys.argv.index("--history")
+        code = sys.argv[i + 1] if i + 1 < len(sys.argv) and not sys.argv[i + 1].startswith("--") else None
+        days = int(sys.argv[sys.argv.index("--days") + 1]) if "--days" in sys.argv else 30
+        print_history(days, code)
+        sys.exit(0)
+
+    status, report = run_audit(force=force, dry_run=dry_run, incremental="--full" not in sys.argv)
 
     if verbose and report.get("findings"):
         print("\n  TODOS OS ACHADOS:")
@@ -30,7 +30,7 @@ from pathlib import Path
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from validate_prices import detect_rollover
+from validate_prices import rollover_fingerprint
 
 BASE = Path(__file__).parent.parent
 # Dual-write: processed/ e raw/. Dashboard le de raw/; validate_prices le de processed/.
@@ -48,16 +48,15 @@ SPREAD_PCT_THRESHOLD = 0.02  # |spread / prev_close| > 2% confirma rollover real
 def scan_rollovers(bars):
     """
     Varre a serie inteira e retorna todos os rollovers encontrados.
-    Exige (via detect_rollover) volume spike + 3d colapso anterior E
+    Exige (via rollover_fingerprint, vetorizado) volume spike + 3d colapso anterior E
     |spread| > 2% do close anterior (guardia contra falsos positivos).
 
     Retorna: lista de dicts com idx, date, spread, vol_ratio, prior_ratio.
     """
     found = []
-    for i in range(20, len(bars)):
-        is_roll, vol_ratio, prior_ratio = detect_rollover(bars, i)
-        if not is_roll:
-            continue
+    mask, vol_ratios, prior_ratios = rollover_fingerprint(bars)
+    for i in mask.nonzero()[0].tolist():
+        vol_ratio, prior_ratio = float(vol_ratios[i]), float(prior_ratios[i])
         prev_close = bars[i - 1].get("close", 0) or 0
         today_close = bars[i].get("close", 0) or 0
         if prev_close <= 0:
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+AgriMacro — Walk-Forward Backtest of Entry Rules
+
+Replays the exact scoring functions used live
+(skill_entry_timing.score_entry and skill_pretrade_checklist.evaluate_checklist)
+on every historical date, feeding them point-in-time inputs rebuilt from:
+  - price_history.json        (closes <= date)
+  - cot.json history          (reports published <= date, Tuesday data + 3d lag)
+  - cache/iv_history/{SYM}    (ATM IV <= date; 21d realized vol as fallback)
+  - seasonality               (monthly returns of months completed before date)
+  - contract_history.json     (forward curve from contracts trading on date)
+
+Each signal (entry_timing grade A/B, checklist GO/CONDITIONAL GO) opens a
+short credit spread (PUT or CALL, ~25 delta short strike, HOLD_DAYS to expiry)
+priced with Black-76 at the point-in-time IV and settled at expiry intrinsic.
+Trade-history inputs (cross_analysis, trade_skill_base) are left empty because
+they are computed from future trades (look-ahead).
+
+Output: pipeline/entry_rules_backtest.json
+
+Run:
+  python pipeline/backtest_entry_rules.py
+  python pipeline/backtest_entry_rules.py --data-dir <processed dir>
+"""
+
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from skill_entry_timing import SYMS, get_forward_curve, score_entry
+from skill_pretrade_checklist import evaluate_checklist
+from skill_stress_test import black76_price, build_close_panel
+
+BASE = Path(__file__).parent.parent
+PROC = BASE / "agrimacro-dash" / "public" / "data" / "processed"
+IV_CACHE = Path(__file__).parent / "cache" / "iv_history"
+LONG_CACHE = Path(__file__).parent / "cache" / "long_history"
+OUT = BASE / "pipeline" / "entry_rules_backtest.json"
+
+BACKTEST_START = "2021-01-01"
+WARMUP_BARS = 63            # ~3 months of history before the first scored date
+HOLD_DAYS = 31              # trading days (~45 DTE)
+DTE_CALENDAR = 45
+SHORT_Z = 0.674             # short strike ~25 delta
+WIDTH_Z = 0.5               # long strike another 0.5 sigma further OTM
+COT_LAG_DAYS = 3            # Tuesday positions published Friday
+COT_WINDOW = 156
+RV_WINDOW = 21
+CURVE_STALE_DAYS = 5
+
+DIRECTIONS = ("PUT", "CALL")
+ENTRY_GRADES = {"A", "B"}
+CHECKLIST_GO = {"GO", "CONDITIONAL GO"}
+
+
+def jload(path):
+    for enc in ('utf-8-sig', 'utf-8', 'latin-1'):
+        try:
+            with open(path, encoding=enc) as f:
+                return json.load(f)
+        except Exception:
+            continue
+    return {}
+
+
+def get_data_dir():
+    if "--data-dir" in sys.argv:
+        idx = sys.argv.index("--data-dir")
+        if idx + 1 < len(sys.argv):
+            return Path(sys.argv[idx + 1])
+    return PROC
+
+
+# ─────────────────────────────────────────────
+# Point-in-time input panels (dates x symbols)
+# ─────────────────────────────────────────────
+
+def build_cot_panel(cot, dates, syms):
+    """COT index (managed money, 156w min-max) known on each date; NaN if none."""
+    out = np.full((len(dates), len(syms)), np.nan)
+    for j, sym in enumerate(syms):
+        hist = cot.get("commodities", {}).get(sym, {}).get("disaggregated", {}).get("history", [])
+        hist = [h for h in hist if h.get("date") and h.get("managed_money_net") is not None]
+        if not hist:
+            continue
+        d = np.array([h["date"][:10] for h in hist], dtype="datetime64[D]")
+        mm = np.array([h["managed_money_net"] for h in hist], dtype=float)
+        order = np.argsort(d)
+        d, mm = d[order], mm[order]
+
+        # Expanding-then-rolling min/max, same definition as collect_cot.calc_cot_index
+        idx = np.empty(len(mm))
+        for i in range(len(mm)):
+            w = mm[max(0, i - COT_WINDOW + 1):i + 1]
+            lo, hi = w.min(), w.max()
+            idx[i] = 50.0 if hi == lo else round((mm[i] - lo) / (hi - lo) * 100, 1)
+
+        published = d + np.timedelta64(COT_LAG_DAYS, "D")
+        pos = np.searchsorted(published, dates, side="right") - 1
+        ok = pos >= 0
+        out[ok, j] = idx[pos[ok]]
+    return out
+
+
+def build_iv_panel(dates, panel, syms):
+    """
+    ATM IV known on each date from cache/iv_history; where no IV was recorded
+    yet, fall back to 21d annualized realized vol. Returns (iv, from_history mask).
+    """
+    logret = np.diff(np.log(panel), axis=0, prepend=np.nan)
+    csum = np.nancumsum(logret, axis=0)
+    csq = np.nancumsum(logret ** 2, axis=0)
+    n = RV_WINDOW
+    s1 = csum[n:] - csum[:-n]
+    s2 = csq[n:] - csq[:-n]
+    var = np.maximum(s2 / n - (s1 / n) ** 2, 0) * n / (n - 1)
+    rv = np.full_like(panel, np.nan)
+    rv[n:] = np.sqrt(var * 252)
+
+    iv = rv.copy()
+    from_hist = np.zeros(panel.shape, dtype=bool)
+    for j, sym in enumerate(syms):
+        hist = jload(IV_CACHE / f"{sym}.json")
+        hist = [h for h in hist if isinstance(h, dict) and h.get("atm_iv")] if isinstance(hist, list) else []
+        if not hist:
+            continue
+        d = np.array([h["date"][:10] for h in hist], dtype="datetime64[D]")
+        v = np.array([h["atm_iv"] for h in hist], dtype=float)
+        order = np.argsort(d)
+        d, v = d[order], v[order]
+        pos = np.searchsorted(d, dates, side="right") - 1
+        ok = pos >= 0
+        iv[ok, j] = v[pos[ok]]
+        from_hist[ok, j] = True
+    return iv, from_hist
+
+
+def _month_end_returns(d, c):
+    """Monthly close-to-close returns (%) keyed by year*12+month-1."""
+    ym = d.astype("datetime64[M]").astype(int)
+    last = np.r_[ym[1:] != ym[:-1], True]
+    m_ym, m_close = ym[last], c[last]
+    consecutive = np.r_[False, np.diff(m_ym) == 1]
+    ret = np.full(len(m_ym), np.nan)
+    ret[1:] = (m_close[1:] - m_close[:-1]) / m_close[:-1] * 100
+    ret[~consecutive] = np.nan
+    return m_ym, ret
+
+
+def build_seasonality_panel(prices, dates, syms):
+    """
+    Monthly average returns (12 per symbol) using only months completed before
+    each date. Uses the long Yahoo cache when present, otherwise price_history.
+    Returns array (T, S, 12).
+    """
+    out = np.zeros((len(dates), len(syms), 12))
+    cur_ym = dates.astype("datetime64[M]").astype(int)
+    for j, sym in enumerate(syms):
+        bars = jload(LONG_CACHE / f"{sym}_long.json")
+        if not isinstance(bars, list) or len(bars) < 250:
+            bars = prices.get(sym, [])
+        bars = [b for b in bars if b.get("close")]
+        if not bars:
+            continue
+        d = np.array([b["date"][:10] for b in bars], dtype="datetime64[D]")
+        c = np.array([b["close"] for b in bars], dtype=float)
+        m_ym, ret = _month_end_returns(d, c)
+        ok = ~np.isnan(ret)
+        m_ym, ret = m_ym[ok], ret[ok]
+        if not len(m_ym):
+            continue
+
+        # Cumulative sum/count per calendar month, indexed by completed month count
+        onehot = np.zeros((len(m_ym), 12))
+        onehot[np.arange(len(m_ym)), m_ym % 12] = 1
+        csum = np.vstack([np.zeros(12), np.cumsum(onehot * ret[:, None], axis=0)])
+        ccnt = np.vstack([np.zeros(12), np.cumsum(onehot, axis=0)])
+        k = np.searchsorted(m_ym, cur_ym, side="left")   # months strictly before today's month
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg = np.where(ccnt[k] > 0, csum[k] / ccnt[k], 0.0)
+        out[:, j, :] = np.round(avg, 2)
+    return out
+
+
+def build_curve_panel(contract_hist, dates):
+    """
+    Closes of every listed contract on each date (NaN when not trading or stale).
+    Returns (names, commodities, closes (T, C)).
+    """
+    contracts = contract_hist.get("contracts", {})
+    names, comms, series = [], [], []
+    for name, c in contracts.items():
+        bars = [b for b in c.get("bars", []) if b.get("close")]
+        if not bars:
+            continue
+        names.append(name)
+        comms.append(c.get("commodity", ""))
+        series.append((
+            np.array([b["date"][:10] for b in bars], dtype="datetime64[D]"),
+            np.array([b["close"] for b in bars], dtype=float),
+        ))
+    closes = np.full((len(dates), len(names)), np.nan)
+    for k, (d, c) in enumerate(series):
+        pos = np.searchsorted(d, dates, side="right") - 1
+        ok = pos >= 0
+        fresh = np.zeros(len(dates), dtype=bool)
+        fresh[ok] = (dates[ok] - d[pos[ok]]) <= np.timedelta64(CURVE_STALE_DAYS, "D")
+        fresh &= dates <= d[-1]
+        closes[fresh, k] = c[pos[fresh]]
+    return names, comms, closes
+
+
+# ─────────────────────────────────────────────
+# Snapshot for one date, in the shape the skills read
+# ─────────────────────────────────────────────
+
+def build_snapshot(t, syms, iv, cot_idx, seas, curve):
+    names, comms, closes = curve
+    options = {"underlyings": {}}
+    cot = {"commodities": {}}
+    seasonality = {}
+    for j, sym in enumerate(syms):
+        u = {"expirations": {"bt": {"days_to_exp": DTE_CALENDAR}}}
+        if not np.isnan(iv[t, j]):
+            u["iv_rank"] = {"current_iv": float(iv[t, j])}
+        options["underlyings"][sym] = u
+        if not np.isnan(cot_idx[t, j]):
+            cot["commodities"][sym] = {"disaggregated": {"cot_index": float(cot_idx[t, j])}}
+        seasonality[sym] = {"monthly_returns": seas[t, j].tolist()}
+
+    row = closes[t] if len(names) else []
+    live = np.flatnonzero(~np.isnan(row)) if len(names) else []
+    contract_hist = {"contracts": {
+        names[k]: {"commodity": comms[k], "bars": [{"close": float(row[k])}]} for k in live
+    }}
+    return {
+        "options": options,
+        "cot": cot,
+        "seasonality": seasonality,
+        "contract_hist": contract_hist,
+        "portfolio": {},
+        "cross": {},
+        "skill": {},
+    }
+
+
+# ─────────────────────────────────────────────
+# Credit spread simulation (vectorized over all signals)
+# ─────────────────────────────────────────────
+
+def simulate_spreads(F0, FT, sigma, is_call):
+    """
+    Short ~25d / long further OTM credit spread held to expiry.
+    Returns (pnl per unit of underlying, return on risk).
+    """
+    T = DTE_CALENDAR / 365
+    sd = sigma * np.sqrt(T)
+    sign = np.where(is_call, 1.0, -1.0)
+    k_short = F0 * np.exp(sign * SHORT_Z * sd)
+    k_long = F0 * np.exp(sign * (SHORT_Z + WIDTH_Z) * sd)
+    credit = black76_price(F0, k_short, T, sigma, is_call) - black76_price(F0, k_long, T, sigma, is_call)
+    payoff_short = np.where(is_call, np.maximum(FT - k_short, 0), np.maximum(k_short - FT, 0))
+    payoff_long = np.where(is_call, np.maximum(FT - k_long, 0), np.maximum(k_long - FT, 0))
+    pnl = credit - (payoff_short - payoff_long)
+    risk = np.abs(k_long - k_short) - credit
+    ror = np.where(risk > 0, pnl / np.maximum(risk, 1e-12), 0.0)
+    return pnl, ror
+
+
+def summarize(ror):
+    if not len(ror):
+        return {"trades": 0}
+    return {
+        "trades": int(len(ror)),
+        "win_rate": round(float((ror > 0).mean()) * 100, 1),
+        "avg_ror_pct": round(float(ror.mean()) * 100, 2),
+        "median_ror_pct": round(float(np.median(ror)) * 100, 2),
+        "worst_ror_pct": round(float(ror.min()) * 100, 1),
+        "sum_ror": round(float(ror.sum()), 2),
+    }
+
+
+def main():
+    print("=" * 60)
+    print("ENTRY RULES — WALK-FORWARD BACKTEST")
+    print(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    print("=" * 60)
+    t0 = time.time()
+
+    data_dir = get_data_dir()
+    prices = jload(data_dir / "price_history.json")
+    cot = jload(data_dir / "cot.json")
+    contract_hist = jload(data_dir / "contract_history.json")
+
+    syms = [s for s in SYMS if prices.get(s)]
+    dates, panel = build_close_panel(prices, syms, start=BACKTEST_START)
+    if len(dates) <= WARMUP_BARS + HOLD_DAYS:
+        print("  [ERR] Historico de precos insuficiente")
+        return
+    print(f"  {len(syms)} simbolos | {len(dates)} pregoes ({dates[0]} -> {dates[-1]})")
+
+    iv, iv_from_hist = build_iv_panel(dates, panel, syms)
+    cot_idx = build_cot_panel(cot, dates, syms)
+    seas = build_seasonality_panel(prices, dates, syms)
+    curve = build_curve_panel(contract_hist, dates)
+    print(f"  Inputs point-in-time prontos ({time.time() - t0:.1f}s) | "
+          f"IV historico em {iv_from_hist.mean() * 100:.0f}% das celulas, resto = vol realizada")
+
+    # ── Score every (date, symbol, direction) with the live functions ──
+    scored_t = range(WARMUP_BARS, len(dates) - HOLD_DAYS)
+    n = len(scored_t) * len(syms) * len(DIRECTIONS)
+    rec_t = np.empty(n, dtype=int)
+    rec_j = np.empty(n, dtype=int)
+    rec_call = np.empty(n, dtype=bool)
+    rec_pct = np.empty(n)
+    rec_grade = np.empty(n, dtype="<U1")
+    rec_decision = np.empty(n, dtype="<U14")
+    check_pts = defaultdict(lambda: np.full(n, -1, dtype=np.int8))
+    filter_pass = defaultdict(lambda: np.zeros(n, dtype=bool))
+
+    i = 0
+    for t in scored_t:
+        snap = build_snapshot(t, syms, iv, cot_idx, seas, curve)
+        curves = get_forward_curve(snap["contract_hist"])
+        day = dates[t].astype(object)
+        for j, sym in enumerate(syms):
+            for direction in DIRECTIONS:
+                entry = score_entry(sym, direction, snap["options"], snap["cot"], snap["seasonality"],
+                                    curves, snap["cross"], snap["skill"],
+                                    day.month, day.day)
+                check = evaluate_checklist(sym, direction, snap, day.month, day.day)
+                rec_t[i], rec_j[i], rec_call[i] = t, j, direction == "CALL"
+                rec_pct[i] = entry["pct"]
+                rec_grade[i] = entry["grade"]
+                rec_decision[i] = check["decision"]
+                for d in entry["details"]:
+                    if d.get("max"):
+                        check_pts[d["check"].split(" (")[0]][i] = d["pts"]
+                for f in check["filters"]:
+                    filter_pass[f["id"]][i] = f["passed"]
+                i += 1
+    print(f"  {n:,} avaliacoes de score_entry + checklist ({time.time() - t0:.1f}s)")
+
+    # ── Simulate every candidate once; rules are masks over the same trades ──
+    F0 = panel[rec_t, rec_j]
+    FT = panel[rec_t + HOLD_DAYS, rec_j]
+    sigma = iv[rec_t, rec_j]
+    valid = ~(np.isnan(F0) | np.isnan(FT) | np.isnan(sigma)) & (sigma > 0)
+    _, ror = simulate_spreads(np.nan_to_num(F0, nan=1.0), np.nan_to_num(FT, nan=1.0),
+                              np.nan_to_num(sigma, nan=0.3), rec_call)
+
+    masks = {
+        "all_days": valid,
+        "entry_timing_AB": valid & np.isin(rec_grade, list(ENTRY_GRADES)),
+        "checklist_GO": valid & np.isin(rec_decision, list(CHECKLIST_GO)),
+    }
+    masks["both"] = masks["entry_timing_AB"] & masks["checklist_GO"]
+
+    rules = {}
+    for name, m in masks.items():
+        rules[name] = {"ALL": summarize(ror[m])}
+        for direction, is_call in (("PUT", False), ("CALL", True)):
+            rules[name][direction] = summarize(ror[m & (rec_call == is_call)])
+
+    by_grade = {g: summarize(ror[valid & (rec_grade == g)]) for g in ("A", "B", "C", "D", "X")}
+    by_symbol = {}
+    for j, sym in enumerate(syms):
+        m = masks["entry_timing_AB"] & (rec_j == j)
+        by_symbol[sym] = {d: summarize(ror[m & (rec_call == c)]) for d, c in (("PUT", False), ("CALL", True))}
+
+    # Per-check attribution: outcome by points awarded on each scoring check
+    by_check = {}
+    for check, pts in check_pts.items():
+        by_check[check] = {str(p): summarize(ror[valid & (pts == p)])
+                           for p in np.unique(pts[pts >= 0])}
+    by_filter = {fid: {"pass": summarize(ror[valid & fp]), "fail": summarize(ror[valid & ~fp])}
+                 for fid, fp in sorted(filter_pass.items())}
+
+    elapsed = time.time() - t0
+
+    print(f"\n{'='*60}")
+    print(f"RESULTADO POR REGRA (credit spread ~25d, {DTE_CALENDAR} DTE, hold to expiry)")
+    print(f"{'='*60}")
+    for name, r in rules.items():
+        a = r["ALL"]
+        if a["trades"]:
+            print(f"  {name:>16}: {a['trades']:>6} trades | WR={a['win_rate']:>5.1f}% | "
+                  f"avg RoR={a['avg_ror_pct']:>+6.2f}% | worst={a['worst_ror_pct']:>+6.1f}%")
+    print("\n  Por grade (entry_timing):")
+    for g, r in by_grade.items():
+        if r["trades"]:
+            print(f"    {g}: {r['trades']:>6} | WR={r['win_rate']:>5.1f}% | avg RoR={r['avg_ror_pct']:>+6.2f}%")
+
+    output = {
+        "generated_at": datetime.now().isoformat(),
+        "period": {"start": str(dates[WARMUP_BARS]), "end": str(dates[len(dates) - HOLD_DAYS - 1])},
+        "symbols": syms,
+        "evaluations": n,
+        "elapsed_s": round(elapsed, 1),
+        "assumptions": {
+            "hold_days": HOLD_DAYS, "dte": DTE_CALENDAR,
+            "short_strike_z": SHORT_Z, "width_z": WIDTH_Z,
+            "cot_publish_lag_days": COT_LAG_DAYS,
+            "iv_history_coverage_pct": round(float(iv_from_hist.mean()) * 100, 1),
+            "iv_fallback": f"{RV_WINDOW}d realized vol",
+            "excluded_inputs": ["cross_analysis", "trade_skill_base", "portfolio"],
+        },
+        "rules": rules,
+        "by_grade": by_grade,
+        "by_symbol": by_symbol,
+        "by_check": by_check,
+        "by_filter": by_filter,
+    }
+    with open(OUT, "w") as f:
+        json.dump(output, f, indent=2, default=str)
+    print(f"\n  Tempo total: {elapsed:.1f}s")
+    print(f"[SAVED] {OUT}")
+
+
+if __name__ == "__main__":
+    main()
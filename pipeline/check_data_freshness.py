@@ -1,7 +1,8 @@
 """
 check_data_freshness.py - AgriMacro Data Freshness Guard
 
-Le mtime do sync marker (ibkr_portfolio.json) e classifica:
+Le o collected_at do sync marker (ibkr_portfolio.json) no freshness
+manifest (= mtime do arquivo sincronizado) e classifica:
   FRESH    < 8h    (sync recente do PC/MacBook via sync_portfolio.ps1)
   STALE    8h-24h  (banner amarelo no dashboard, recomenda sync)
   CRITICAL > 24h   (banner vermelho, pipeline pula geracao de PDF/video)
@@ -17,12 +18,17 @@ Escreve data_freshness.json em agrimacro-dash/public/data/processed/.
 Roda como Step 3b do run_pipeline.py.
 """
 import json
+import sys
 from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from freshness_manifest import age_hours, entry, refresh
+
 BASE = Path(__file__).parent.parent
 PROCESSED = BASE / "agrimacro-dash" / "public" / "data" / "processed"
 SYNC_MARKER_PATH = PROCESSED / "ibkr_portfolio.json"
+SYNC_MARKER_KEY = "processed/ibkr_portfolio.json"
 OUT_PATH = PROCESSED / "data_freshness.json"
 
 FRESH_HOURS = 8
@@ -31,7 +37,8 @@ CRITICAL_HOURS = 24
 
 def check_freshness():
     now = datetime.now(timezone.utc)
-    if not SYNC_MARKER_PATH.exists():
+    marker = entry(SYNC_MARKER_KEY, refresh([SYNC_MARKER_KEY]))
+    if marker is None:
         out = {
             "status": "CRITICAL",
             "last_sync_utc": None,
@@ -41,8 +48,7 @@ def check_freshness():
             "error": "ibkr_portfolio.json missing (sync nunca rodou)",
         }
     else:
-        mtime = datetime.fromtimestamp(SYNC_MARKER_PATH.stat().st_mtime, tz=timezone.utc)
-        hours_old = (now - mtime).total_seconds() / 3600.0
+        hours_old = age_hours(marker, now, field="collected_at")
         if hours_old < FRESH_HOURS:
             status = "FRESH"
         elif hours_old < CRITICAL_HOURS:
@@ -51,7 +57,7 @@ def check_freshness():
             status = "CRITICAL"
         out = {
             "status": status,
-            "last_sync_utc": mtime.isoformat(),
+            "last_sync_utc": marker["collected_at"],
             "hours_old": round(hours_old, 2),
             "source": "IBKR via PC sync",
             "generated_at": now.isoformat(),
@@ -8,9 +8,19 @@ Fontes:
   - Open-Meteo (fallback gratuito, sem key) — previsao 16 dias
   - NOAA CPC — status ENSO (El Nino / La Nina)
 Output: weather_agro.json em processed/
+
+Open-Meteo: uma unica chamada com todas as coordenadas (multi-location).
+Tomorrow.io (sem batch): chamadas concorrentes, pool de TOMORROW_WORKERS.
+Previsoes cacheadas por (fonte, lat, lon, rodada do modelo) em
+pipeline/cache/weather/ -- re-runs na mesma rodada de 6h nao vao a rede.
+Alertas calculados em numpy sobre a matriz regioes x dias.
+Cada coleta tambem alimenta o historico local (weather_archive.py).
 """
 import json, os, sys
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
 
 try:
     import requests
@@ -21,6 +31,15 @@ except ImportError:
 OUT = os.path.join(os.path.dirname(__file__), "..", "agrimacro-dash", "public", "data", "processed", "weather_agro.json")
 TOMORROW_KEY_PATH = os.path.join(os.path.expanduser("~"), ".tomorrow_key")
 NOAA_KEY_PATH = os.path.join(os.path.expanduser("~"), ".noaa_key")
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "cache", "weather", "forecast_cache.json")
+
+FORECAST_DAYS = 15
+RUN_HOURS = 6            # rodadas dos modelos globais: 00/06/12/18 UTC
+TOMORROW_WORKERS = 4     # limite de concorrencia (rate limit do plano free)
+OPEN_METEO_CHUNK = 8     # coordenadas por chamada batch (falha perde so o bloco)
+OPEN_METEO_WORKERS = 4   # requests individuais quando um bloco falha
+OPEN_METEO_DAILY = ("temperature_2m_max,temperature_2m_min,precipitation_sum,"
+                    "precipitation_probability_max,relative_humidity_2m_mean,wind_speed_10m_max")
 
 # ── Regioes agricolas ─────────────────────────────────────────────
 REGIONS = {
@@ -87,7 +106,7 @@ def fetch_tomorrow_io(lat, lon, api_key):
         data = resp.json()
         daily = data.get("timelines", {}).get("daily", [])
         forecast = []
-        for day in daily[:15]:
+        for day in daily[:FORECAST_DAYS]:
             vals = day.get("values", {})
             forecast.append({
                 "date": day.get("time", "")[:10],
@@ -104,84 +123,198 @@ def fetch_tomorrow_io(lat, lon, api_key):
         print(f"    [WARN] Tomorrow.io: {e}")
         return None
 
-def fetch_open_meteo(lat, lon):
-    """Fallback: Open-Meteo 16-day forecast (free, no key)"""
+def _parse_open_meteo(data):
+    daily = data.get("daily", {})
+    dates = daily.get("time", [])
+    forecast = []
+    for i, d in enumerate(dates[:FORECAST_DAYS]):
+        forecast.append({
+            "date": d,
+            "temp_max": daily.get("temperature_2m_max", [None])[i],
+            "temp_min": daily.get("temperature_2m_min", [None])[i],
+            "temp_avg": round(((daily.get("temperature_2m_max", [0])[i] or 0) + (daily.get("temperature_2m_min", [0])[i] or 0)) / 2, 1),
+            "precip_mm": daily.get("precipitation_sum", [0])[i] or 0,
+            "precip_prob": daily.get("precipitation_probability_max", [0])[i] or 0,
+            "humidity": daily.get("relative_humidity_2m_mean", [0])[i] or 0,
+            "wind_kmh": round((daily.get("wind_speed_10m_max", [0])[i] or 0), 1),
+        })
+    return forecast
+
+def fetch_open_meteo_batch(coords):
+    """Open-Meteo 16 dias para varias coordenadas numa chamada: {(lat, lon): forecast}"""
+    if not coords:
+        return {}
     try:
         url = "https://api.open-meteo.com/v1/forecast"
         params = {
-            "latitude": lat,
-            "longitude": lon,
-            "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,precipitation_probability_max,relative_humidity_2m_mean,wind_speed_10m_max",
+            "latitude": ",".join(str(lat) for lat, _ in coords),
+            "longitude": ",".join(str(lon) for _, lon in coords),
+            "daily": OPEN_METEO_DAILY,
             "forecast_days": 16,
             "timezone": "auto",
         }
-        resp = requests.get(url, params=params, timeout=15)
+        resp = requests.get(url, params=params, timeout=20)
         if resp.status_code != 200:
-            return None
+            print(f"    [WARN] Open-Meteo batch ({len(coords)} coords): HTTP {resp.status_code}")
+            return {}
         data = resp.json()
-        daily = data.get("daily", {})
-        dates = daily.get("time", [])
-        forecast = []
-        for i, d in enumerate(dates[:15]):
-            forecast.append({
-                "date": d,
-                "temp_max": daily.get("temperature_2m_max", [None])[i],
-                "temp_min": daily.get("temperature_2m_min", [None])[i],
-                "temp_avg": round(((daily.get("temperature_2m_max", [0])[i] or 0) + (daily.get("temperature_2m_min", [0])[i] or 0)) / 2, 1),
-                "precip_mm": daily.get("precipitation_sum", [0])[i] or 0,
-                "precip_prob": daily.get("precipitation_probability_max", [0])[i] or 0,
-                "humidity": daily.get("relative_humidity_2m_mean", [0])[i] or 0,
-                "wind_kmh": round((daily.get("wind_speed_10m_max", [0])[i] or 0), 1),
-            })
-        return forecast
+        if isinstance(data, dict):      # uma coordenada -> objeto, varias -> lista
+            data = [data]
+        return {c: _parse_open_meteo(d) for c, d in zip(coords, data)}
     except Exception as e:
         print(f"    [WARN] Open-Meteo: {e}")
-        return None
+        return {}
 
-def detect_alerts(forecast, config):
-    """Detect agricultural weather alerts from forecast data"""
-    alerts = []
-    if not forecast:
-        return alerts
-
-    # Check frost
-    frost_thresh = config.get("frost_below_c")
-    if frost_thresh is not None:
-        frost_days = [f for f in forecast[:7] if f.get("temp_min") is not None and f["temp_min"] <= frost_thresh]
-        if frost_days:
-            min_t = min(f["temp_min"] for f in frost_days)
-            alerts.append({
-                "type": "GEADA",
-                "severity": "ALTA" if min_t <= frost_thresh - 3 else "MEDIA",
-                "message": f"Risco de geada nos proximos 7 dias (min {min_t:.1f}C em {frost_days[0]['date']})",
-                "days_affected": len(frost_days)
-            })
+def fetch_open_meteo(lat, lon):
+    """Fallback: Open-Meteo 16-day forecast (free, no key)"""
+    return fetch_open_meteo_batch([(lat, lon)]).get((lat, lon))
+
+# ── Cache por rodada do modelo ────────────────────────────────────
+def forecast_run(now=None):
+    """Rodada corrente (YYYYMMDDHH, HH em 00/06/12/18 UTC)."""
+    now = now or datetime.now(timezone.utc)
+    return f"{now:%Y%m%d}{now.hour // RUN_HOURS * RUN_HOURS:02d}"
+
+def load_cache(run):
+    """Entradas da rodada `run` ({"fonte|lat|lon": forecast}); rodadas antigas sao descartadas."""
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache.get("forecasts", {}) if cache.get("run") == run else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(run, forecasts):
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp = CACHE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"run": run, "forecasts": forecasts}, f)
+        os.replace(tmp, CACHE_PATH)
+    except OSError as e:
+        print(f"    [WARN] cache de previsao nao salvo: {e}")
+
+def fetch_forecasts(regions, tomorrow_key=None):
+    """
+    Previsao de todas as regioes: cache da rodada -> Tomorrow.io (concorrente)
+    -> Open-Meteo (batch em blocos de OPEN_METEO_CHUNK para o que faltar;
+    coordenada de bloco que falhou vai em request individual).
+    Retorna {regiao: (forecast, fonte)}; regiao sem dados fica de fora.
+    """
+    run = forecast_run()
+    cache = load_cache(run)
+    sources = (["tomorrow.io"] if tomorrow_key else []) + ["open-meteo"]
+    out = {}
+    for key, reg in regions.items():
+        for src in sources:
+            hit = cache.get(f"{src}|{reg['lat']}|{reg['lon']}")
+            if hit:
+                out[key] = (hit, src)
+                break
+    if out:
+        print(f"  [CACHE] {len(out)} regioes da rodada {run}")
 
-    # Check drought (low precip in 7 days)
-    drought_thresh = config.get("drought_precip_mm_7d")
-    if drought_thresh is not None:
-        precip_7d = sum(f.get("precip_mm", 0) for f in forecast[:7])
-        if precip_7d < drought_thresh:
+    missing = [k for k in regions if k not in out]
+    if tomorrow_key and missing:
+        with ThreadPoolExecutor(max_workers=min(TOMORROW_WORKERS, len(missing))) as pool:
+            got = pool.map(lambda k: fetch_tomorrow_io(regions[k]["lat"], regions[k]["lon"], tomorrow_key), missing)
+            for k, forecast in zip(missing, got):
+                if forecast:
+                    out[k] = (forecast, "tomorrow.io")
+        missing = [k for k in regions if k not in out]
+
+    if missing:
+        coords = [(regions[k]["lat"], regions[k]["lon"]) for k in missing]
+        batch = {}
+        for i in range(0, len(coords), OPEN_METEO_CHUNK):
+            batch.update(fetch_open_meteo_batch(coords[i:i + OPEN_METEO_CHUNK]))
+        failed = [c for c in coords if not batch.get(c)]
+        if failed:
+            print(f"  [WARN] Open-Meteo batch sem {len(failed)} regioes -> requests individuais")
+            with ThreadPoolExecutor(max_workers=min(OPEN_METEO_WORKERS, len(failed))) as pool:
+                batch.update(zip(failed, pool.map(lambda c: fetch_open_meteo(*c), failed)))
+        for k, c in zip(missing, coords):
+            if batch.get(c):
+                out[k] = (batch[c], "open-meteo")
+
+    for k, (forecast, src) in out.items():
+        cache[f"{src}|{regions[k]['lat']}|{regions[k]['lon']}"] = forecast
+    save_cache(run, cache)
+    return out
+
+# ── Alertas (vetorizado) ──────────────────────────────────────────
+def forecast_matrix(forecasts, field, days=FORECAST_DAYS, fill=np.nan):
+    """Matriz (n_regioes, days) de um campo; dias ausentes/None = fill."""
+    m = np.full((len(forecasts), days), fill, dtype=float)
+    for i, forecast in enumerate(forecasts):
+        vals = [f.get(field) for f in forecast[:days]]
+        m[i, :len(vals)] = [fill if v is None else v for v in vals]
+    return m
+
+def detect_alerts_all(forecasts, configs):
+    """
+    Alertas de geada/seca/excesso hidrico para todas as regioes de uma vez.
+    forecasts/configs: listas alinhadas. Retorna (alertas por regiao, stats).
+    """
+    tmin = forecast_matrix(forecasts, "temp_min")
+    tmax = forecast_matrix(forecasts, "temp_max")
+    precip = forecast_matrix(forecasts, "precip_mm", fill=0.0)
+    p7 = precip[:, :7].sum(axis=1)
+    p15 = precip.sum(axis=1)
+    t7, x7 = tmin[:, :7], tmax[:, :7]
+    tmin7 = np.where(np.isnan(t7).all(axis=1), 99.0, np.where(np.isnan(t7), np.inf, t7).min(axis=1))
+    tmax7 = np.where(np.isnan(x7).all(axis=1), -99.0, np.where(np.isnan(x7), -np.inf, x7).max(axis=1))
+
+    all_alerts = []
+    for i, (forecast, config) in enumerate(zip(forecasts, configs)):
+        alerts = []
+        if not forecast:
+            all_alerts.append(alerts)
+            continue
+
+        # Check frost
+        frost_thresh = config.get("frost_below_c")
+        if frost_thresh is not None:
+            frost = tmin[i, :7] <= frost_thresh          # NaN -> False
+            if frost.any():
+                min_t = tmin[i, :7][frost].min()
+                first = int(np.argmax(frost))
+                alerts.append({
+                    "type": "GEADA",
+                    "severity": "ALTA" if min_t <= frost_thresh - 3 else "MEDIA",
+                    "message": f"Risco de geada nos proximos 7 dias (min {min_t:.1f}C em {forecast[first]['date']})",
+                    "days_affected": int(frost.sum())
+                })
+
+        # Check drought (low precip in 7 days)
+        drought_thresh = config.get("drought_precip_mm_7d")
+        if drought_thresh is not None and p7[i] < drought_thresh:
             alerts.append({
                 "type": "SECA",
-                "severity": "ALTA" if precip_7d < drought_thresh * 0.3 else "MEDIA",
-                "message": f"Precipitacao acumulada 7d: {precip_7d:.1f}mm (limiar: {drought_thresh}mm)",
-                "precip_7d_mm": round(precip_7d, 1)
+                "severity": "ALTA" if p7[i] < drought_thresh * 0.3 else "MEDIA",
+                "message": f"Precipitacao acumulada 7d: {p7[i]:.1f}mm (limiar: {drought_thresh}mm)",
+                "precip_7d_mm": round(float(p7[i]), 1)
             })
 
-    # Check flooding (excess precip in 7 days)
-    flood_thresh = config.get("flood_precip_mm_7d")
-    if flood_thresh is not None:
-        precip_7d = sum(f.get("precip_mm", 0) for f in forecast[:7])
-        if precip_7d > flood_thresh:
+        # Check flooding (excess precip in 7 days)
+        flood_thresh = config.get("flood_precip_mm_7d")
+        if flood_thresh is not None and p7[i] > flood_thresh:
             alerts.append({
                 "type": "EXCESSO_HIDRICO",
-                "severity": "ALTA" if precip_7d > flood_thresh * 1.5 else "MEDIA",
-                "message": f"Excesso hidrico previsto: {precip_7d:.1f}mm em 7 dias (limiar: {flood_thresh}mm)",
-                "precip_7d_mm": round(precip_7d, 1)
+                "severity": "ALTA" if p7[i] > flood_thresh * 1.5 else "MEDIA",
+                "message": f"Excesso hidrico previsto: {p7[i]:.1f}mm em 7 dias (limiar: {flood_thresh}mm)",
+                "precip_7d_mm": round(float(p7[i]), 1)
             })
+        all_alerts.append(alerts)
+
+    stats = {"precip_7d": p7, "precip_15d": p15, "temp_min_7d": tmin7, "temp_max_7d": tmax7}
+    return all_alerts, stats
 
-    return alerts
+def detect_alerts(forecast, config):
+    """Detect agricultural weather alerts from forecast data"""
+    if not forecast:
+        return []
+    return detect_alerts_all([forecast], [config])[0][0]
 
 def fetch_enso_status():
     """Fetch ENSO status from NOAA CPC"""
@@ -236,38 +369,33 @@ def main():
     else:
         print(f"  [INFO] No Tomorrow.io key — using Open-Meteo (free)")
 
+    # ENSO em paralelo com as previsoes
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        enso_future = pool.submit(fetch_enso_status)
+        print(f"  Fetching forecasts for {len(REGIONS)} regions...")
+        fetched = fetch_forecasts(REGIONS, tomorrow_key if use_tomorrow else None)
+        enso = enso_future.result()
+
+    keys = [k for k in REGIONS if k in fetched]
+    forecasts = [fetched[k][0] for k in keys]
+    all_alerts, stats = detect_alerts_all(forecasts, [REGIONS[k].get("alerts_config", {}) for k in keys])
+
     regions_data = {}
     for key, reg in REGIONS.items():
-        print(f"  [{reg['label']}] Fetching forecast...")
         lat, lon = reg["lat"], reg["lon"]
-
-        # Try Tomorrow.io first, fallback to Open-Meteo
-        forecast = None
-        source = "open-meteo"
-        if use_tomorrow:
-            forecast = fetch_tomorrow_io(lat, lon, tomorrow_key)
-            if forecast:
-                source = "tomorrow.io"
-
-        if not forecast:
-            forecast = fetch_open_meteo(lat, lon)
-            source = "open-meteo"
-
-        if not forecast:
+        if key not in fetched:
             print(f"    [WARN] No data for {key}")
             regions_data[key] = {"label": reg["label"], "lat": lat, "lon": lon, "error": "no data"}
             continue
 
+        i = keys.index(key)
+        forecast, source = fetched[key]
+        alerts = all_alerts[i]
+        precip_7d = float(stats["precip_7d"][i])
+
         # Current (today's forecast)
         today_f = forecast[0] if forecast else {}
 
-        # 7-day accumulated precip
-        precip_7d = sum(f.get("precip_mm", 0) for f in forecast[:7])
-        precip_15d = sum(f.get("precip_mm", 0) for f in forecast[:15])
-
-        # Detect alerts
-        alerts = detect_alerts(forecast, reg.get("alerts_config", {}))
-
         regions_data[key] = {
             "label": reg["label"],
             "lat": lat, "lon": lon,
@@ -281,19 +409,16 @@ def main():
             },
             "forecast_15d": forecast,
             "precip_7d_mm": round(precip_7d, 1),
-            "precip_15d_mm": round(precip_15d, 1),
-            "temp_min_7d": round(min((f.get("temp_min") or 99) for f in forecast[:7]), 1),
-            "temp_max_7d": round(max((f.get("temp_max") or -99) for f in forecast[:7]), 1),
+            "precip_15d_mm": round(float(stats["precip_15d"][i]), 1),
+            "temp_min_7d": round(float(stats["temp_min_7d"][i]), 1),
+            "temp_max_7d": round(float(stats["temp_max_7d"][i]), 1),
             "alerts": alerts,
         }
 
         n_alerts = len(alerts)
         alert_str = f" | {n_alerts} ALERTAS!" if n_alerts else ""
-        print(f"    [OK] {source}: {len(forecast)} dias | Precip 7d: {precip_7d:.0f}mm{alert_str}")
+        print(f"    [OK] {reg['label']} -- {source}: {len(forecast)} dias | Precip 7d: {precip_7d:.0f}mm{alert_str}")
 
-    # ENSO status
-    print("  [ENSO] Fetching NOAA CPC...")
-    enso = fetch_enso_status()
     print(f"    [OK] ENSO: {enso['status']} (ONI={enso.get('oni_value','N/A')})")
 
     # Summary
@@ -312,6 +437,14 @@ def main():
     with open(OUT, "w", encoding="utf-8") as f:
         json.dump(output, f, indent=2, ensure_ascii=False)
 
+    # Arquivo historico: previsao desta coleta + observado do dia (1x por dia)
+    try:
+        import weather_archive
+        weather_archive.append_forecasts(regions_data)
+        weather_archive.update()
+    except Exception as e:
+        print(f"  [WARN] weather archive: {e}")
+
     total_alerts = output["total_alerts"]
     print(f"  [OK] Weather saved: {len(regions_data)} regions, {total_alerts} alerts, ENSO={enso['status']}")
 
@@ -0,0 +1,188 @@
+"""
+AgriMacro - Collector Schedule
+Decide se um collector de fonte semanal/mensal precisa rodar neste pass ou
+se o artefato em disco ja tem o ultimo release da fonte.
+
+Regras (RULES) = dia/hora de publicacao (horario de NY) por fonte; os dias
+da semana e temporadas vem do collect_calendar.WEEKLY e as datas do WASDE
+de todas as listas collect_calendar.WASDE_<ano>. Ano sem lista: aviso e
+release aproximado no fallback_day de cada mes. O estado do artefato vem do
+freshness manifest (collected_at / changed_at / hash).
+
+Um collector esta "due" quando:
+  - o artefato nao existe, esta invalido ou passou de max_age_h (fora da
+    temporada, ex.: Crop Progress dez-mar, so se nao existir)
+  - houve um release depois da ultima coleta
+  - coletou apos o release mas o conteudo nao mudou (release atrasado,
+    ex.: COT apos feriado): tenta de novo a cada retry_every_h durante retry_h
+Senao o step e pulado e o artefato em cache e reaproveitado.
+
+Forcar:
+  python pipeline/run_pipeline.py --force-collect            # todos
+  python pipeline/run_pipeline.py --force-collect cot,eia
+  AGRIMACRO_FORCE_COLLECT=all
+
+  python pipeline/collector_schedule.py      # tabela: due/skip e motivo
+"""
+import os
+import re
+import sys
+from datetime import datetime, time as dtime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import collect_calendar
+from collect_calendar import WEEKLY
+from freshness_manifest import entry, parse_ts, refresh
+
+try:
+    from zoneinfo import ZoneInfo
+    NY = ZoneInfo("America/New_York")
+except Exception:            # sem tzdata (Windows): EST fixo
+    NY = timezone(timedelta(hours=-5))
+
+_WEEKLY = {w["name"]: w for w in WEEKLY}
+
+
+def calendar_dates(prefix):
+    """Datas de todas as listas <prefix>_<ano> do collect_calendar, ordenadas."""
+    pattern = re.compile(rf"{prefix}_\d{{4}}$")
+    return sorted(d for name, v in vars(collect_calendar).items() if pattern.match(name) for d in v)
+
+
+WASDE_DATES = calendar_dates("WASDE")
+
+# kind: weekly (dow/temporada do collect_calendar ou proprio), dates, monthly
+RULES = {
+    "cot": {
+        "artifact": "raw/cot_data.json", "kind": "weekly",
+        "calendar": "CFTC COT Release", "at": dtime(15, 30), "max_age_h": 8 * 24,
+    },
+    "eia": {
+        "artifact": "processed/eia_data.json", "kind": "weekly",
+        "calendar": "EIA Petroleum Status", "at": dtime(10, 30), "max_age_h": 8 * 24,
+    },
+    "crop_progress": {
+        "artifact": "processed/crop_progress.json", "kind": "weekly",
+        "calendar": "USDA Crop Progress", "at": dtime(16, 0), "max_age_h": 8 * 24,
+    },
+    "drought_monitor": {
+        "artifact": "processed/drought_monitor.json", "kind": "weekly",
+        "dow": 3, "at": dtime(8, 30), "max_age_h": 8 * 24,
+    },
+    "usda_fas": {
+        "artifact": "processed/usda_fas.json", "kind": "dates",
+        "dates": WASDE_DATES, "fallback_day": 12, "at": dtime(12, 0), "max_age_h": 35 * 24,
+    },
+    "fertilizer": {   # World Bank Pink Sheet: ~2o dia util do mes
+        "artifact": "processed/fertilizer_prices.json", "kind": "monthly",
+        "day": 3, "at": dtime(12, 0), "max_age_h": 35 * 24,
+    },
+}
+RETRY_H = 72          # janela para release atrasado
+RETRY_EVERY_H = 3     # intervalo minimo entre tentativas nessa janela
+
+
+_warned = set()
+
+
+def _release(day, at):
+    return datetime.combine(day, at, NY).astimezone(timezone.utc)
+
+
+def _monthly_release(today, day, at, now):
+    r = _release(today.replace(day=day), at)
+    if r > now:
+        prev = today.replace(day=1) - timedelta(days=1)
+        r = _release(prev.replace(day=day), at)
+    return r
+
+
+def last_release(rule, now=None):
+    """Instante UTC do ultimo release <= now; None fora da temporada."""
+    now = now or datetime.now(timezone.utc)
+    today = now.astimezone(NY).date()
+    kind = rule["kind"]
+    if kind == "weekly":
+        w = _WEEKLY.get(rule.get("calendar"), {})
+        dow = rule.get("dow", w.get("dow"))
+        for back in range(0, 8):
+            d = today - timedelta(days=back)
+            if d.weekday() != dow or _release(d, rule["at"]) > now:
+                continue
+            if w.get("season_only") and not (w["season_start"] <= d.month <= w["season_end"]):
+                return None
+            return _release(d, rule["at"])
+    elif kind == "dates":
+        if rule.get("fallback_day") and not any(s.startswith(f"{today.year}-") for s in rule["dates"]):
+            if today.year not in _warned:
+                _warned.add(today.year)
+                print(f"  [WARN] collect_calendar sem datas de {today.year} -- "
+                      f"release aproximado no dia {rule['fallback_day']} de cada mes")
+            return _monthly_release(today, rule["fallback_day"], rule["at"], now)
+        past = [r for r in (_release(datetime.strptime(s, "%Y-%m-%d").date(), rule["at"]) for s in rule["dates"]) if r <= now]
+        return max(past) if past else None
+    elif kind == "monthly":
+        return _monthly_release(today, rule["day"], rule["at"], now)
+    return None
+
+
+def forced(argv=None):
+    """Fontes forcadas por --force-collect [a,b] ou AGRIMACRO_FORCE_COLLECT."""
+    argv = sys.argv if argv is None else argv
+    spec = None
+    for i, a in enumerate(argv):
+        if a == "--force-collect":
+            nxt = argv[i + 1] if i + 1 < len(argv) else ""
+            spec = nxt if nxt and not nxt.startswith("--") else "all"
+        elif a.startswith("--force-collect="):
+            spec = a.split("=", 1)[1]
+    spec = spec or os.getenv("AGRIMACRO_FORCE_COLLECT", "")
+    return {s.strip().lower() for s in spec.split(",") if s.strip()}
+
+
+def due(source, now=None, force=None, manifest=None):
+    """(True/False, motivo) para o collector `source` de RULES."""
+    rule = RULES.get(source)
+    if rule is None:
+        return True, "sem regra de calendario"
+    force = forced() if force is None else force
+    if "all" in force or source in force:
+        return True, "forcado"
+    now = now or datetime.now(timezone.utc)
+    if manifest is None:
+        try:
+            manifest = refresh([rule["artifact"]])
+        except OSError as exc:
+            return True, f"manifest indisponivel ({exc})"
+    e = entry(rule["artifact"], manifest)
+    if e is None:
+        return True, "sem artefato em cache"
+    if e.get("error"):
+        return True, "artefato invalido"
+    collected = parse_ts(e.get("collected_at"))
+    changed = parse_ts(e.get("changed_at")) or collected
+    age_h = (now - collected).total_seconds() / 3600
+    release = last_release(rule, now)
+    if release is None:
+        return False, "fora da temporada"
+    if age_h > rule["max_age_h"]:
+        return True, f"artefato com {age_h:.0f}h (max {rule['max_age_h']}h)"
+    label = release.astimezone(NY).strftime("%Y-%m-%d %H:%M ET")
+    if changed >= release:
+        return False, f"ja tem o release de {label}"
+    if collected < release:
+        return True, f"novo release {label}"
+    since_release = (now - release).total_seconds() / 3600
+    if since_release >= RETRY_H:
+        return False, f"release {label} sem mudanca; aguardando o proximo"
+    if age_h >= RETRY_EVERY_H:
+        return True, f"release {label} ainda sem dados novos -- tentando de novo"
+    return False, f"release {label} sem mudanca (nova tentativa em {RETRY_EVERY_H - age_h:.1f}h)"
+
+
+if __name__ == "__main__":
+    m = refresh([r["artifact"] for r in RULES.values()])
+    for name in RULES:
+        ok, why = due(name, manifest=m)
+        print(f"  {'DUE ' if ok else 'SKIP'}  {name:<16} {why}")
@@ -0,0 +1,277 @@
+"""
+AgriMacro - Freshness Manifest
+Indice unico de frescor dos dados: um registro por JSON de
+agrimacro-dash/public/data/{raw,processed}, chave "raw/x.json" / "processed/x.json":
+
+  source_ts     data do dado na origem (updated_at, _meta.collected_at, report_date...)
+  collected_at  quando o arquivo foi escrito (record() = agora, refresh() = mtime)
+  changed_at    ultima vez que o conteudo mudou (hash diferente)
+  rows, hash (sha256[:16]), size, mtime_ns, error
+
+Gravado atomicamente (lock + tmp + os.replace) em
+processed/freshness_manifest.json -- o dashboard le em
+/data/processed/freshness_manifest.json.
+
+Escrita:
+  record("processed/cot.json", source_ts="2026-10-14", rows=12)  # collector, valores exatos
+  refresh()          # varre raw/processed por stat; so rele o que mudou
+O run_pipeline assina ManifestUpdater no EventBus: refresh() ao fim de cada
+step, entao todo collector entra no manifesto sem codigo proprio.
+
+Leitura:
+  entry("price_history.json")   # nome simples: raw > processed (como o AA+QA)
+  age_hours(e)                   # pela source_ts, senao collected_at
+
+  python pipeline/freshness_manifest.py          # refresh + tabela por idade
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:          # Windows: msvcrt.locking no 1o byte do .lock
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = Path(__file__).parent.parent / "agrimacro-dash" / "public" / "data"
+DIRS = ("raw", "processed")   # ordem de precedencia para nome simples
+MANIFEST_PATH = DATA_DIR / "processed" / "freshness_manifest.json"
+MANIFEST_VERSION = 1
+
+# campos de data na origem, em ordem de preferencia (topo do JSON e depois _meta)
+SOURCE_TS_FIELDS = ("source_ts", "updated_at", "collected_at", "generated_at",
+                    "timestamp", "report_date", "last_updated", "date")
+ROW_KEYS = ("data", "records", "rows", "items", "series", "contracts")
+SKIP = {MANIFEST_PATH.name, "data_freshness.json"}
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def parse_ts(value):
+    """ISO (com ou sem Z/offset) ou YYYY-MM-DD -> datetime UTC; None se nao reconhecer."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = datetime.strptime(value.strip()[:10], "%Y-%m-%d")
+        except ValueError:
+            return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def extract_source_ts(data):
+    if not isinstance(data, dict):
+        return None
+    meta = data.get("_meta")
+    for field in SOURCE_TS_FIELDS:
+        for holder in (data, meta if isinstance(meta, dict) else {}):
+            dt = parse_ts(holder.get(field))
+            if dt:
+                return dt
+    return None
+
+
+def count_rows(data):
+    if isinstance(data, list):
+        return len(data)
+    if not isinstance(data, dict):
+        return None
+    for k in ROW_KEYS:
+        if isinstance(data.get(k), (list, dict)):
+            return len(data[k])
+    return sum(1 for k in data if not k.startswith("_") and k not in SOURCE_TS_FIELDS)
+
+
+# ── leitura/escrita atomica ──
+
+def load_manifest(path=None):
+    path = Path(path or MANIFEST_PATH)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "updated_at": None, "files": {}}
+
+
+def _save(manifest, path):
+    manifest["updated_at"] = _now().isoformat(timespec="seconds")
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)   # ja tenta por ~10s
+            return
+        except OSError:
+            continue
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _locked(path=None):
+    """Le-modifica-grava sob lock: collectors em paralelo nao perdem registros."""
+    path = Path(path or MANIFEST_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a+") as lock:
+        _lock(lock)
+        try:
+            manifest = load_manifest(path)
+            before = json.dumps(manifest["files"], sort_keys=True)
+            yield manifest
+            if json.dumps(manifest["files"], sort_keys=True) != before:
+                _save(manifest, path)
+        finally:
+            _unlock(lock)
+
+
+def _scan_file(path, prev, collected_at=None, source_ts=None, rows=None):
+    """Registro atualizado de um arquivo; so decodifica o JSON se o hash mudou."""
+    st = path.stat()
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    e = dict(prev or {})
+    e.update(size=st.st_size, mtime_ns=st.st_mtime_ns,
+             collected_at=collected_at or datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(timespec="seconds"))
+    if e.get("hash") != digest or source_ts is not None or rows is not None:
+        e["hash"] = digest
+        if prev is None or prev.get("hash") != digest:
+            e["changed_at"] = e["collected_at"]
+        data = None
+        if source_ts is None or rows is None:
+            try:
+                data = json.loads(raw)
+                e.pop("error", None)
+            except ValueError as exc:
+                e["error"] = f"invalid_json: {exc}"[:200]
+        if source_ts is None:
+            ts = extract_source_ts(data)
+        else:
+            ts = parse_ts(source_ts) if isinstance(source_ts, str) else source_ts
+        e["source_ts"] = ts.astimezone(timezone.utc).isoformat(timespec="seconds") if ts else None
+        e["rows"] = rows if rows is not None else count_rows(data)
+    return e
+
+
+def _key(path):
+    path = Path(path)
+    return f"{path.parent.name}/{path.name}"
+
+
+def _path(key):
+    return DATA_DIR / key
+
+
+def record(key, source_ts=None, rows=None, path=None):
+    """
+    Registra o arquivo recem-gravado por um collector (collected_at = agora).
+    key: "processed/x.json" ou Path do arquivo. source_ts: str ISO/datetime.
+    """
+    key = _key(key) if isinstance(key, Path) else key
+    fp = _path(key)
+    with _locked(path) as manifest:
+        manifest["files"][key] = _scan_file(fp, manifest["files"].get(key),
+                                            collected_at=_now().isoformat(timespec="seconds"),
+                                            source_ts=source_ts, rows=rows)
+        return manifest["files"][key]
+
+
+def refresh(keys=None, path=None):
+    """
+    Sincroniza o manifesto com o disco: arquivos com (tamanho, mtime) iguais
+    nao sao relidos; hash igual nao e decodificado. keys=None varre raw e
+    processed inteiros (e remove o que sumiu); senao so as chaves dadas.
+    """
+    if keys is None:
+        found = {}
+        for d in DIRS:
+            base = DATA_DIR / d
+            if base.is_dir():
+                for de in os.scandir(base):
+                    if de.name.endswith(".json") and de.name not in SKIP and de.is_file():
+                        found[f"{d}/{de.name}"] = Path(de.path)
+    else:
+        found = {k: _path(k) for k in keys if _path(k).is_file()}
+    if not found and not Path(path or MANIFEST_PATH).exists():
+        return load_manifest(path)
+    with _locked(path) as manifest:
+        files = manifest["files"]
+        for key, fp in found.items():
+            prev = files.get(key)
+            try:
+                st = fp.stat()
+                if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+                    continue
+                files[key] = _scan_file(fp, prev)
+            except OSError:
+                continue
+        gone = (set(files) - set(found)) if keys is None else {k for k in keys if k in files and k not in found}
+        for key in gone:
+            del files[key]
+        return manifest
+
+
+def entry(name, manifest=None):
+    """Registro de "raw/x.json", ou de "x.json" buscando em DIRS (raw > processed)."""
+    files = (manifest or load_manifest())["files"]
+    if "/" in name:
+        return files.get(name)
+    for d in DIRS:
+        if f"{d}/{name}" in files:
+            return files[f"{d}/{name}"]
+    return None
+
+
+def age_hours(e, now=None, field=None):
+    """Horas desde source_ts (ou collected_at se nao houver); field forca um dos dois."""
+    if not e:
+        return None
+    ts = parse_ts(e.get(field)) if field else (parse_ts(e.get("source_ts")) or parse_ts(e.get("collected_at")))
+    if ts is None:
+        return None
+    return ((now or _now()) - ts).total_seconds() / 3600
+
+
+class ManifestUpdater:
+    """Assinante do EventBus: refresh() a cada step_end (stat de ~100 arquivos)."""
+
+    def __call__(self, event):
+        if event["type"] == "step_end":
+            refresh()
+
+
+if __name__ == "__main__":
+    m = refresh()
+    now = _now()
+    rows = sorted(m["files"].items(), key=lambda kv: -(age_hours(kv[1], now) or 0))
+    print(f"  {'arquivo':<42}{'idade h':>9}{'linhas':>8}  source_ts")
+    for key, e in rows:
+        age = age_hours(e, now)
+        print(f"  {key[:41]:<42}{(f'{age:.1f}' if age is not None else '-'):>9}"
+              f"{(e.get('rows') if e.get('rows') is not None else '-'):>8}  {e.get('source_ts') or e.get('error') or '-'}")
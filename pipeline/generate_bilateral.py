@@ -570,6 +570,26 @@ def run_bci(data_dir: Path, lcs_result: dict = None) -> dict:
         return {"status": "ERROR", "error": str(e)}
 
 
+# ============================================================
+# HISTORY: LCS + BCI TIME SERIES
+# ============================================================
+
+def run_history(data_dir: Path, lcs_result: dict, bci_result: dict) -> dict:
+    """LCS and BCI over every date with inputs (vectorized, archive-backed)."""
+    print("\n[+] HISTORY (LCS / BCI)")
+    try:
+        from bilateral_history import build_history
+        history = build_history(data_dir, lcs_result, bci_result)
+        latest = history["latest"]
+        print(f"  {len(history['dates'])} dates | obs {history['observations']}")
+        if latest["lcs_spread_percentile"] is not None:
+            print(f"  LCS percentile: {latest['lcs_spread_percentile']:.0f} ({latest['lcs_date']})")
+        return {"status": "OK", **history}
+    except Exception as e:
+        print(f"  History Error: {e}")
+        return {"status": "ERROR", "error": str(e)}
+
+
 # ============================================================
 # VIDEO NARRATION HELPER
 # ============================================================
@@ -769,6 +789,7 @@ def main():
     lcs = run_lcs(data_dir)
     ert = run_ert(data_dir)
     bci = run_bci(data_dir, lcs_result=lcs)
+    history = run_history(data_dir, lcs, bci)
     
     # Generate narrations
     narration_en = generate_video_narration(lcs, ert, bci, lang="en")
@@ -784,6 +805,7 @@ def main():
         "lcs": lcs,
         "ert": ert,
         "bci": bci,
+        "history": history,
         
         # Summary for quick dashboard access
         "summary": {
@@ -793,6 +815,7 @@ def main():
             "ert_br_share": ert.get("br_market_share_pct") if ert.get("status") == "OK" else None,
             "bci_score": bci.get("bci_score") if bci.get("status") == "OK" else None,
             "bci_signal": bci.get("bci_signal") if bci.get("status") == "OK" else None,
+            "lcs_percentile": history.get("latest", {}).get("lcs_spread_percentile") if history.get("status") == "OK" else None,
         },
         
         # Video narrations
@@ -110,7 +110,7 @@ def score_stocks(stocks_data, sym):
 
 
 def score_seasonality(season_data, sym):
-    """Sazonalidade forte no mês = +15pts. Desvio >10% = significativo."""
+    """Sazonalidade forte no mês = +15pts, ponderada pela confiabilidade (bootstrap) do mês."""
     if not season_data:
         return 0, None
     sym_data = season_data.get(sym, {})
@@ -126,10 +126,20 @@ def score_seasonality(season_data, sym):
         return 0, None
     detail = f"Saz {avg:+.1f}%"
     if abs(avg) >= 3:
-        return 15, detail
-    if abs(avg) >= 1.5:
-        return 8, detail
-    return 3, detail
+        pts = 15
+    elif abs(avg) >= 1.5:
+        pts = 8
+    else:
+        pts = 3
+
+    stats = sym_data.get("monthly_stats", {})
+    rel = (stats.get("reliability") or [None] * 12)[month_idx]
+    if rel is None:
+        return pts, detail
+    hit = (stats.get("hit_rate") or [None] * 12)[month_idx]
+    if hit is not None:
+        detail += f" (hit {hit:.0f}%, confiab. {rel * 100:.0f}%)"
+    return int(round(pts * (0.5 + 0.5 * rel))), detail
 
 
 def score_weather(weather_data, sym):
@@ -0,0 +1,151 @@
+"""
+AgriMacro - Pipeline Event Bus
+Eventos estruturados de cada step do run_pipeline (inicio/fim, duracao,
+status, registros produzidos) publicados num barramento em processo.
+
+Assinantes recebem cada evento na hora; o JsonlSink grava tudo em
+pipeline/logs/pipeline_events.jsonl (uma linha por evento, flush imediato),
+que o endpoint SSE /pipeline/events do main.py acompanha em tempo real.
+
+Evento:
+  {"run_id", "seq", "ts", "type", ...}
+  type = run_start | step_start | step_end | log | run_end
+  step_start: step, title
+  step_end:   step, key, status, duration_s, records, error
+  log:        level, msg
+  run_end:    elapsed_s, ok, warnings, errors
+
+Uso:
+  from pipeline_events import EVENTS
+  EVENTS.subscribe(lambda ev: print(ev["type"]))
+"""
+import json
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+LOGS_DIR = Path(__file__).parent / "logs"
+EVENTS_FILE = LOGS_DIR / "pipeline_events.jsonl"
+
+STEP_RE = re.compile(r"^Step (\w+)/\d+: (.*)$")
+RECORD_KEYS = ("count", "records", "symbols", "files")
+
+
+class EventBus:
+    """Publica eventos para os assinantes; um assinante com erro nao derruba o run."""
+
+    def __init__(self):
+        self._subs = []
+        self.run_id = None
+        self.seq = 0
+
+    def subscribe(self, fn):
+        self._subs.append(fn)
+        return fn
+
+    def unsubscribe(self, fn):
+        if fn in self._subs:
+            self._subs.remove(fn)
+
+    def emit(self, type_, **fields):
+        self.seq += 1
+        event = {
+            "run_id": self.run_id,
+            "seq": self.seq,
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "type": type_,
+            **fields,
+        }
+        for fn in list(self._subs):
+            try:
+                fn(event)
+            except Exception as e:
+                print(f"  [events] assinante falhou: {e}")
+        return event
+
+    def start_run(self):
+        self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.seq = 0
+        return self.emit("run_start")
+
+
+class JsonlSink:
+    """Assinante que anexa cada evento ao JSONL (flush por linha para quem faz tail)."""
+
+    def __init__(self, path=EVENTS_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def __call__(self, event):
+        self._f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def _records(result):
+    for k in RECORD_KEYS:
+        v = result.get(k)
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return v
+        if isinstance(v, (list, set, tuple, dict)):
+            return len(v)
+    return None
+
+
+class StepTracker:
+    """
+    Converte o fluxo do runner em eventos de step: log("Step N/..: titulo")
+    abre o step, results[key] = {...} fecha com status/registros/erro.
+    Um step aberto sem resultado e fechado quando o proximo comeca.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.current = None   # (step, title, t0)
+
+    def on_log(self, msg, level):
+        m = STEP_RE.match(msg)
+        if m:
+            self.start(m.group(1), m.group(2))
+        else:
+            self.bus.emit("log", level=level, msg=msg)
+
+    def start(self, step, title):
+        if self.current:
+            self.end(None, {"status": "DONE"})
+        self.current = (step, title, time.perf_counter())
+        self.bus.emit("step_start", step=step, title=title)
+
+    def end(self, key, result):
+        step, title, t0 = self.current or (None, None, None)
+        self.current = None
+        result = result if isinstance(result, dict) else {}
+        self.bus.emit(
+            "step_end",
+            step=step,
+            key=key,
+            title=title,
+            status=result.get("status"),
+            duration_s=round(time.perf_counter() - t0, 3) if t0 else None,
+            records=_records(result),
+            error=(str(result["error"])[:300] if result.get("error") else None),
+        )
+
+
+class TrackedResults(dict):
+    """dict de resultados do runner: cada atribuicao fecha o step corrente."""
+
+    def __init__(self, tracker):
+        super().__init__()
+        self.tracker = tracker
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.tracker.end(key, value)
+
+
+EVENTS = EventBus()
@@ -0,0 +1,318 @@
+"""
+AgriMacro - Pipeline Run Metrics
+Mede cada step do run_pipeline a partir dos eventos do pipeline_events:
+wall/CPU, RSS (atual e pico), bytes lidos/escritos, requisicoes HTTP por
+host (contagem e latencia) e tempo gasto decodificando JSON.
+
+Um registro por run em pipeline/logs/run_metrics.jsonl:
+  {"run_id", "ts", "elapsed_s", "steps": {key: {wall_s, cpu_s, ...}}}
+
+HTTP e JSON sao medidos por hooks leves instalados so durante o run:
+http.client (cobre requests/urllib3 e urllib) e json.loads (cobre json.load
+e Response.json). AGRIMACRO_TRACEMALLOC=1 adiciona o pico do tracemalloc
+por step (mais caro: ~2x em codigo que aloca muito).
+
+Uso:
+  python pipeline/pipeline_metrics.py                # ultimo run vs mediana dos 30 anteriores
+  python pipeline/pipeline_metrics.py --runs 30 --threshold 1.5 --strict
+"""
+import http.client
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:          # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+LOGS_DIR = Path(__file__).parent / "logs"
+METRICS_FILE = LOGS_DIR / "run_metrics.jsonl"
+
+BASELINE_RUNS = 30
+REGRESSION_RATIO = 1.5
+# diferencas absolutas abaixo disso nunca sao regressao (ruido)
+MIN_DELTA = {"wall_s": 2.0, "cpu_s": 2.0, "peak_rss_mb": 50.0, "http_n": 5, "json_s": 0.5}
+
+
+# ── contadores de processo ──
+
+def _rss_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1e6
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    """Pico de RSS do processo desde o inicio (high-water mark)."""
+    if resource is not None:
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return kb / 1e6 if sys.platform == "darwin" else kb * 1024 / 1e6
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1e6
+    return None
+
+
+def _io_bytes():
+    """(lidos, escritos) em bytes, incluindo cache de pagina; None sem suporte."""
+    try:
+        with open("/proc/self/io") as f:
+            io = dict(line.split(": ") for line in f.read().splitlines())
+        return int(io["rchar"]), int(io["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    if psutil is not None:
+        try:
+            c = psutil.Process().io_counters()
+            return c.read_bytes, c.write_bytes
+        except (AttributeError, psutil.Error):
+            pass
+    return None
+
+
+def _child_cpu():
+    if resource is None:
+        return 0.0
+    r = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return r.ru_utime + r.ru_stime
+
+
+def _snapshot():
+    return {
+        "wall": time.perf_counter(),
+        "cpu": time.process_time(),
+        "child_cpu": _child_cpu(),
+        "peak_rss": _peak_rss_mb(),
+        "io": _io_bytes(),
+    }
+
+
+# ── hooks HTTP / JSON ──
+
+class _Hooks:
+    """Patches de http.client e json.loads que alimentam o step corrente."""
+
+    def __init__(self):
+        self.http = defaultdict(lambda: [0, 0.0, 0.0])   # host -> [n, total_s, max_s]
+        self.json_s = 0.0
+        self.json_n = 0
+        self._orig = None
+
+    def reset(self):
+        self.http.clear()
+        self.json_s = 0.0
+        self.json_n = 0
+
+    def install(self):
+        if self._orig is not None:
+            return
+        hooks = self
+        orig_put = http.client.HTTPConnection.putrequest
+        orig_resp = http.client.HTTPConnection.getresponse
+        orig_loads = json.loads
+        self._orig = (orig_put, orig_resp, orig_loads)
+
+        def putrequest(conn, *args, **kwargs):
+            conn._agm_t0 = time.perf_counter()
+            return orig_put(conn, *args, **kwargs)
+
+        def getresponse(conn, *args, **kwargs):
+            try:
+                return orig_resp(conn, *args, **kwargs)
+            finally:
+                t0 = getattr(conn, "_agm_t0", None)
+                if t0 is not None:
+                    dt = time.perf_counter() - t0
+                    h = hooks.http[conn.host]
+                    h[0] += 1
+                    h[1] += dt
+                    h[2] = max(h[2], dt)
+                    conn._agm_t0 = None
+
+        def loads(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return orig_loads(*args, **kwargs)
+            finally:
+                hooks.json_s += time.perf_counter() - t0
+                hooks.json_n += 1
+
+        http.client.HTTPConnection.putrequest = putrequest
+        http.client.HTTPConnection.getresponse = getresponse
+        json.loads = loads
+
+    def uninstall(self):
+        if self._orig is None:
+            return
+        http.client.HTTPConnection.putrequest, http.client.HTTPConnection.getresponse, json.loads = self._orig
+        self._orig = None
+
+
+class StepMetrics:
+    """
+    Assinante do EventBus: step_start tira um snapshot dos contadores,
+    step_end grava o delta, run_end anexa o run a run_metrics.jsonl.
+    """
+
+    def __init__(self, path=METRICS_FILE, trace_malloc=None):
+        self.path = Path(path)
+        self.hooks = _Hooks()
+        self.trace_malloc = (os.getenv("AGRIMACRO_TRACEMALLOC") == "1"
+                             if trace_malloc is None else trace_malloc)
+        self.steps = {}
+        self._start = None
+        self.hooks.install()
+        if self.trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __call__(self, event):
+        kind = event["type"]
+        if kind == "step_start":
+            self.hooks.reset()
+            if self.trace_malloc:
+                tracemalloc.reset_peak()
+            self._start = _snapshot()
+        elif kind == "step_end" and self._start is not None:
+            key = event.get("key") or f"step_{event.get('step')}"
+            self.steps[key] = self._measure(event)
+            self._start = None
+        elif kind == "run_end":
+            self.write(event)
+
+    def _measure(self, event):
+        s0, s1 = self._start, _snapshot()
+        m = {
+            "step": event.get("step"),
+            "status": event.get("status"),
+            "wall_s": round(s1["wall"] - s0["wall"], 3),
+            "cpu_s": round(s1["cpu"] - s0["cpu"], 3),
+            "child_cpu_s": round(s1["child_cpu"] - s0["child_cpu"], 3),
+            "rss_mb": _round(_rss_mb()),
+            "peak_rss_mb": _round(s1["peak_rss"]),
+            "peak_rss_growth_mb": _round(s1["peak_rss"] - s0["peak_rss"]) if s0["peak_rss"] is not None else None,
+        }
+        if s0["io"] and s1["io"]:
+            m["read_mb"] = _round((s1["io"][0] - s0["io"][0]) / 1e6)
+            m["write_mb"] = _round((s1["io"][1] - s0["io"][1]) / 1e6)
+        if self.trace_malloc:
+            m["tracemalloc_peak_mb"] = _round(tracemalloc.get_traced_memory()[1] / 1e6)
+        m["http_n"] = sum(h[0] for h in self.hooks.http.values())
+        m["http"] = {
+            host: {"n": n, "avg_ms": round(total / n * 1000, 1), "max_ms": round(mx * 1000, 1)}
+            for host, (n, total, mx) in sorted(self.hooks.http.items(), key=lambda kv: -kv[1][1])
+        }
+        m["json_s"] = round(self.hooks.json_s, 3)
+        m["json_n"] = self.hooks.json_n
+        return m
+
+    def write(self, event):
+        record = {
+            "run_id": event.get("run_id"),
+            "ts": event.get("ts") or datetime.now().isoformat(timespec="seconds"),
+            "elapsed_s": event.get("elapsed_s"),
+            "steps": self.steps,
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"  [metrics] falha ao gravar {self.path}: {e}")
+
+    def close(self):
+        self.hooks.uninstall()
+        if self.trace_malloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _round(v, nd=1):
+    return round(v, nd) if v is not None else None
+
+
+# ── relatorio ──
+
+def load_runs(path=METRICS_FILE):
+    if not Path(path).exists():
+        return []
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return [r for r in runs if r.get("steps")]
+
+
+def compare(runs, n=BASELINE_RUNS, ratio=REGRESSION_RATIO):
+    """
+    Ultimo run contra a mediana dos `n` anteriores, por step e metrica.
+    Retorna [(step, metrica, atual, mediana, razao, regressao)].
+    """
+    if not runs:
+        return []
+    today, history = runs[-1], runs[-n - 1:-1]
+    rows = []
+    for key, m in today["steps"].items():
+        for metric, min_delta in MIN_DELTA.items():
+            cur = m.get(metric)
+            past = [r["steps"][key].get(metric) for r in history if key in r["steps"]]
+            past = [v for v in past if v is not None]
+            if cur is None or not past:
+                continue
+            med = statistics.median(past)
+            r = cur / med if med else None
+            regression = cur - med > min_delta and (r is None or r >= ratio)
+            rows.append((key, metric, cur, med, r, regression))
+    return rows
+
+
+def report(n=BASELINE_RUNS, ratio=REGRESSION_RATIO, path=METRICS_FILE):
+    runs = load_runs(path)
+    if not runs:
+        print(f"  Nenhum run em {path}")
+        return []
+    today = runs[-1]
+    history = len(runs[-n - 1:-1])
+    print(f"  Run {today['run_id']} ({today.get('elapsed_s')}s) vs mediana de {history} runs anteriores")
+    print(f"  {'step':<22}{'wall s':>9}{'med':>9}{'cpu s':>9}{'pico MB':>9}{'http':>6}{'json s':>8}")
+    steps = sorted(today["steps"].items(), key=lambda kv: -(kv[1].get("wall_s") or 0))
+    rows = compare(runs, n, ratio)
+    meds = {(k, metric): med for k, metric, _, med, _, _ in rows}
+    for key, m in steps:
+        med = meds.get((key, "wall_s"))
+        print(f"  {key[:21]:<22}{m.get('wall_s', 0):>9.1f}{(f'{med:.1f}' if med is not None else '-'):>9}"
+              f"{m.get('cpu_s', 0):>9.1f}{m.get('peak_rss_mb') or 0:>9.0f}{m.get('http_n', 0):>6}"
+              f"{m.get('json_s', 0):>8.2f}")
+    regressions = [row for row in rows if row[5]]
+    if regressions:
+        print(f"\n  REGRESSOES (>= {ratio}x a mediana):")
+        for key, metric, cur, med, r, _ in regressions:
+            print(f"    {key}: {metric} {cur} vs mediana {med}" + (f" ({r:.1f}x)" if r else ""))
+    else:
+        print("\n  [OK] Nenhuma regressao contra a mediana")
+    return regressions
+
+
+if __name__ == "__main__":
+    def _arg(flag, default, cast):
+        return cast(sys.argv[sys.argv.index(flag) + 1]) if flag in sys.argv else default
+
+    found = report(_arg("--runs", BASELINE_RUNS, int), _arg("--threshold", REGRESSION_RATIO, float))
+    sys.exit(1 if found and "--strict" in sys.argv else 0)
@@ -0,0 +1,212 @@
+"""
+AgriMacro - Per-step Sampling Profiler
+Perfila steps escolhidos do run_pipeline dentro do contexto real do run.
+
+  python pipeline/run_pipeline.py --profile 24,28b        # por numero do step
+  python pipeline/run_pipeline.py --profile correlation,pdf   # trecho do titulo
+  AGRIMACRO_PROFILE=all python pipeline/run_pipeline.py
+
+Saida em pipeline/logs/profiles/<YYYY-MM-DD>/<HHMMSS>_step<N>.*:
+  .speedscope.json   abrir em https://www.speedscope.app
+  .collapsed.txt     stacks colapsadas (flamegraph.pl / speedscope)
+  .top.txt           top-N funcoes por tempo proprio e inclusivo
+
+Usa pyinstrument se instalado; senao um amostrador proprio (thread que le
+sys._current_frames() a cada PROFILE_INTERVAL_S). Sem --profile nada e
+instalado: custo zero.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+PROFILES_DIR = Path(__file__).parent / "logs" / "profiles"
+PROFILE_INTERVAL_S = 0.005
+TOP_N = 30
+STEP_ID = re.compile(r"\d+[a-z]?")   # "24", "28b": seletor de numero de step
+
+
+def parse_selection(spec):
+    """'24,28b,PDF' -> {'24', '28b', 'pdf'}; vazio/None -> set()."""
+    return {t.strip().lower() for t in (spec or "").split(",") if t.strip()}
+
+
+class _Sampler(threading.Thread):
+    """Amostra a pilha de uma thread em intervalo fixo; conta stacks identicas."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_S):
+        super().__init__(daemon=True, name="agrimacro-profiler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.elapsed = 0.0
+        self._halt = threading.Event()
+
+    def run(self):
+        t0 = time.perf_counter()
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                co = frame.f_code
+                stack.append((co.co_name, co.co_filename, co.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+        self.elapsed = time.perf_counter() - t0
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+    @property
+    def sample_seconds(self):
+        """Intervalo efetivo: o GIL atrasa amostras, entao divide o tempo real."""
+        n = sum(self.stacks.values())
+        return self.elapsed / n if n else self.interval
+
+
+def _frame_name(f):
+    return f"{f[0]} ({Path(f[1]).name}:{f[2]})"
+
+
+def write_collapsed(stacks, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        for stack, n in stacks.most_common():
+            fh.write(";".join(_frame_name(f) for f in stack) + f" {n}\n")
+
+
+def write_speedscope(stacks, path, name, interval):
+    frames, index, samples, weights = [], {}, [], []
+    for stack, n in stacks.items():
+        row = []
+        for f in stack:
+            if f not in index:
+                index[f] = len(frames)
+                frames.append({"name": f[0], "file": f[1], "line": f[2]})
+            row.append(index[f])
+        samples.append(row)
+        weights.append(round(n * interval, 6))
+    doc = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "agrimacro pipeline_profiler",
+        "name": name,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": name, "unit": "seconds",
+            "startValue": 0, "endValue": round(sum(weights), 6),
+            "samples": samples, "weights": weights,
+        }],
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(doc, fh)
+
+
+def top_functions(stacks, n=TOP_N):
+    """[(frame, self_samples, total_samples)] ordenado por tempo proprio."""
+    own, total = Counter(), Counter()
+    for stack, k in stacks.items():
+        own[stack[-1]] += k
+        for f in set(stack):
+            total[f] += k
+    return [(f, own[f], total[f]) for f, _ in own.most_common(n)]
+
+
+def write_top(stacks, path, title, interval):
+    n_samples = sum(stacks.values()) or 1
+    lines = [f"{title}", f"{n_samples} amostras x {interval * 1000:.1f} ms = {n_samples * interval:.1f}s", "",
+             f"{'self %':>7} {'total %':>8} {'self s':>8}  funcao"]
+    for f, own, tot in top_functions(stacks):
+        lines.append(f"{own / n_samples * 100:>7.1f} {tot / n_samples * 100:>8.1f} "
+                     f"{own * interval:>8.2f}  {_frame_name(f)}  {f[1]}")
+    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+class StepProfiler:
+    """
+    Assinante do EventBus: step_start de um step selecionado liga o
+    profiler, step_end desliga e grava os arquivos.
+    Seleciona por numero do step ('24', '28b'), trecho do titulo ou 'all'.
+    """
+
+    def __init__(self, selection, root=PROFILES_DIR, interval=PROFILE_INTERVAL_S):
+        self.selection = parse_selection(selection) if isinstance(selection, str) else set(selection)
+        self.root = Path(root)
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.active = None   # (step, title, profiler)
+        self.written = []
+
+    def matches(self, step, title):
+        """Numero de step ("1", "27b") compara exato; o resto e trecho do titulo."""
+        if "all" in self.selection:
+            return True
+        step, title = str(step).lower(), (title or "").lower()
+        return any(t == step if STEP_ID.fullmatch(t) else t in title for t in self.selection)
+
+    def __call__(self, event):
+        kind = event["type"]
+        if kind == "step_start" and self.active is None and self.matches(event.get("step"), event.get("title")):
+            self.active = (event.get("step"), event.get("title"), self._start())
+        elif kind == "step_end" and self.active is not None:
+            step, title, prof = self.active
+            self.active = None
+            self._save(step, title, prof)
+        elif kind == "run_end" and self.written:
+            print(f"  [profile] {len(self.written)} perfis em {self.written[0].parent}")
+
+    def _start(self):
+        if pyinstrument is not None:
+            prof = pyinstrument.Profiler(interval=self.interval)
+            prof.start()
+            return prof
+        prof = _Sampler(self.thread_id, self.interval)
+        prof.start()
+        return prof
+
+    def _save(self, step, title, prof):
+        prof.stop()
+        now = datetime.now()
+        folder = self.root / now.strftime("%Y-%m-%d")
+        folder.mkdir(parents=True, exist_ok=True)
+        stem = folder / f"{now.strftime('%H%M%S')}_step{step}"
+        name = f"Step {step}: {title}"
+        try:
+            if isinstance(prof, _Sampler):
+                write_speedscope(prof.stacks, f"{stem}.speedscope.json", name, prof.sample_seconds)
+                write_collapsed(prof.stacks, f"{stem}.collapsed.txt")
+                write_top(prof.stacks, f"{stem}.top.txt", name, prof.sample_seconds)
+            else:
+                from pyinstrument.renderers import SpeedscopeRenderer
+                Path(f"{stem}.speedscope.json").write_text(prof.output(SpeedscopeRenderer()), encoding="utf-8")
+                Path(f"{stem}.top.txt").write_text(prof.output_text(unicode=True, show_all=False), encoding="utf-8")
+            self.written.append(Path(f"{stem}.speedscope.json"))
+        except Exception as e:
+            print(f"  [profile] falha ao gravar perfil do step {step}: {e}")
+
+    def close(self):
+        if self.active is not None:
+            step, title, prof = self.active
+            self.active = None
+            self._save(step, title, prof)
+
+
+def selection_from_args(argv=None):
+    """--profile STEP[,STEP] (ou --profile=...) com fallback para AGRIMACRO_PROFILE."""
+    argv = sys.argv if argv is None else argv
+    for i, a in enumerate(argv):
+        if a == "--profile" and i + 1 < len(argv):
+            return parse_selection(argv[i + 1])
+        if a.startswith("--profile="):
+            return parse_selection(a.split("=", 1)[1])
+    return parse_selection(os.getenv("AGRIMACRO_PROFILE"))
@@ -2,13 +2,27 @@
 AgriMacro v3.0 - Seasonality Processor
 Calculates seasonal patterns with SMOOTHED 5-year average
 + Multi-window monthly returns (full vs modern periods)
+
+NumPy engine: dates parsed once to datetime64, day-of-year / month
+reductions via bincount, smoothing via convolution, every window of a
+symbol computed in one pass. Long-history results are memoized against the
+sha1 of the Yahoo cache file, so unchanged caches are not even parsed.
+
+Per symbol it also emits, from the long Yahoo cache:
+  seasonal_bands  p10/p25/p50/p75/p90 of YTD % paths by day-of-year (all years)
+  monthly_stats   hit rate, bootstrap 90% CI and reliability per month, over
+                  the same "full" window as monthly_returns
+computed for all symbols in one vectorized pass.
 """
+import hashlib
 import json
+import warnings
 from datetime import datetime, timedelta
 from pathlib import Path
-from collections import defaultdict
 import sys, os
 
+import numpy as np
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from config.commodities import COMMODITIES
 
@@ -39,39 +53,138 @@ SEASON_WINDOWS = {
 # Cache dir for long-term history
 LONG_CACHE = Path(__file__).parent / "cache" / "long_history"
 
+# Bump when the long-history computation changes (invalidates memo files)
+ENGINE_VERSION = 3
 
-def fetch_long_history(symbol):
-    """Download long-term daily history from Yahoo Finance (max period)."""
-    cache_file = LONG_CACHE / f"{symbol}_long.json"
-    # Use cache if fresh (< 7 days old)
+# Distribution statistics
+BAND_PERCENTILES = (10, 25, 50, 75, 90)
+BAND_START_DAYS = 10        # a year enters the bands only if it starts by Jan 10
+BOOTSTRAP_SAMPLES = 1000
+MIN_YEARS_STATS = 3
+
+
+def _long_cache_path(symbol):
+    return LONG_CACHE / f"{symbol}_long.json"
+
+
+def refresh_long_history(symbol):
+    """Make sure the Yahoo long-history cache is fresh (< 7 days). Returns its path or None."""
+    cache_file = _long_cache_path(symbol)
     if cache_file.exists():
         age = datetime.now().timestamp() - cache_file.stat().st_mtime
         if age < 7 * 86400:
-            with open(cache_file, encoding="utf-8") as f:
-                return json.load(f)
+            return cache_file
 
     yahoo_sym = COMMODITIES.get(symbol, {}).get("yahoo")
     if not yahoo_sym:
-        return []
+        return cache_file if cache_file.exists() else None
 
     try:
         import yfinance as yf
         df = yf.Ticker(yahoo_sym).history(period="max")
         if df.empty:
-            return []
+            return cache_file if cache_file.exists() else None
         df = df.reset_index()
         if hasattr(df["Date"].dt, "tz") and df["Date"].dt.tz is not None:
             df["Date"] = df["Date"].dt.tz_localize(None)
-        bars = [{"date": row["Date"].strftime("%Y-%m-%d"), "close": float(row["Close"])}
-                for _, row in df.iterrows() if row["Close"] > 0]
-        # Save cache
+        df = df[df["Close"] > 0]
+        bars = [{"date": d, "close": float(c)}
+                for d, c in zip(df["Date"].dt.strftime("%Y-%m-%d"), df["Close"])]
         LONG_CACHE.mkdir(parents=True, exist_ok=True)
         with open(cache_file, "w", encoding="utf-8") as f:
             json.dump(bars, f)
-        return bars
+        return cache_file
     except Exception as e:
         print(f"    [{symbol}] Yahoo long history error: {e}")
+        return cache_file if cache_file.exists() else None
+
+
+def fetch_long_history(symbol):
+    """Download long-term daily history from Yahoo Finance (max period)."""
+    path = refresh_long_history(symbol)
+    if not path:
         return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def to_arrays(bars):
+    """Bars -> (dates datetime64[D], closes float64), dropping unparseable rows."""
+    dates, closes = [], []
+    for b in bars:
+        if not isinstance(b, dict):
+            continue
+        d = b.get("date")
+        c = b.get("close")
+        if isinstance(d, str) and len(d) >= 10 and c is not None:
+            dates.append(d[:10])
+            closes.append(c)
+    try:
+        d = np.array(dates, dtype="datetime64[D]")
+    except ValueError:
+        d = np.array([_safe_date(x) for x in dates], dtype="datetime64[D]")
+    c = np.asarray(closes, dtype=float)
+    ok = ~np.isnat(d) & ~np.isnan(c)
+    return d[ok], c[ok]
+
+
+def _safe_date(s):
+    try:
+        return np.datetime64(s, "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def year_and_doy(d):
+    y0 = d.astype("datetime64[Y]")
+    year = y0.astype(int) + 1970
+    doy = (d - y0.astype("datetime64[D]")).astype(int) + 1
+    return year, doy
+
+
+def month_end_returns(d, c):
+    """
+    Month-end closes -> monthly returns (%).
+    Returns (year, month, ret) for every month whose previous month is present.
+    """
+    ym = d.astype("datetime64[M]").astype(int)
+    last = np.r_[ym[1:] != ym[:-1], True] if len(ym) else np.zeros(0, dtype=bool)
+    m_ym, m_close = ym[last], c[last]
+    has_prev = np.r_[False, np.diff(m_ym) == 1]
+    prev_close = np.r_[np.nan, m_close[:-1]]
+    keep = has_prev & (prev_close > 0)
+    ret = (m_close[keep] - prev_close[keep]) / prev_close[keep] * 100
+    m_ym = m_ym[keep]
+    return m_ym // 12 + 1970, m_ym % 12 + 1, ret
+
+
+def window_mask(year, month, start_y, end_y):
+    """Months inside [start_y, end_y] whose previous month is also inside."""
+    prev_year = np.where(month == 1, year - 1, year)
+    return (year >= start_y) & (year <= end_y) & (prev_year >= start_y)
+
+
+def full_window(symbol):
+    """(start_y, end_y) of the "full" window of `symbol`, or None."""
+    return next(((s, e) for label, s, e in SEASON_WINDOWS.get(symbol) or [] if label == "full"), None)
+
+
+def calc_monthly_returns_windows(bars, windows):
+    """
+    Average monthly return (%) per calendar month for every (label, start_y, end_y)
+    window in one pass. A month counts only if it and its previous month are both
+    inside the window. Returns {label: [12 floats Jan..Dec]}.
+    """
+    d, c = to_arrays(bars) if not isinstance(bars, tuple) else bars
+    year, month, ret = month_end_returns(d, c)
+    out = {}
+    for label, start_y, end_y in windows:
+        m = window_mask(year, month, start_y, end_y)
+        sums = np.bincount(month[m] - 1, weights=ret[m], minlength=12)
+        cnts = np.bincount(month[m] - 1, minlength=12)
+        avg = np.divide(sums, cnts, out=np.zeros(12), where=cnts > 0)
+        out[label] = [round(float(v), 2) for v in avg]
+    return out
 
 
 def calc_monthly_returns(bars, start_year, end_year):
@@ -79,127 +192,299 @@ def calc_monthly_returns(bars, start_year, end_year):
 
     Returns list of 12 floats (Jan..Dec) representing mean monthly return %.
     """
-    # Group closes by year-month
-    monthly_closes = defaultdict(list)
-    for b in bars:
-        try:
-            dt = datetime.strptime(b["date"][:10], "%Y-%m-%d")
-            if dt.year < start_year or dt.year > end_year:
-                continue
-            monthly_closes[(dt.year, dt.month)].append(b["close"])
-        except Exception:
-            continue
+    return calc_monthly_returns_windows(bars, [("w", start_year, end_year)])["w"]
 
-    # Get month-end close for each year-month
-    month_end = {}
-    for (y, m), closes in sorted(monthly_closes.items()):
-        month_end[(y, m)] = closes[-1]  # last trading day of month
-
-    # Calculate monthly returns
-    returns_by_month = defaultdict(list)  # month → list of returns
-    for (y, m), close in month_end.items():
-        # Previous month
-        prev_m = m - 1 if m > 1 else 12
-        prev_y = y if m > 1 else y - 1
-        if (prev_y, prev_m) in month_end:
-            prev_close = month_end[(prev_y, prev_m)]
-            if prev_close > 0:
-                ret = (close - prev_close) / prev_close * 100
-                returns_by_month[m].append(ret)
-
-    # Average per month (1-indexed → 0-indexed list)
-    result = []
-    for month in range(1, 13):
-        rets = returns_by_month.get(month, [])
-        avg = round(sum(rets) / len(rets), 2) if rets else 0.0
-        result.append(avg)
 
-    return result
+def smooth_values(values, window=7):
+    """Centered moving average (edges shrink), via convolution."""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n < window:
+        return values
+    kernel = np.ones(window)
+    sums = np.convolve(values, kernel, mode="same")
+    counts = np.convolve(np.ones(n), kernel, mode="same")
+    return sums / counts
+
 
 def smooth_series(data: list, window: int = 7) -> list:
     """Apply rolling average to smooth the series"""
     if len(data) < window:
         return data
-    
-    smoothed = []
-    for i in range(len(data)):
-        start = max(0, i - window // 2)
-        end = min(len(data), i + window // 2 + 1)
-        values = [d["close"] for d in data[start:end]]
-        avg = sum(values) / len(values)
-        smoothed.append({"day": data[i]["day"], "close": round(avg, 4)})
-    
-    return smoothed
+    smoothed = smooth_values([d["close"] for d in data], window)
+    return [{"day": d["day"], "close": round(float(v), 4)} for d, v in zip(data, smoothed)]
+
+
+def _boot_seed(symbol, d, c, seed):
+    """Bootstrap seed from the symbol and its data: same input, same CI, whatever the batch."""
+    h = hashlib.sha1(f"{seed}:{symbol}:".encode())
+    h.update(d.astype("datetime64[D]").astype(np.int64).tobytes())
+    h.update(np.asarray(c, dtype=float).tobytes())
+    return int(h.hexdigest()[:16], 16)
+
+
+def _file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def window_stats(d, c, windows):
+    """monthly_returns*, window_* and n_years_* fields for one symbol."""
+    first_year = int(d[0].astype("datetime64[Y]").astype(int)) + 1970
+    last_year = int(d[-1].astype("datetime64[Y]").astype(int)) + 1970
+    returns = calc_monthly_returns_windows((d, c), windows)
+    result = {"_bars": int(len(d)), "_first_year": first_year, "_last_year": last_year}
+    for label, start_y, end_y in windows:
+        actual_start = max(start_y, first_year)
+        actual_end = min(end_y, last_year)
+        n_years = actual_end - actual_start + 1 if actual_end >= actual_start else 0
+        if label == "full":
+            result["monthly_returns"] = returns[label]
+            result["window_full"] = f"{actual_start}-{actual_end}"
+            result["n_years_full"] = n_years
+        else:
+            result[f"monthly_returns_{label}"] = returns[label]
+            result[f"window_{label}"] = f"{actual_start}-{actual_end}"
+            result[f"n_years_{label}"] = n_years
+    return result
+
+
+def _year_grid(d, c):
+    """
+    Year x day-of-year grid of YTD % change (forward-filled inside each year).
+    Only years that start trading in the first BAND_START_DAYS are kept.
+    Returns array (Y, 366).
+    """
+    year, doy = year_and_doy(d)
+    years = np.unique(year)
+    first_doy = np.full(len(years), 999)
+    np.minimum.at(first_doy, np.searchsorted(years, year), doy)
+    keep_years = years[first_doy <= BAND_START_DAYS]
+    if not len(keep_years):
+        return np.empty((0, 366))
+
+    sel = np.isin(year, keep_years)
+    yi = np.searchsorted(keep_years, year[sel])
+    grid = np.full((len(keep_years), 366), np.nan)
+    grid[yi, doy[sel] - 1] = c[sel]
+
+    valid = ~np.isnan(grid)
+    last_day = np.where(valid.any(axis=1), 365 - np.argmax(valid[:, ::-1], axis=1), -1)
+    idx = np.where(valid, np.arange(366), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    grid = np.take_along_axis(grid, idx, axis=1)
+    grid[np.arange(366)[None, :] > last_day[:, None]] = np.nan
+
+    first = grid[np.arange(len(keep_years)), np.argmax(~np.isnan(grid), axis=1)]
+    return (grid / first[:, None] - 1) * 100
+
+
+def bulk_distribution_stats(arrays, n_boot=BOOTSTRAP_SAMPLES, seed=42):
+    """
+    Distribution statistics for many symbols at once ({sym: (dates, closes)}).
+    Per symbol:
+      seasonal_bands: p10/p25/p50/p75/p90 of YTD % paths by day-of-year
+      monthly_stats:  hit rate, bootstrap 90% CI of the mean monthly return,
+                      reliability (0..1, bootstrap sign agreement) and n per month,
+                      over the symbol's "full" window (as monthly_returns)
+    Paths and monthly returns of all symbols are padded into one array so the
+    percentiles run as single vectorized reductions. The bootstrap draws per
+    symbol and month from that cell's own n, with an RNG seeded from the
+    symbol and its data, so results do not depend on the rest of the batch.
+    """
+    syms = list(arrays)
+    if not syms:
+        return {}
+
+    grids = [_year_grid(d, c) for d, c in arrays.values()]
+    rets = []
+    for sym, (d, c) in arrays.items():
+        year, month, ret = month_end_returns(d, c)
+        win = full_window(sym)
+        if win:
+            m = window_mask(year, month, *win)
+            month, ret = month[m], ret[m]
+        rets.append((month, ret))
+
+    # ── Percentile envelopes: (S, Y, 366) -> (S, 5, 366) ──
+    y_max = max(max(len(g) for g in grids), 1)
+    paths = np.full((len(syms), y_max, 366), np.nan)
+    for i, g in enumerate(grids):
+        paths[i, :len(g)] = g
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # all-NaN days
+        bands = np.nanpercentile(paths, BAND_PERCENTILES, axis=1)       # (5, S, 366)
+    n_paths = (~np.isnan(paths)).sum(axis=1)                              # (S, 366)
+
+    # ── Monthly returns padded: (S, 12, N) ──
+    n_max = 1
+    for month, ret in rets:
+        if len(month):
+            n_max = max(n_max, int(np.bincount(month - 1, minlength=12).max()))
+    vals = np.full((len(syms), 12, n_max), np.nan)
+    for i, (month, ret) in enumerate(rets):
+        for m in range(12):
+            r = ret[month == m + 1]
+            vals[i, m, :len(r)] = r
+    n = (~np.isnan(vals)).sum(axis=2)                                     # (S, 12)
+    with np.errstate(all="ignore"):
+        mean = np.nansum(vals, axis=2) / n
+        hit = (vals > 0).sum(axis=2) / n
+
+        # Bootstrap: resample each cell's n returns with replacement, B times
+        boot = np.full((len(syms), 12, n_boot), np.nan)                   # (S, 12, B)
+        for i, (sym, (d, c)) in enumerate(arrays.items()):
+            rng = np.random.default_rng(_boot_seed(sym, d, c, seed))
+            for m in range(12):
+                k = int(n[i, m])
+                if k:
+                    boot[i, m] = vals[i, m, rng.integers(0, k, (n_boot, k))].mean(axis=1)
+        ci_low, ci_high = np.percentile(boot, [5, 95], axis=2)
+        agree = (np.sign(boot) == np.sign(mean)[..., None]).mean(axis=2)
+        reliability = np.clip((agree - 0.5) * 2, 0, 1)
+
+    def _r(a, nd=2):
+        return [None if np.isnan(v) else round(float(v), nd) for v in a]
+
+    out = {}
+    for i, sym in enumerate(syms):
+        ok = n[i] >= MIN_YEARS_STATS
+        out[sym] = {
+            "seasonal_bands": {
+                "days": list(range(1, 367)),
+                "n_years": int(len(grids[i])),
+                **{f"p{q}": _r(np.where(n_paths[i] >= MIN_YEARS_STATS, bands[k, i], np.nan))
+                   for k, q in enumerate(BAND_PERCENTILES)},
+            },
+            "monthly_stats": {
+                "n": [int(v) for v in n[i]],
+                "mean": _r(np.where(ok, mean[i], np.nan)),
+                "hit_rate": _r(np.where(ok, hit[i] * 100, np.nan), 1),
+                "ci90_low": _r(np.where(ok, ci_low[i], np.nan)),
+                "ci90_high": _r(np.where(ok, ci_high[i], np.nan)),
+                "reliability": _r(np.where(ok, reliability[i], np.nan)),
+            },
+        }
+    return out
+
+
+def _memo(symbol, windows):
+    """(memo_file, key, cached result or None) for the long cache of `symbol`."""
+    path = refresh_long_history(symbol)
+    if not path or not path.exists():
+        return None, None, None, None
+    key = f"{ENGINE_VERSION}:{_file_digest(path)}:{json.dumps(windows)}"
+    memo_file = LONG_CACHE / f"{symbol}_seasonal.json"
+    if memo_file.exists():
+        try:
+            with open(memo_file, encoding="utf-8") as f:
+                memo = json.load(f)
+            if memo.get("key") == key:
+                return path, memo_file, key, memo["result"]
+        except (OSError, ValueError):
+            pass
+    return path, memo_file, key, None
+
+
+def long_history_stats(symbols, fallback=None):
+    """
+    Long-history statistics for `symbols`, memoized per symbol in
+    {symbol}_seasonal.json against the Yahoo cache file hash + window config.
+    Cache misses are loaded and their distribution stats computed in one bulk
+    call. Symbols without a long cache use `fallback[sym]` arrays (not memoized).
+    Returns {sym: dict}.
+    """
+    results, pending, memo_to_write = {}, {}, {}
+    for symbol in symbols:
+        windows = SEASON_WINDOWS.get(symbol)
+        path, memo_file, key, cached = _memo(symbol, windows)
+        if cached is not None:
+            results[symbol] = cached
+            continue
+        if path is not None:
+            with open(path, encoding="utf-8") as f:
+                d, c = to_arrays(json.load(f))
+            if len(d) >= 250:
+                pending[symbol] = (d, c)
+                memo_to_write[symbol] = (memo_file, key)
+                continue
+        if fallback and symbol in fallback and len(fallback[symbol][0]):
+            pending[symbol] = fallback[symbol]
+
+    dist = bulk_distribution_stats(pending)
+    for symbol, (d, c) in pending.items():
+        res = window_stats(d, c, SEASON_WINDOWS[symbol]) if symbol in memo_to_write else {}
+        res.update(dist.get(symbol, {}))
+        res["_source"] = "long_history" if symbol in memo_to_write else "price_history"
+        results[symbol] = res
+        if symbol in memo_to_write:
+            memo_file, key = memo_to_write[symbol]
+            try:
+                LONG_CACHE.mkdir(parents=True, exist_ok=True)
+                with open(memo_file, "w", encoding="utf-8") as f:
+                    json.dump({"key": key, "result": res}, f)
+            except OSError:
+                pass
+    return results
+
+
+def _points(dates, doy, closes):
+    return [{"day": int(dy), "close": float(cl), "date": str(dt)}
+            for dt, dy, cl in zip(dates, doy, closes)]
+
+
+def process_symbol_series(candles, current_year):
+    """Year series + smoothed 5-year day-of-year average for one symbol."""
+    d, c = to_arrays(candles)
+    year, doy = year_and_doy(d)
+    first_year = current_year - 4
+    years_to_include = [str(y) for y in range(first_year, current_year + 1)]
+
+    # Average per day-of-year over the last 5 years (bincount), then smoothed
+    recent = year >= first_year
+    sums = np.bincount(doy[recent], weights=c[recent], minlength=367)
+    cnts = np.bincount(doy[recent], minlength=367)
+    days = np.flatnonzero(cnts)
+    avg = np.round(sums[days] / cnts[days], 4)
+    smoothed = smooth_values(avg, window=7) if len(avg) >= 7 else avg
+    avg_smoothed = [{"day": int(dy), "close": round(float(v), 4)} for dy, v in zip(days, smoothed)]
+
+    # Per-year series, sorted by day (stable for duplicate days)
+    series = {}
+    present = []
+    for y in years_to_include:
+        m = year == int(y)
+        if not m.any():
+            continue
+        present.append(y)
+        order = np.argsort(doy[m], kind="stable")
+        pts = _points(d[m][order], doy[m][order], c[m][order])
+        series["current" if y == str(current_year) else y] = pts
+
+    years_list = [y for y in present if y != str(current_year)]
+    if str(current_year) in present:
+        years_list.append("current")
+    years_list.append("average")
+
+    series["average"] = avg_smoothed
+    return years_list, series
+
 
 def process_seasonality(price_file: Path) -> dict:
     """Process seasonality from price history"""
     with open(price_file) as f:
         prices = json.load(f)
-    
+
     result = {}
     current_year = datetime.now().year
-    years_to_include = [str(y) for y in range(current_year - 4, current_year + 1)]  # Last 5 years
-    
+
     for symbol, candles in prices.items():
         if not candles:
             continue
-        
-        # Group by year and day-of-year
-        by_year = defaultdict(list)
-        by_day = defaultdict(list)  # For calculating average
-        
-        for candle in candles:
-            try:
-                date = datetime.strptime(candle["date"], "%Y-%m-%d")
-                year_str = str(date.year)
-                day_of_year = date.timetuple().tm_yday
-                
-                point = {"day": day_of_year, "close": candle["close"], "date": candle["date"]}
-                
-                if year_str in years_to_include:
-                    by_year[year_str].append(point)
-                
-                # Collect all years for average (last 5 years only)
-                if date.year >= current_year - 4:
-                    by_day[day_of_year].append(candle["close"])
-                    
-            except Exception:
-                continue
-        
-        # Calculate average per day (smoothed)
-        avg_raw = []
-        for day in sorted(by_day.keys()):
-            values = by_day[day]
-            if values:
-                avg_raw.append({"day": day, "close": round(sum(values) / len(values), 4)})
-        
-        # Apply smoothing to average (window=7 for weekly smoothing)
-        avg_smoothed = smooth_series(avg_raw, window=7)
-        
-        # Determine current year series (partial year)
-        current_series = by_year.get(str(current_year), [])
-        
-        # Build years list in order
-        years_list = [y for y in years_to_include if y in by_year]
-        if str(current_year) in years_list:
-            years_list.remove(str(current_year))
-            years_list.append("current")
-        years_list.append("average")
-        
-        # Build series dict
-        series = {}
-        for y in years_to_include:
-            if y in by_year and y != str(current_year):
-                # Sort by day
-                series[y] = sorted(by_year[y], key=lambda x: x["day"])
-        
-        # Current year as "current"
-        if current_series:
-            series["current"] = sorted(current_series, key=lambda x: x["day"])
-        
-        # Smoothed average
-        series["average"] = avg_smoothed
-        
+        years_list, series = process_symbol_series(candles, current_year)
         result[symbol] = {
             "symbol": symbol,
             "status": "OK",
@@ -207,38 +492,20 @@ def process_seasonality(price_file: Path) -> dict:
             "series": series
         }
 
-    # ── Multi-window monthly returns from long-term history ──
-    for symbol in list(result.keys()):
-        if symbol.startswith("_"):
-            continue
-        windows = SEASON_WINDOWS.get(symbol)
-        if not windows:
-            continue
-
-        print(f"  [{symbol}] Fetching long-term history...", end=" ")
-        bars = fetch_long_history(symbol)
-        if not bars or len(bars) < 250:
-            print(f"skip ({len(bars)} bars)")
+    # ── Multi-window monthly returns + distribution stats (all symbols in bulk) ──
+    symbols = [sym for sym in result if not sym.startswith("_") and sym in SEASON_WINDOWS]
+    fallback = {sym: to_arrays(prices[sym]) for sym in symbols}
+    stats = long_history_stats(symbols, fallback)
+    for symbol in symbols:
+        st = stats.get(symbol)
+        if not st:
+            print(f"  [{symbol}] skip (no long history)")
             continue
-
-        first_year = int(bars[0]["date"][:4])
-        last_year = int(bars[-1]["date"][:4])
-        print(f"OK ({len(bars)} bars, {first_year}-{last_year})")
-
-        for label, start_y, end_y in windows:
-            returns = calc_monthly_returns(bars, start_y, end_y)
-            actual_start = max(start_y, first_year)
-            actual_end = min(end_y, last_year)
-            n_years = actual_end - actual_start + 1 if actual_end >= actual_start else 0
-
-            if label == "full":
-                result[symbol]["monthly_returns"] = returns
-                result[symbol]["window_full"] = f"{actual_start}-{actual_end}"
-                result[symbol]["n_years_full"] = n_years
-            else:
-                result[symbol][f"monthly_returns_{label}"] = returns
-                result[symbol][f"window_{label}"] = f"{actual_start}-{actual_end}"
-                result[symbol][f"n_years_{label}"] = n_years
+        if st.get("_source") == "long_history":
+            print(f"  [{symbol}] OK ({st['_bars']} bars, {st['_first_year']}-{st['_last_year']})")
+        else:
+            print(f"  [{symbol}] stats from price_history only (no long cache)")
+        result[symbol].update({k: v for k, v in st.items() if not k.startswith("_")})
 
     return result
 
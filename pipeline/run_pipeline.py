@@ -7,6 +7,18 @@ Steps:
   CORE (4-11): COT, Seasonality, Spreads, Parities, Stocks, Physical US, Physical Intl, Daily Reading
   OPTIONAL (12-25): BCB/IBGE, EIA, USDA FAS, Livestock PSD/Weekly, Bilateral, News, Weather, Crop Progress, Macro, Google Trends, FedWatch, Correlations, Grok
   GENERATION (26-31): Calendar, Daily Report, Grain Ratios, Intel Synthesis, PDF Report, Video Script, Video MP4
+
+Cada step publica eventos estruturados (pipeline_events.EVENTS), gravados em
+pipeline/logs/pipeline_events.jsonl e transmitidos via SSE em /pipeline/events.
+Metricas por step (wall/CPU, RSS, I/O, HTTP, JSON) vao para
+pipeline/logs/run_metrics.jsonl -- relatorio: python pipeline/pipeline_metrics.py
+--profile STEP[,STEP] (ou AGRIMACRO_PROFILE) perfila os steps escolhidos em
+pipeline/logs/profiles/<data>/ -- ver pipeline_profiler.py
+Ao fim de cada step o manifesto de frescor (processed/freshness_manifest.json)
+e sincronizado com o disco -- ver freshness_manifest.py
+Collectors de fontes semanais/mensais (COT, EIA, FAS, Crop Progress, Drought,
+Fertilizer) so rodam quando ha release novo -- ver collector_schedule.py;
+--force-collect [fonte,...] forca a coleta.
 """
 import os
 import sys
@@ -17,12 +29,48 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
+from pipeline_events import EVENTS, JsonlSink, StepTracker, TrackedResults
+from pipeline_metrics import StepMetrics
+from pipeline_profiler import StepProfiler, selection_from_args
+from freshness_manifest import ManifestUpdater
+from collector_schedule import due as collector_due
+
+TRACKER = StepTracker(EVENTS)
+
 def log(msg, level="INFO"):
     ts = datetime.now().strftime("%H:%M:%S")
     icons = {"INFO": "\u25c6", "OK": "\u2714", "WARN": "!", "ERR": "\u2718"}
-    print(f"[{ts}] [{icons.get(level, '\u25c6')}] {msg}")
+    print(f"[{ts}] [{icons.get(level, '\u25c6')}] {msg}", flush=True)
+    TRACKER.on_log(msg, level)
 
 def main():
+    try:
+        sink = EVENTS.subscribe(JsonlSink())
+    except OSError as e:
+        sink = None
+        print(f"  [events] sem log JSONL: {e}")
+    metrics = EVENTS.subscribe(StepMetrics())
+    manifest = EVENTS.subscribe(ManifestUpdater())
+    selection = selection_from_args()
+    profiler = EVENTS.subscribe(StepProfiler(selection)) if selection else None
+    EVENTS.start_run()
+    try:
+        return run_steps()
+    except BaseException as e:
+        EVENTS.emit("run_end", error=str(e)[:300] or type(e).__name__)
+        raise
+    finally:
+        if profiler:
+            EVENTS.unsubscribe(profiler)
+            profiler.close()
+        EVENTS.unsubscribe(manifest)
+        EVENTS.unsubscribe(metrics)
+        metrics.close()
+        if sink:
+            EVENTS.unsubscribe(sink)
+            sink.close()
+
+def run_steps():
     log("AgriMacro Pipeline v3.2 starting...")
     start = time.time()
 
@@ -35,7 +83,7 @@ def main():
     proc_path.mkdir(parents=True, exist_ok=True)
     reports_path.mkdir(parents=True, exist_ok=True)
 
-    results = {}
+    results = TrackedResults(TRACKER)
     total_steps = 34
 
     # =========================================================
@@ -71,6 +119,7 @@ def main():
         results["prices_ibkr"] = {"status": "WARN", "error": str(e)}
 
     # Step 1b: Options Chain (OPTIONAL -- falha nao bloqueia)
+    log(f"Step 1b/{total_steps}: Coletando options chain...")
     try:
         from ib_insync import util as _ib_util
         from collect_options_chain import main as collect_chain
@@ -158,7 +207,7 @@ def main():
         log(f"Validacao falhou (CRITICO): {e}", "ERR")
         results["price_validation"] = {"status": "ERR", "error": str(e)}
 
-    # Step 3b: Data freshness guard (price_history.json mtime)
+    # Step 3b: Data freshness guard (sync do ibkr_portfolio.json, via freshness manifest)
     # Se CRITICAL (>24h sem sync do PC), pula geracao de PDF/video que dependem de precos frescos.
     log(f"Step 3b/{total_steps}: Verificando frescor dos dados de preco...")
     freshness_status = "UNKNOWN"
@@ -181,16 +230,21 @@ def main():
         results["data_freshness"] = {"status": "WARN", "error": str(e)}
 
     log(f"Step 4/{total_steps}: Collecting COT from CFTC...")
-    try:
-        from collect_cot import collect_cot_data
-        cot = collect_cot_data()
-        with open(raw_path / "cot_data.json", "w") as f:
-            json.dump(cot, f)
-        results["cot"] = {"status": "OK", "count": len(cot)}
-        log(f"COT collected: {len(cot)} commodities", "OK")
-    except Exception as e:
-        results["cot"] = {"status": "ERROR", "error": str(e)}
-        log(f"COT failed: {e}", "ERR")
+    due, why = collector_due("cot")
+    if not due:
+        results["cot"] = {"status": "SKIPPED", "reason": why}
+        log(f"COT em cache -- {why}", "OK")
+    else:
+        try:
+            from collect_cot import collect_cot_data
+            cot = collect_cot_data()
+            with open(raw_path / "cot_data.json", "w") as f:
+                json.dump(cot, f)
+            results["cot"] = {"status": "OK", "count": len(cot)}
+            log(f"COT collected: {len(cot)} commodities", "OK")
+        except Exception as e:
+            results["cot"] = {"status": "ERROR", "error": str(e)}
+            log(f"COT failed: {e}", "ERR")
 
     log(f"Step 5/{total_steps}: Processing seasonality...")
     try:
@@ -294,24 +348,34 @@ def main():
         log(f"IBGE/CONAB failed (non-blocking): {e}", "WARN")
 
     log(f"Step 13/{total_steps}: Collecting EIA energy data...")
-    try:
-        from collect_eia import main as collect_eia
-        collect_eia()
-        results["eia"] = {"status": "OK"}
-        log("EIA energy data collected", "OK")
-    except BaseException as e:
-        results["eia"] = {"status": "WARN", "error": str(e)}
-        log(f"EIA failed (non-blocking): {e}", "WARN")
+    due, why = collector_due("eia")
+    if not due:
+        results["eia"] = {"status": "SKIPPED", "reason": why}
+        log(f"EIA em cache -- {why}", "OK")
+    else:
+        try:
+            from collect_eia import main as collect_eia
+            collect_eia()
+            results["eia"] = {"status": "OK"}
+            log("EIA energy data collected", "OK")
+        except BaseException as e:
+            results["eia"] = {"status": "WARN", "error": str(e)}
+            log(f"EIA failed (non-blocking): {e}", "WARN")
 
     log(f"Step 14/{total_steps}: Collecting USDA FAS data...")
-    try:
-        from collect_usda_psd_csv import main as collect_fas
-        collect_fas()
-        results["usda_fas"] = {"status": "OK"}
-        log("USDA FAS collected", "OK")
-    except BaseException as e:
-        results["usda_fas"] = {"status": "WARN", "error": str(e)}
-        log(f"USDA FAS failed (non-blocking): {e}", "WARN")
+    due, why = collector_due("usda_fas")
+    if not due:
+        results["usda_fas"] = {"status": "SKIPPED", "reason": why}
+        log(f"USDA FAS em cache -- {why}", "OK")
+    else:
+        try:
+            from collect_usda_psd_csv import main as collect_fas
+            collect_fas()
+            results["usda_fas"] = {"status": "OK"}
+            log("USDA FAS collected", "OK")
+        except BaseException as e:
+            results["usda_fas"] = {"status": "WARN", "error": str(e)}
+            log(f"USDA FAS failed (non-blocking): {e}", "WARN")
 
     log(f"Step 15/{total_steps}: Collecting livestock PSD data...")
     try:
@@ -364,14 +428,19 @@ def main():
         log(f"Weather failed (non-blocking): {e}", "WARN")
 
     log(f"Step 20/{total_steps}: Collecting USDA crop progress...")
-    try:
-        from collect_crop_progress import main as collect_crop_progress
-        collect_crop_progress()
-        results["crop_progress"] = {"status": "OK"}
-        log("Crop progress collected", "OK")
-    except BaseException as e:
-        results["crop_progress"] = {"status": "WARN", "error": str(e)}
-        log(f"Crop progress failed (non-blocking): {e}", "WARN")
+    due, why = collector_due("crop_progress")
+    if not due:
+        results["crop_progress"] = {"status": "SKIPPED", "reason": why}
+        log(f"Crop progress em cache -- {why}", "OK")
+    else:
+        try:
+            from collect_crop_progress import main as collect_crop_progress
+            collect_crop_progress()
+            results["crop_progress"] = {"status": "OK"}
+            log("Crop progress collected", "OK")
+        except BaseException as e:
+            results["crop_progress"] = {"status": "WARN", "error": str(e)}
+            log(f"Crop progress failed (non-blocking): {e}", "WARN")
 
     log(f"Step 20b/{total_steps}: Collecting export activity...")
     try:
@@ -384,24 +453,34 @@ def main():
         log(f"Export activity failed (non-blocking): {e}", "WARN")
 
     log(f"Step 20c/{total_steps}: Collecting drought monitor...")
-    try:
-        from collect_drought_monitor import main as collect_drought_monitor
-        collect_drought_monitor()
-        results["drought_monitor"] = {"status": "OK"}
-        log("Drought monitor collected", "OK")
-    except BaseException as e:
-        results["drought_monitor"] = {"status": "WARN", "error": str(e)}
-        log(f"Drought monitor failed (non-blocking): {e}", "WARN")
+    due, why = collector_due("drought_monitor")
+    if not due:
+        results["drought_monitor"] = {"status": "SKIPPED", "reason": why}
+        log(f"Drought monitor em cache -- {why}", "OK")
+    else:
+        try:
+            from collect_drought_monitor import main as collect_drought_monitor
+            collect_drought_monitor()
+            results["drought_monitor"] = {"status": "OK"}
+            log("Drought monitor collected", "OK")
+        except BaseException as e:
+            results["drought_monitor"] = {"status": "WARN", "error": str(e)}
+            log(f"Drought monitor failed (non-blocking): {e}", "WARN")
 
     log(f"Step 20d/{total_steps}: Collecting fertilizer prices...")
-    try:
-        from collect_fertilizer import main as collect_fertilizer
-        collect_fertilizer()
-        results["fertilizer"] = {"status": "OK"}
-        log("Fertilizer prices collected", "OK")
-    except BaseException as e:
-        results["fertilizer"] = {"status": "WARN", "error": str(e)}
-        log(f"Fertilizer prices failed (non-blocking): {e}", "WARN")
+    due, why = collector_due("fertilizer")
+    if not due:
+        results["fertilizer"] = {"status": "SKIPPED", "reason": why}
+        log(f"Fertilizer em cache -- {why}", "OK")
+    else:
+        try:
+            from collect_fertilizer import main as collect_fertilizer
+            collect_fertilizer()
+            results["fertilizer"] = {"status": "OK"}
+            log("Fertilizer prices collected", "OK")
+        except BaseException as e:
+            results["fertilizer"] = {"status": "WARN", "error": str(e)}
+            log(f"Fertilizer prices failed (non-blocking): {e}", "WARN")
 
     log(f"Step 21/{total_steps}: Collecting macro indicators (S&P500, VIX, 10Y)...")
     try:
@@ -483,13 +562,19 @@ def main():
 
 
     # -- Grain Ratios (automatico) ---
+    log(f"Step 27b/{total_steps}: Running grain ratio engine...")
     try:
         import subprocess as _sp
         _root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        _r1 = _sp.run([sys.executable, os.path.join(_root,"grain_ratio_engine.py")], cwd=_root)
+        # --freq D: scorecards diarios sobre price_history.json; modelos mensais refeitos a cada 7 dias
+        _r1 = _sp.run([sys.executable, os.path.join(_root,"grain_ratio_engine.py"), "--freq", "D"], cwd=_root)
         _r2 = _sp.run([sys.executable, os.path.join(_root,"grain_ratios_enrich.py")], cwd=_root)
-        print("    grain_ratios OK" if _r1.returncode==0 and _r2.returncode==0 else "    grain_ratios WARN")
-    except Exception as _e: print(f"    grain_ratios ERR: {_e}")
+        _ok = _r1.returncode==0 and _r2.returncode==0
+        print("    grain_ratios OK" if _ok else "    grain_ratios WARN")
+        results["grain_ratios"] = {"status": "OK"} if _ok else {"status": "WARN", "error": f"return_codes={_r1.returncode},{_r2.returncode}"}
+    except Exception as _e:
+        print(f"    grain_ratios ERR: {_e}")
+        results["grain_ratios"] = {"status": "WARN", "error": str(_e)}
     # ------------------------------------
 
     log(f"Step 28/{total_steps}: Generating intel synthesis...")
@@ -594,6 +679,16 @@ def main():
             results["video_mp4"] = {"status": "WARN", "error": str(e)}
             log(f"Video MP4 failed (non-blocking): {e}", "WARN")
 
+    log(f"Step 32/{total_steps}: Archiving point-in-time snapshot...")
+    try:
+        from snapshot_store import archive_run
+        snap = archive_run()
+        results["snapshot"] = {"status": "OK", "files": snap["files"], "new_kb": round(snap["bytes_written"] / 1024)}
+        log(f"Snapshot archived: {snap['files']} files ({snap['unchanged']} unchanged, +{snap['bytes_written'] / 1024:.0f} KB)", "OK")
+    except Exception as e:
+        results["snapshot"] = {"status": "WARN", "error": str(e)}
+        log(f"Snapshot archive failed (non-blocking): {e}", "WARN")
+
     # =========================================================
     # SUMMARY
     # =========================================================
@@ -627,6 +722,9 @@ def main():
     with open(base / "last_run.json", "w") as f:
         json.dump(run_log, f, indent=2)
 
+    EVENTS.emit("run_end", elapsed_s=round(elapsed, 1), ok=ok_count,
+                warnings=warn_count, errors=err_count)
+
     return 0
 
 if __name__ == "__main__":
@@ -21,6 +21,7 @@ Usage:
   python pipeline/skill_entry_timing.py SI PUT        # Score specific
   python pipeline/skill_entry_timing.py KE PUT
   python pipeline/skill_entry_timing.py GF CALL
+  python pipeline/skill_entry_timing.py --as-of 2026-03-15   # Archived snapshot
 """
 
 import json
@@ -56,6 +57,9 @@ WORST_MONTHS = {9: -2, 3: -1, 6: -1}
 # Grains for WASDE check
 GRAINS = {"ZC", "ZS", "ZW", "KE", "ZM", "ZL"}
 
+# Inputs that live in pipeline/ instead of processed/
+PIPELINE_FILES = {"cross_analysis.json", "trade_skill_base.json"}
+
 
 def jload(path):
     for enc in ('utf-8-sig', 'utf-8', 'latin-1'):
@@ -132,7 +136,7 @@ def score_entry(sym, direction, options, cot_data, seasonality,
     month_pts = BEST_MONTHS.get(cur_month, 0) + WORST_MONTHS.get(cur_month, 0)
     month_pts = max(0, min(3, month_pts))
     score += month_pts
-    month_label = datetime.now().strftime("%b")
+    month_label = datetime(2000, cur_month, 1).strftime("%b")
     details.append({"check": f"Mes ({month_label})", "result": f"{month_pts}/3",
                     "pts": month_pts, "max": 3})
 
@@ -239,12 +243,14 @@ def score_entry(sym, direction, options, cot_data, seasonality,
     else:
         details.append({"check": "COT vs Direction", "result": "N/A", "pts": 0, "max": 2})
 
-    # ── 7. Seasonality Aligned (0-2) ──
+    # ── 7. Seasonality Aligned (0-2), weighted by seasonal reliability ──
     max_score += 2
     seas = seasonality.get(sym, {}).get("monthly_returns", [])
+    rel = (seasonality.get(sym, {}).get("monthly_stats", {}).get("reliability") or [None] * 12)[cur_month - 1]
     if seas and cur_month <= len(seas):
         mr = seas[cur_month - 1]
         val = mr if isinstance(mr, (int, float)) else mr.get("avg", 0) if isinstance(mr, dict) else 0
+        seas_start = len(details)
 
         if direction == "PUT":
             # PUT selling profits when price stays flat or goes up
@@ -265,6 +271,14 @@ def score_entry(sym, direction, options, cot_data, seasonality,
                 details.append({"check": "Sazonalidade", "result": f"NEUTRAL (avg={val:+.2f}%)", "pts": 1, "max": 2})
             else:
                 details.append({"check": "Sazonalidade", "result": f"AGAINST (avg={val:+.2f}%, historicamente sobe)", "pts": 0, "max": 2})
+
+        # Unreliable seasonal months (bootstrap sign agreement) earn fewer points
+        if rel is not None and len(details) > seas_start:
+            d = details[-1]
+            weighted = int(round(d["pts"] * (0.5 + 0.5 * rel)))
+            score -= d["pts"] - weighted
+            d["pts"] = weighted
+            d["result"] += f" [confiab. {rel * 100:.0f}%]"
     else:
         details.append({"check": "Sazonalidade", "result": "N/A", "pts": 0, "max": 2})
 
@@ -322,20 +336,39 @@ def main():
     print(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')} ({datetime.now().strftime('%A')})")
     print("=" * 60)
 
-    # Load all data
-    options = jload(PROC / "options_chain.json")
-    cot_data = jload(PROC / "cot.json")
-    seasonality = jload(PROC / "seasonality.json")
-    contract_hist = jload(PROC / "contract_history.json")
-    cross_data = jload(BASE / "pipeline" / "cross_analysis.json")
-    skill_data = jload(BASE / "pipeline" / "trade_skill_base.json")
+    args = sys.argv[1:]
+    as_of_date = None
+    if "--as-of" in args:
+        i = args.index("--as-of")
+        as_of_date = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+
+    # Load all data (today's files, or the archived snapshot with --as-of)
+    if as_of_date:
+        from snapshot_store import as_of
+        snap = as_of(as_of_date)
+        if snap is None:
+            print(f"[ERR] Nenhum snapshot ate {as_of_date}")
+            return
+        print(f"Snapshot: {snap.taken_at}")
+        load = snap.load
+        ref = datetime.strptime(as_of_date[:10], "%Y-%m-%d")
+    else:
+        load = lambda name: jload(BASE / "pipeline" / name if name in PIPELINE_FILES else PROC / name)
+        ref = datetime.now()
+
+    options = load("options_chain.json")
+    cot_data = load("cot.json")
+    seasonality = load("seasonality.json")
+    contract_hist = load("contract_history.json")
+    cross_data = load("cross_analysis.json")
+    skill_data = load("trade_skill_base.json")
 
     curves = get_forward_curve(contract_hist)
-    cur_month = datetime.now().month
-    cur_day = datetime.now().day
+    cur_month = ref.month
+    cur_day = ref.day
 
     # Check if specific underlying requested
-    args = sys.argv[1:]
     if len(args) >= 2:
         sym = args[0].upper()
         direction = args[1].upper()
@@ -411,11 +444,13 @@ def main():
             check_mark = "[X]" if d["pts"] == d["max"] and d["max"] > 0 else "[ ]" if d["max"] > 0 else "[i]"
             print(f"  {check_mark} {d['check']}: {d['result']}{mandatory}{warn}")
 
-    # Save
+    # Save (historical --as-of scans never overwrite today's output)
+    if as_of_date:
+        return
     output = {
         "generated_at": datetime.now().isoformat(),
-        "scan_date": datetime.now().strftime("%Y-%m-%d"),
-        "scan_month": datetime.now().strftime("%b"),
+        "scan_date": ref.strftime("%Y-%m-%d"),
+        "scan_month": ref.strftime("%b"),
         "total_scanned": len(all_results),
         "blocked_count": len(blocked),
         "best_opportunity": {
@@ -97,20 +97,32 @@ def get_forward_curve_shape(sym, contract_hist):
     return "FLAT", round(diff, 1)
 
 
-def run_pretrade_checklist(und, direction):
-    """Run all 10 filters and produce GO/NO-GO decision."""
-
-    # Load all data
-    options = jload(PROC / "options_chain.json")
-    cot_data = jload(PROC / "cot.json")
-    seasonality = jload(PROC / "seasonality.json")
-    contract_hist = jload(PROC / "contract_history.json")
-    portfolio = jload(PROC / "ibkr_portfolio.json")
-    cross = jload(BASE / "pipeline" / "cross_analysis.json")
-    skill = jload(BASE / "pipeline" / "trade_skill_base.json")
-
-    cur_month = datetime.now().month
-    cur_day = datetime.now().day
+def load_checklist_data():
+    """Load every input the checklist reads (today's processed files)."""
+    return {
+        "options": jload(PROC / "options_chain.json"),
+        "cot": jload(PROC / "cot.json"),
+        "seasonality": jload(PROC / "seasonality.json"),
+        "contract_hist": jload(PROC / "contract_history.json"),
+        "portfolio": jload(PROC / "ibkr_portfolio.json"),
+        "cross": jload(BASE / "pipeline" / "cross_analysis.json"),
+        "skill": jload(BASE / "pipeline" / "trade_skill_base.json"),
+    }
+
+
+def evaluate_checklist(und, direction, data, cur_month, cur_day):
+    """
+    Run all 10 filters against `data` (see load_checklist_data) and return the
+    GO/NO-GO decision without printing. Pure function of its inputs, so the
+    backtester can replay it on point-in-time data.
+    """
+    options = data.get("options", {})
+    cot_data = data.get("cot", {})
+    seasonality = data.get("seasonality", {})
+    contract_hist = data.get("contract_hist", {})
+    portfolio = data.get("portfolio", {})
+    cross = data.get("cross", {})
+    skill = data.get("skill", {})
 
     best_unds = {u["sym"]: u for u in skill.get("best_underlyings", [])}
     pred_data = cross.get("underlying_predictability", {})
@@ -317,7 +329,7 @@ def run_pretrade_checklist(und, direction):
     if seas and cur_month <= len(seas):
         mr = seas[cur_month - 1]
         val = mr if isinstance(mr, (int, float)) else mr.get("avg", 0) if isinstance(mr, dict) else 0
-        month_name = datetime.now().strftime("%b")
+        month_name = datetime(2000, cur_month, 1).strftime("%b")
 
         if direction == "PUT" and val < -2:
             filters.append({
@@ -459,6 +471,26 @@ def run_pretrade_checklist(und, direction):
         decision = "NO-GO"
         decision_reason = f"Apenas {passed_count}/10 filtros — risco/retorno desfavoravel"
 
+    return {
+        "und": und,
+        "direction": direction,
+        "filters": filters,
+        "decision": decision,
+        "decision_reason": decision_reason,
+        "passed_count": passed_count,
+        "failed_count": failed_count,
+    }
+
+
+def run_pretrade_checklist(und, direction):
+    """Run all 10 filters on today's data, print and return the decision."""
+    now = datetime.now()
+    result = evaluate_checklist(und, direction, load_checklist_data(), now.month, now.day)
+    filters = result["filters"]
+    decision = result["decision"]
+    decision_reason = result["decision_reason"]
+    passed_count = result["passed_count"]
+
     # ── Print ──
     print(f"  {'='*58}")
     print(f"  PRE-TRADE CHECKLIST: {und} ({NAMES.get(und, und)}) {direction}")
@@ -488,6 +520,7 @@ def run_pretrade_checklist(und, direction):
             print(f"  >>> Bloqueadores: {', '.join(f['id'] for f in failed)}")
 
     print(f"  {'='*58}")
+    return result
 
 
 def main():
@@ -8,19 +8,26 @@ Analyzes each active position under stress scenarios:
   - Correlation cascade: correlated moves
   - Theta decay acceleration (DTE < 21)
   - Delta drift beyond neutral
+  - Historical replay: every N-day window of the 5Y price history plus
+    named episodes, full Black-76 revaluation of every leg
 
 Identifies most vulnerable position and overall portfolio risk.
 
 Run:
   python pipeline/skill_stress_test.py
+  python pipeline/skill_stress_test.py --window 10 --worst 20
 """
 
 import json
 import math
+import sys
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
 BASE = Path(__file__).parent.parent
 PROC = BASE / "agrimacro-dash" / "public" / "data" / "processed"
 OUT = BASE / "pipeline" / "stress_test.json"
@@ -66,6 +73,27 @@ CORR_PAIRS = {
     "CC": [("KC", 0.25)],
 }
 
+# Historical replay defaults
+REPLAY_WINDOW = 5          # trading days per window
+REPLAY_WORST_K = 10
+REPLAY_START = "2021-01-01"
+RISK_FREE = 0.043
+DEFAULT_IV = 0.30
+
+MONTH_CODES = {
+    "F": 1, "G": 2, "H": 3, "J": 4, "K": 5, "M": 6,
+    "N": 7, "Q": 8, "U": 9, "V": 10, "X": 11, "Z": 12,
+}
+
+# Named episodes replayed start -> end on top of the rolling windows
+HISTORICAL_EPISODES = [
+    {"name": "2021 corn drought rally", "start": "2021-04-01", "end": "2021-05-07"},
+    {"name": "2022 wheat spike (Ucrania)", "start": "2022-02-23", "end": "2022-03-08"},
+    {"name": "2022 grain collapse", "start": "2022-06-10", "end": "2022-07-15"},
+    {"name": "2024 cocoa rally", "start": "2024-01-02", "end": "2024-04-19"},
+    {"name": "2025 tariff shock", "start": "2025-04-02", "end": "2025-04-09"},
+]
+
 
 def jload(path):
     for enc in ('utf-8-sig', 'utf-8', 'latin-1'):
@@ -100,6 +128,252 @@ def estimate_pnl_shock(delta, gamma, vega, theta, price_shock_pct, iv_shock_pct,
     return pnl_delta + pnl_gamma + pnl_vega + pnl_theta
 
 
+def _arg(name, default):
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            try:
+                return int(sys.argv[idx + 1])
+            except ValueError:
+                pass
+    return default
+
+
+def _bars(prices, sym):
+    bars = prices.get(sym, [])
+    if isinstance(bars, dict):
+        bars = bars.get("history", [])
+    return bars if isinstance(bars, list) else []
+
+
+def build_close_panel(prices, syms, start=REPLAY_START):
+    """
+    Align closes of `syms` on the union of their dates.
+    Returns (dates datetime64[D] (T,), panel float (T, S)); gaps are
+    forward-filled, dates before a symbol's first bar stay NaN.
+    """
+    series = {}
+    for sym in syms:
+        bars = [b for b in _bars(prices, sym) if b.get("close")]
+        if not bars:
+            continue
+        d = np.array([str(b["date"])[:10] for b in bars], dtype="datetime64[D]")
+        c = np.array([b["close"] for b in bars], dtype=float)
+        keep = d >= np.datetime64(start)
+        series[sym] = (d[keep], c[keep])
+
+    if not series:
+        return np.array([], dtype="datetime64[D]"), np.empty((0, len(syms)))
+
+    dates = np.unique(np.concatenate([d for d, _ in series.values()]))
+    panel = np.full((len(dates), len(syms)), np.nan)
+    for j, sym in enumerate(syms):
+        if sym in series:
+            d, c = series[sym]
+            panel[np.searchsorted(dates, d), j] = c
+
+    # Vectorized forward fill: carry the index of the last valid row
+    valid = ~np.isnan(panel)
+    idx = np.where(valid, np.arange(len(dates))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    panel = panel[idx, np.arange(len(syms))]
+    return dates, panel
+
+
+def _contract_expiry_years(contract_code, today):
+    """Years to expiry from a local contract code (ZCN6 -> Jul 2026, day 16)."""
+    try:
+        month = MONTH_CODES[contract_code[-2]]
+        yr = 2020 + int(contract_code[-1])
+        if yr < today.year:
+            yr += 10
+        exp = datetime(yr, month, 16)
+        return max((exp - today).days / 365, 1 / 365)
+    except (KeyError, ValueError, IndexError):
+        return 90 / 365
+
+
+def _parse_strike(raw, und_price):
+    """IBKR strike digits carry a symbol-dependent scale; pick the one nearest und_price."""
+    try:
+        k = float(raw)
+    except ValueError:
+        return None
+    if und_price <= 0:
+        return k
+    return min((k / div for div in (1, 10, 100, 1000)),
+               key=lambda x: abs(math.log(x / und_price)) if x > 0 else float("inf"))
+
+
+def build_replay_legs(portfolio, prices):
+    """
+    Flatten portfolio positions into leg arrays for full revaluation.
+    Options are priced with Black-76 at their current IV; futures are linear.
+    """
+    today = datetime.now()
+    legs = []
+    for p in portfolio.get("positions", []):
+        sec = p.get("sec_type")
+        if sec not in ("FOP", "OPT", "FUT"):
+            continue
+        sym = p.get("symbol", "")
+        qty = float(p.get("position") or 0)
+        if not qty:
+            continue
+        und = float(p.get("und_price") or 0)
+        if und <= 0:
+            bars = _bars(prices, sym)
+            und = float(bars[-1].get("close", 0)) if bars else 0
+        if und <= 0:
+            continue
+
+        parts = (p.get("local_symbol") or "").split()
+        leg = {
+            "sym": sym, "qty": qty, "mult": MULTIPLIERS.get(sym, 100),
+            "F0": und, "K": und, "T": 0.0, "iv": 0.0,
+            "is_opt": False, "is_call": False,
+        }
+        if sec in ("FOP", "OPT"):
+            if len(parts) < 2 or parts[-1][:1] not in ("C", "P"):
+                continue
+            K = _parse_strike(parts[-1][1:], und)
+            if not K:
+                continue
+            leg.update({
+                "K": K, "is_opt": True, "is_call": parts[-1][0] == "C",
+                "T": _contract_expiry_years(parts[0], today),
+                "iv": float(p.get("iv") or DEFAULT_IV),
+            })
+        legs.append(leg)
+    return legs
+
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+
+def norm_cdf(x):
+    """Standard normal CDF over arrays (math.erf, no scipy)."""
+    return 0.5 * (1.0 + _erf(np.asarray(x, dtype=float) / math.sqrt(2.0)))
+
+
+def black76_price(F, K, T, sigma, is_call, r=RISK_FREE):
+    """Vectorized Black-76 premium (numpy broadcasting)."""
+    F = np.maximum(F, 1e-12)
+    T = np.maximum(T, 1e-6)
+    sig_t = np.maximum(sigma, 1e-6) * np.sqrt(T)
+    d1 = (np.log(F / K) + 0.5 * sig_t ** 2) / sig_t
+    d2 = d1 - sig_t
+    disc = np.exp(-r * T)
+    call = disc * (F * norm_cdf(d1) - K * norm_cdf(d2))
+    put = disc * (K * norm_cdf(-d2) - F * norm_cdf(-d1))
+    return np.where(is_call, call, put)
+
+
+def revalue_paths(rel, legs, cols):
+    """
+    Full revaluation P&L for price paths.
+    rel: (W, N+1, S) underlying price relative to window start.
+    Returns leg P&L (W, N+1, L) in USD.
+    """
+    F0 = np.array([l["F0"] for l in legs])
+    K = np.array([l["K"] for l in legs])
+    T0 = np.array([l["T"] for l in legs])
+    iv = np.array([l["iv"] for l in legs])
+    is_opt = np.array([l["is_opt"] for l in legs])
+    is_call = np.array([l["is_call"] for l in legs])
+    size = np.array([l["qty"] * l["mult"] for l in legs])
+
+    F = F0 * rel[:, :, cols]                                # (W, N+1, L)
+    steps = np.arange(rel.shape[1])[None, :, None]
+    T = np.maximum(T0 - steps * (7 / 5) / 365, 0)           # trading -> calendar days
+    value = np.where(is_opt, black76_price(F, K, T, iv, is_call), F)
+    value0 = np.where(is_opt, black76_price(F0, K, T0, iv, is_call), F0)
+    return (value - value0) * size
+
+
+def run_historical_replay(portfolio, prices, net_liq, window=REPLAY_WINDOW, worst_k=REPLAY_WORST_K):
+    """
+    Replay current positions through every historical `window`-day path of the
+    price store and through HISTORICAL_EPISODES. Windows are strided views over
+    the aligned close panel, so all windows x legs revalue in one numpy pass.
+    """
+    legs = build_replay_legs(portfolio, prices)
+    if not legs:
+        return {}
+    syms = sorted({l["sym"] for l in legs})
+    col_of = {s: j for j, s in enumerate(syms)}
+    cols = np.array([col_of[l["sym"]] for l in legs])
+    leg_syms = np.array([l["sym"] for l in legs])
+
+    dates, panel = build_close_panel(prices, syms)
+    if len(dates) <= window:
+        return {}
+
+    # (W, S, N+1) view -> (W, N+1, S), no copy until the division
+    win = sliding_window_view(panel, window + 1, axis=0).transpose(0, 2, 1)
+    rel = np.nan_to_num(win / win[:, :1, :], nan=1.0)
+    leg_pnl = revalue_paths(rel, legs, cols)
+    paths = leg_pnl.sum(axis=2)                              # (W, N+1)
+    trough = paths.min(axis=1)
+    trough_step = paths.argmin(axis=1)
+
+    k = min(worst_k, len(trough))
+    worst_idx = np.argpartition(trough, k - 1)[:k]
+    worst_idx = worst_idx[np.argsort(trough[worst_idx])]
+
+    def _by_symbol(pnl_legs):
+        return {s: round(float(pnl_legs[leg_syms == s].sum()), 0) for s in syms}
+
+    worst = []
+    for w in worst_idx:
+        st = int(trough_step[w])
+        worst.append({
+            "start": str(dates[w]),
+            "end": str(dates[w + window]),
+            "trough_date": str(dates[w + st]),
+            "pnl_trough": round(float(trough[w]), 0),
+            "pnl_end": round(float(paths[w, -1]), 0),
+            "pct_of_capital": round(abs(float(trough[w])) / net_liq * 100, 2) if net_liq > 0 else None,
+            "by_symbol": _by_symbol(leg_pnl[w, st]),
+            "path": [round(float(v), 0) for v in paths[w]],
+        })
+
+    episodes = []
+    for ep in HISTORICAL_EPISODES:
+        i0 = int(np.searchsorted(dates, np.datetime64(ep["start"])))
+        i1 = int(np.searchsorted(dates, np.datetime64(ep["end"]), side="right")) - 1
+        if i0 >= len(dates) or i1 <= i0:
+            continue
+        seg = panel[i0:i1 + 1]
+        ep_rel = np.nan_to_num(seg / seg[:1], nan=1.0)[None]
+        ep_legs = revalue_paths(ep_rel, legs, cols)[0]
+        ep_path = ep_legs.sum(axis=1)
+        st = int(ep_path.argmin())
+        episodes.append({
+            "name": ep["name"],
+            "start": str(dates[i0]),
+            "end": str(dates[i1]),
+            "pnl_trough": round(float(ep_path[st]), 0),
+            "pnl_end": round(float(ep_path[-1]), 0),
+            "pct_of_capital": round(abs(float(ep_path[st])) / net_liq * 100, 2) if net_liq > 0 else None,
+            "by_symbol": _by_symbol(ep_legs[st]),
+        })
+
+    return {
+        "window_days": window,
+        "windows_evaluated": int(len(paths)),
+        "legs": len(legs),
+        "history_start": str(dates[0]),
+        "history_end": str(dates[-1]),
+        "pnl_percentiles": {
+            f"p{q}": round(float(v), 0)
+            for q, v in zip((1, 5, 50), np.percentile(paths[:, -1], (1, 5, 50)))
+        },
+        "worst_windows": worst,
+        "episodes": episodes,
+    }
+
+
 def main():
     print("=" * 65)
     print("STRESS TEST — Portfolio Vulnerability Analysis")
@@ -222,7 +496,7 @@ def main():
     ]
 
     print(f"\n  {'='*63}")
-    print(f"  PER-POSITION STRESS")
+    print("  PER-POSITION STRESS")
     print(f"  {'='*63}")
 
     all_stress = {}
@@ -291,7 +565,7 @@ def main():
     # CORRELATION CASCADE
     # ════════════════════════════════════════════════════
     print(f"\n  {'='*63}")
-    print(f"  CORRELACAO CASCADE (-10% simultaneous)")
+    print("  CORRELACAO CASCADE (-10% simultaneous)")
     print(f"  {'='*63}")
 
     active_syms = set(sym for (sym, _) in positions)
@@ -304,18 +578,41 @@ def main():
         cascade_loss += loss
 
     cascade_pct = abs(cascade_loss) / net_liq * 100 if net_liq > 0 and cascade_loss < 0 else 0
-    print(f"  Se TODOS os underlyings caem 10% simultaneamente:")
+    print("  Se TODOS os underlyings caem 10% simultaneamente:")
     print(f"  Perda estimada: ${cascade_loss:,.0f} ({cascade_pct:.1f}% do capital)")
     if cascade_pct > 10:
-        print(f"  >>> RISCO ALTO: perda > 10% do capital em cenario de panico")
+        print("  >>> RISCO ALTO: perda > 10% do capital em cenario de panico")
     elif cascade_pct > 5:
-        print(f"  >>> RISCO MODERADO: ativa drawdown protocol nivel 1 (reduzir sizing 25%)")
+        print("  >>> RISCO MODERADO: ativa drawdown protocol nivel 1 (reduzir sizing 25%)")
+
+    # ════════════════════════════════════════════════════
+    # HISTORICAL REPLAY
+    # ════════════════════════════════════════════════════
+    window = _arg("--window", REPLAY_WINDOW)
+    worst_k = _arg("--worst", REPLAY_WORST_K)
+    print(f"\n  {'='*63}")
+    print(f"  HISTORICAL REPLAY ({window}d windows, full revaluation)")
+    print(f"  {'='*63}")
+
+    replay = run_historical_replay(portfolio, prices, net_liq, window, worst_k)
+    if replay:
+        print(f"  {replay['windows_evaluated']} janelas x {replay['legs']} legs "
+              f"({replay['history_start']} -> {replay['history_end']})")
+        for w in replay["worst_windows"]:
+            pct = f" ({w['pct_of_capital']:.1f}%)" if w["pct_of_capital"] is not None else ""
+            print(f"    {w['start']} -> {w['end']}: trough ${w['pnl_trough']:>+10,.0f}{pct} | end ${w['pnl_end']:>+10,.0f}")
+        if replay["episodes"]:
+            print("\n  Episodios:")
+            for ep in replay["episodes"]:
+                print(f"    {ep['name']:>28}: trough ${ep['pnl_trough']:>+10,.0f} | end ${ep['pnl_end']:>+10,.0f}")
+    else:
+        print("  Sem posicoes ou historico suficiente para replay")
 
     # ════════════════════════════════════════════════════
     # MOST VULNERABLE POSITION
     # ════════════════════════════════════════════════════
     print(f"\n  {'='*63}")
-    print(f"  POSICAO MAIS VULNERAVEL")
+    print("  POSICAO MAIS VULNERAVEL")
     print(f"  {'='*63}")
 
     if vulnerability_scores:
@@ -344,24 +641,24 @@ def main():
             risk_factors.append(f"IV={pos_data['iv']*100:.0f}% — alta volatilidade amplifica moves")
 
         if risk_factors:
-            print(f"\n      Fatores de risco:")
+            print("\n      Fatores de risco:")
             for rf in risk_factors:
                 print(f"        ! {rf}")
 
         # Recommendation
-        print(f"\n      Recomendacao:")
+        print("\n      Recomendacao:")
         if worst_data["vuln_pct"] >= 5:
-            print(f"        REDUZIR: fechar 50% da posicao para limitar exposicao")
+            print("        REDUZIR: fechar 50% da posicao para limitar exposicao")
         elif worst_data["vuln_pct"] >= 2:
-            print(f"        MONITORAR: definir stop loss em 2x o credito recebido")
+            print("        MONITORAR: definir stop loss em 2x o credito recebido")
         else:
-            print(f"        OK: risco dentro dos parametros aceitaveis")
+            print("        OK: risco dentro dos parametros aceitaveis")
 
     # ════════════════════════════════════════════════════
     # PORTFOLIO RISK SUMMARY
     # ════════════════════════════════════════════════════
     print(f"\n  {'='*63}")
-    print(f"  RESUMO DE RISCO DO PORTFOLIO")
+    print("  RESUMO DE RISCO DO PORTFOLIO")
     print(f"  {'='*63}")
 
     total_delta = sum(d["delta"] for d in positions.values())
@@ -433,6 +730,7 @@ def main():
             }
             for (sym, grp), s in all_stress.items()
         },
+        "historical_replay": replay,
     }
     with open(OUT, "w") as f:
         json.dump(output, f, indent=2, default=str)
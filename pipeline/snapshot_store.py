@@ -0,0 +1,290 @@
+"""
+AgriMacro - Point-in-time Snapshot Store
+Arquiva os JSONs processados de cada run para que skills e backtests possam
+reler exatamente o que existia numa data passada.
+
+Layout (pipeline/cache/snapshots/):
+  objects/ab/<sha256>.z    chunks zlib, endereçados por conteudo (dedup global)
+  runs/<YYYY-MM-DD>/<HHMMSS>.json   manifest do run: arquivo -> (sha256, tree)
+  index.jsonl              uma linha por run, em ordem cronologica
+
+Cada JSON vira uma arvore de chunks:
+  - dict  -> um no por chave
+  - list  -> fatias de CHUNK_ITEMS itens (series append-only so mudam a ultima)
+  - folhas pequenas (< LEAF_BYTES) -> um chunk
+Arquivo inalterado (mesmo sha256 do run anterior) reaproveita a arvore sem
+sequer ser parseado; chunks inalterados custam zero bytes.
+
+Uso:
+  python pipeline/snapshot_store.py                 # arquiva processed/ + pipeline/*.json
+  python pipeline/snapshot_store.py --list
+  python pipeline/snapshot_store.py --as-of 2026-03-15 cot.json
+
+API:
+  from snapshot_store import as_of
+  snap = as_of("2026-03-15")
+  cot = snap.load("cot.json")
+"""
+import hashlib
+import json
+import os
+import sys
+import zlib
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+BASE = Path(__file__).parent.parent
+PROC = BASE / "agrimacro-dash" / "public" / "data" / "processed"
+PIPE = BASE / "pipeline"
+STORE_DIR = PIPE / "cache" / "snapshots"
+
+# Arquivos arquivados: prefixo logico -> diretorio
+SOURCES = {
+    "processed": PROC,
+    "pipeline": PIPE,
+}
+
+CHUNK_ITEMS = 256
+LEAF_BYTES = 4096
+ZLIB_LEVEL = 6
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SnapshotStore:
+    """Content-addressed store of processed JSON artifacts, one manifest per run."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self._index = None
+        self.stats = {"chunks_new": 0, "chunks_reused": 0, "bytes_written": 0}
+
+    # ── objects ──
+
+    def _obj_path(self, h):
+        return self.objects / h[:2] / f"{h}.z"
+
+    def put(self, data):
+        """Store raw bytes, return their hash. Existing content is not rewritten."""
+        h = _sha(data)
+        path = self._obj_path(h)
+        if path.exists():
+            self.stats["chunks_reused"] += 1
+            return h
+        blob = zlib.compress(data, ZLIB_LEVEL)
+        _atomic_write(path, blob)
+        self.stats["chunks_new"] += 1
+        self.stats["bytes_written"] += len(blob)
+        return h
+
+    def get(self, h):
+        return _read_object(str(self._obj_path(h)))
+
+    # ── trees ──
+
+    def _node(self, value):
+        raw = _dumps(value)
+        if len(raw) < LEAF_BYTES:
+            return {"c": self.put(raw)}
+        if isinstance(value, dict):
+            return {"d": [[k, self._node(v)] for k, v in value.items()]}
+        if isinstance(value, list):
+            return {"l": [self.put(_dumps(value[i:i + CHUNK_ITEMS]))
+                          for i in range(0, len(value), CHUNK_ITEMS)]}
+        return {"c": self.put(raw)}
+
+    def _build(self, node):
+        if "c" in node:
+            return json.loads(self.get(node["c"]))
+        if "d" in node:
+            return {k: self._build(v) for k, v in node["d"]}
+        if "l" in node:
+            out = []
+            for h in node["l"]:
+                out.extend(json.loads(self.get(h)))
+            return out
+        if "raw" in node:
+            return self.get(node["raw"])
+        return None
+
+    def put_file(self, path):
+        """Store one file; returns its manifest entry."""
+        data = Path(path).read_bytes()
+        file_hash = _sha(data)
+        try:
+            value = json.loads(data.decode("utf-8-sig"))
+            tree = self._node(value)
+        except (ValueError, UnicodeDecodeError):
+            tree = {"raw": self.put(data)}
+        return {"sha256": file_hash, "size": len(data), "tree": self.put(_dumps(tree))}
+
+    # ── runs ──
+
+    def index(self):
+        if self._index is None:
+            self._index = []
+            if self.index_path.exists():
+                with open(self.index_path, encoding="utf-8") as f:
+                    self._index = [json.loads(line) for line in f if line.strip()]
+            self._index.sort(key=lambda r: r["taken_at"])
+        return self._index
+
+    def _manifest(self, entry):
+        return _read_manifest(str(self.root / entry["manifest"]))
+
+    def archive(self, files=None, taken_at=None):
+        """
+        Archive `files` ({logical_name: path}); default = every *.json in SOURCES.
+        Returns the run summary (files, new chunks, bytes written).
+        """
+        taken_at = taken_at or datetime.now()
+        self.stats = {"chunks_new": 0, "chunks_reused": 0, "bytes_written": 0}
+        if files is None:
+            files = {}
+            for prefix, folder in SOURCES.items():
+                if folder.exists():
+                    for p in sorted(folder.glob("*.json")):
+                        files[f"{prefix}/{p.name}"] = p
+
+        prev = self.index()[-1] if self.index() else None
+        prev_files = self._manifest(prev)["files"] if prev else {}
+
+        entries = {}
+        unchanged = 0
+        for name, path in files.items():
+            path = Path(path)
+            if not path.exists():
+                continue
+            old = prev_files.get(name)
+            if old and old.get("size") == path.stat().st_size:
+                if _sha(path.read_bytes()) == old["sha256"]:
+                    entries[name] = old
+                    unchanged += 1
+                    continue
+            try:
+                entries[name] = self.put_file(path)
+            except OSError as e:
+                print(f"  [snapshot] {name}: {e}")
+
+        rel = f"runs/{taken_at.strftime('%Y-%m-%d')}/{taken_at.strftime('%H%M%S')}.json"
+        manifest = {"taken_at": taken_at.isoformat(timespec="seconds"), "files": entries}
+        _atomic_write(self.root / rel, json.dumps(manifest, indent=1).encode("utf-8"))
+        entry = {"taken_at": manifest["taken_at"], "manifest": rel, "files": len(entries)}
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.index().append(entry)
+
+        return {
+            "taken_at": manifest["taken_at"],
+            "files": len(entries),
+            "unchanged": unchanged,
+            **self.stats,
+        }
+
+    def as_of(self, when):
+        """Latest snapshot taken at or before `when` (date string, date or datetime)."""
+        if isinstance(when, str):
+            when = when if "T" in when else f"{when[:10]}T23:59:59"
+        elif not isinstance(when, datetime):
+            when = f"{when.isoformat()}T23:59:59"
+        else:
+            when = when.isoformat(timespec="seconds")
+        idx = self.index()
+        i = bisect_right([r["taken_at"] for r in idx], when)
+        if i == 0:
+            return None
+        entry = idx[i - 1]
+        return Snapshot(self, entry["taken_at"], self._manifest(entry)["files"])
+
+
+class Snapshot:
+    """Read-only view of one archived run."""
+
+    def __init__(self, store, taken_at, files):
+        self.store = store
+        self.taken_at = taken_at
+        self.files = files
+        self._cache = {}
+
+    def _resolve(self, name):
+        if name in self.files:
+            return name
+        for prefix in SOURCES:
+            if f"{prefix}/{name}" in self.files:
+                return f"{prefix}/{name}"
+        return None
+
+    def load(self, name, default=None):
+        """Parsed content of `name` ("cot.json" or "processed/cot.json")."""
+        key = self._resolve(name)
+        if key is None:
+            return {} if default is None else default
+        if key not in self._cache:
+            tree = json.loads(self.store.get(self.files[key]["tree"]))
+            self._cache[key] = self.store._build(tree)
+        return self._cache[key]
+
+
+@lru_cache(maxsize=4096)
+def _read_object(path):
+    with open(path, "rb") as f:
+        return zlib.decompress(f.read())
+
+
+@lru_cache(maxsize=64)
+def _read_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def archive_run():
+    """Archive today's processed outputs (pipeline step)."""
+    return SnapshotStore().archive()
+
+
+def as_of(when, root=STORE_DIR):
+    """Snapshot loader for a past date; None if nothing was archived yet."""
+    return SnapshotStore(root).as_of(when)
+
+
+def store_size(root=STORE_DIR):
+    return sum(p.stat().st_size for p in Path(root).rglob("*") if p.is_file())
+
+
+if __name__ == "__main__":
+    if "--list" in sys.argv:
+        for r in SnapshotStore().index():
+            print(f"  {r['taken_at']}  {r['files']:>3} arquivos  {r['manifest']}")
+        print(f"  Total em disco: {store_size() / 1e6:.1f} MB")
+    elif "--as-of" in sys.argv:
+        i = sys.argv.index("--as-of")
+        snap = as_of(sys.argv[i + 1])
+        if snap is None:
+            print("  Nenhum snapshot ate essa data")
+            sys.exit(1)
+        print(f"  Snapshot {snap.taken_at}: {len(snap.files)} arquivos")
+        if len(sys.argv) > i + 2:
+            print(json.dumps(snap.load(sys.argv[i + 2]), indent=2, ensure_ascii=False)[:2000])
+    else:
+        r = archive_run()
+        print(f"  [OK] Snapshot {r['taken_at']}: {r['files']} arquivos "
+              f"({r['unchanged']} inalterados) | chunks novos={r['chunks_new']} "
+              f"reaproveitados={r['chunks_reused']} | +{r['bytes_written'] / 1024:.0f} KB")
@@ -3,6 +3,8 @@ AgriMacro Pipeline — Shared utility functions.
 Canonical formulas for spreads and ratios used across multiple scripts.
 """
 
+import numpy as np
+
 
 def calculate_crush_spread(zm, zl, zs):
     """
@@ -18,13 +20,17 @@ def calculate_crush_spread(zm, zl, zs):
         zm: Soybean Meal price in USD per short ton (2000 lbs)
         zl: Soybean Oil price in cents per pound
         zs: Soybeans price in cents per bushel
+        Each may be a scalar, numpy array or pandas Series (element-wise);
+        lists/tuples are converted to float arrays.
 
     Returns:
-        Crush margin in USD per bushel
+        Crush margin in USD per bushel (same shape as the inputs)
 
     Formula:
         (ZM * 44/2000)  — meal value: 44 lbs yield / 2000 lbs per ton * price per ton
       + (ZL * 11/100)   — oil value:  11 lbs yield * price in cents converted to dollars
       - (ZS / 100)      — soy cost:   cents per bushel converted to dollars
     """
+    zm, zl, zs = (np.asarray(v, dtype=float) if isinstance(v, (list, tuple)) else v
+                  for v in (zm, zl, zs))
     return (zm * 44 / 2000) + (zl * 11 / 100) - (zs / 100)
@@ -15,6 +15,12 @@ Override: volume do dia > 5x media 20d anula flags de variacao
 Rollover: volume do dia > 3x media 20d AND media dos 3 dias anteriores
 < 0.3x media 20d -> marca is_rollover_gap (nao suspeito). Fingerprint
 de troca de contrato na serie ContFuture do IBKR (sem back-adjustment).
+
+Historico completo: series_flags() aplica as mesmas regras a TODAS as
+barras de uma vez (numpy) e acrescenta checagens estruturais (preco zero,
+data ausente/duplicada/fora de ordem, OHLC inconsistente). O resultado vai
+para price_flags.json -- um bitmask por barra, alinhado com price_history;
+clean_mask() da a mascara de barras utilizaveis para as analises.
 """
 
 import json
@@ -22,10 +28,14 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
 BASE = Path(__file__).parent.parent
 PH_PATH = BASE / "agrimacro-dash" / "public" / "data" / "processed" / "price_history.json"
 CACHE_PATH = BASE / "agrimacro-dash" / "public" / "data" / "processed" / "last_known_good_prices.json"
 VAL_PATH = BASE / "agrimacro-dash" / "public" / "data" / "processed" / "price_validation.json"
+FLAGS_PATH = BASE / "agrimacro-dash" / "public" / "data" / "processed" / "price_flags.json"
 
 # Limites de variacao diaria por simbolo (baseados em CME circuit breakers)
 DAILY_LIMITS = {
@@ -59,6 +69,35 @@ PRICE_BOUNDS = {
 }
 
 
+# Bitmask por barra (price_flags.json)
+FLAG_BOUNDS = 1 << 0        # close fora de PRICE_BOUNDS
+FLAG_LIMIT = 1 << 1         # variacao diaria > DAILY_LIMITS (sem rollover/override)
+FLAG_SIGMA = 1 << 2         # > 3 sigma da media 20d (sem confirmacao de volume)
+FLAG_ZERO = 1 << 3          # close/open/high/low <= 0 ou close ausente
+FLAG_NO_DATE = 1 << 4       # data ausente
+FLAG_DUP_DATE = 1 << 5      # mesma data da barra anterior
+FLAG_OUT_OF_ORDER = 1 << 6  # data anterior a da barra anterior
+FLAG_OHLC = 1 << 7          # high < low ou open fora de [low, high]
+FLAG_ROLLOVER = 1 << 8      # fingerprint de rollover (informativo)
+FLAG_VOL_OVERRIDE = 1 << 9  # variacao anulada por volume > 5x (informativo)
+FLAG_SETTLE_RANGE = 1 << 10  # close fora de [low, high] (informativo: settlement ICE != ultimo negocio)
+
+FLAG_NAMES = {
+    FLAG_BOUNDS: "bounds", FLAG_LIMIT: "limit", FLAG_SIGMA: "sigma", FLAG_ZERO: "zero",
+    FLAG_NO_DATE: "no_date", FLAG_DUP_DATE: "dup_date", FLAG_OUT_OF_ORDER: "out_of_order",
+    FLAG_OHLC: "ohlc", FLAG_ROLLOVER: "rollover", FLAG_VOL_OVERRIDE: "vol_override",
+    FLAG_SETTLE_RANGE: "settle_range",
+}
+# Barras com qualquer um destes bits ficam fora da mascara limpa. SIGMA bloqueia a
+# ultima barra mas nao o historico: em tendencia a media 20d e ultrapassada em ~4%
+# das barras sem dado corrompido (limite diario e bounds pegam os splices ruins).
+BLOCKING_FLAGS = (FLAG_BOUNDS | FLAG_LIMIT | FLAG_ZERO | FLAG_NO_DATE
+                  | FLAG_DUP_DATE | FLAG_OUT_OF_ORDER | FLAG_OHLC)
+STRUCTURAL_FLAGS = FLAG_NO_DATE | FLAG_DUP_DATE | FLAG_OUT_OF_ORDER | FLAG_OHLC
+
+WINDOW = 20
+
+
 def detect_rollover(bars, idx):
     """
     Detecta se bars[idx] e um dia de rollover de contrato continuous futures.
@@ -92,6 +131,192 @@ def detect_rollover(bars, idx):
     return is_rollover, vol_ratio, prior_ratio
 
 
+def _bars(d):
+    """Aceita os dois formatos do price_history: lista de barras ou dict com 'bars'."""
+    if isinstance(d, list):
+        return d
+    if isinstance(d, dict):
+        return d.get("bars", [])
+    return None
+
+
+def _field(bars, key):
+    try:
+        return np.array([b.get(key) for b in bars], dtype=float)
+    except (TypeError, ValueError):
+        return np.array([v if isinstance(v, (int, float)) else np.nan
+                         for v in (b.get(key) for b in bars)], dtype=float)
+
+
+def _trailing_stats(x, window=WINDOW):
+    """
+    Media, desvio (populacional) e contagem dos valores validos (nao-NaN)
+    nas `window` barras ANTERIORES a cada indice; NaN antes de haver janela.
+    """
+    n = len(x)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    count = np.zeros(n, dtype=int)
+    if n > window:
+        win = sliding_window_view(x, window)[:n - window]
+        ok = ~np.isnan(win)
+        cnt = ok.sum(axis=1)
+        total = np.where(ok, win, 0.0).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m = total / cnt
+            var = np.where(ok, (win - m[:, None]) ** 2, 0.0).sum(axis=1) / cnt
+        mean[window:] = m
+        std[window:] = np.sqrt(var)
+        count[window:] = cnt
+    return mean, std, count
+
+
+def rollover_fingerprint(bars, vol=None):
+    """
+    Versao vetorizada de detect_rollover para a serie inteira.
+    Retorna (mascara, vol_ratio, prior_ratio), arrays alinhados com bars.
+    """
+    if vol is None:
+        vol = np.nan_to_num(_field(bars, "volume"), nan=0.0)
+    avg_vol, _, _ = _trailing_stats(np.where(vol > 0, vol, np.nan))
+    prior = np.full(len(vol), np.nan)
+    if len(vol) > 3:
+        prior[3:] = (vol[2:-1] + vol[1:-2] + vol[:-3]) / 3
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vol_ratio = np.where(avg_vol > 0, vol / avg_vol, 0.0)
+        prior_ratio = np.where(avg_vol > 0, prior / avg_vol, 0.0)
+    vol_ratio = np.nan_to_num(vol_ratio, nan=0.0)
+    prior_ratio = np.nan_to_num(prior_ratio, nan=0.0)
+    return (vol_ratio > 3.0) & (prior_ratio < 0.3), vol_ratio, prior_ratio
+
+
+def series_flags(sym, bars):
+    """
+    Avalia todas as barras de um simbolo numa passada vetorizada.
+    Mesmas regras do check da ultima barra (bounds, limite diario, 3 sigma
+    com override de volume 3x, rollover, override de volume 5x) + checagens
+    estruturais. Retorna (flags uint16, stats) -- stats traz os arrays
+    intermediarios (chg_pct, sigma, mean20, vol_ratio, prior_ratio, ...).
+    """
+    n = len(bars)
+    close = _field(bars, "close")
+    opn, high, low = _field(bars, "open"), _field(bars, "high"), _field(bars, "low")
+    vol = np.nan_to_num(_field(bars, "volume"), nan=0.0)
+    flags = np.zeros(n, dtype=np.uint16)
+    limit = DAILY_LIMITS.get(sym, 10.0)
+    lo, hi = PRICE_BOUNDS.get(sym, (0, 999999))
+
+    # Estruturais
+    flags[~(close > 0)] |= FLAG_ZERO
+    for arr in (opn, high, low):
+        flags[~np.isnan(arr) & (arr <= 0)] |= FLAG_ZERO
+    dates = np.array([str(b.get("date") or "") for b in bars])
+    flags[dates == ""] |= FLAG_NO_DATE
+    if n > 1:
+        flags[1:][(dates[1:] == dates[:-1]) & (dates[1:] != "")] |= FLAG_DUP_DATE
+        flags[1:][(dates[1:] < dates[:-1]) & (dates[1:] != "")] |= FLAG_OUT_OF_ORDER
+    full = ~(np.isnan(opn) | np.isnan(high) | np.isnan(low) | np.isnan(close))
+    tol = 1e-9 * np.abs(np.nan_to_num(close))
+    with np.errstate(invalid="ignore"):
+        bad_ohlc = (high < low - tol) | (opn > high + tol) | (opn < low - tol)
+        settle_out = (close > high + tol) | (close < low - tol)
+    flags[full & bad_ohlc] |= FLAG_OHLC
+    flags[full & settle_out] |= FLAG_SETTLE_RANGE
+
+    # REGRA 1: bounds absolutos
+    flags[~((close >= lo) & (close <= hi))] |= FLAG_BOUNDS
+
+    # REGRA 2: variacao diaria
+    prev = np.r_[np.nan, close[:-1]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        chg = np.where(prev > 0, (close - prev) / prev * 100, 0.0)
+    chg = np.nan_to_num(chg, nan=0.0)
+    limit_hit = np.abs(chg) > limit
+
+    # REGRA 3: distancia da media 20d (so closes positivos), override por volume 3x
+    mean20, std20, _ = _trailing_stats(np.where(close > 0, close, np.nan))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.where(std20 > 0, np.abs(close - mean20) / std20, 0.0)
+    sigma = np.nan_to_num(sigma, nan=0.0)
+    rollover, vol_ratio, prior_ratio = rollover_fingerprint(bars, vol)
+    sigma_raw = sigma > 3
+    sigma_hit = sigma_raw & ~(vol_ratio > 3)
+
+    # REGRA 4a/4b: rollover limpa a variacao; senao volume > 5x limpa
+    variation = limit_hit | sigma_hit
+    roll_gap = variation & rollover
+    vol_override = variation & ~rollover & (vol_ratio > 5)
+    keep = variation & ~roll_gap & ~vol_override
+    flags[rollover] |= FLAG_ROLLOVER
+    flags[vol_override] |= FLAG_VOL_OVERRIDE
+    flags[keep & limit_hit] |= FLAG_LIMIT
+    flags[keep & sigma_hit] |= FLAG_SIGMA
+
+    stats = {
+        "chg_pct": chg, "sigma": sigma, "mean20": mean20, "sigma_raw": sigma_raw,
+        "vol_ratio": vol_ratio, "prior_ratio": prior_ratio,
+        "limit_hit": limit_hit, "sigma_hit": sigma_hit, "rollover_gap": roll_gap,
+        "vol_override": vol_override,
+    }
+    return flags, stats
+
+
+def flag_names(value):
+    return [name for bit, name in FLAG_NAMES.items() if value & bit]
+
+
+def clean_mask(flags):
+    """True nas barras sem nenhum bit bloqueante."""
+    return (np.asarray(flags) & BLOCKING_FLAGS) == 0
+
+
+def scan_history(data):
+    """{sym: (flags, stats)} para todo o price_history (formatos lista ou dict)."""
+    out = {}
+    for sym, d in data.items():
+        if sym.startswith("_"):
+            continue
+        bars = _bars(d)
+        if bars:
+            out[sym] = series_flags(sym, bars)
+    return out
+
+
+def save_flags(data, scanned, path=None):
+    """price_flags.json: bitmask por barra + contagem por regra + lista das barras marcadas."""
+    doc = {
+        "generated_at": datetime.now().isoformat(),
+        "flag_bits": {name: bit for bit, name in FLAG_NAMES.items()},
+        "blocking_mask": BLOCKING_FLAGS,
+        "symbols": {},
+    }
+    for sym, (flags, _) in scanned.items():
+        bars = _bars(data[sym])
+        marked = np.flatnonzero(flags)
+        doc["symbols"][sym] = {
+            "n_bars": len(bars),
+            "last_date": bars[-1].get("date", ""),
+            "clean_bars": int(clean_mask(flags).sum()),
+            "counts": {name: int((flags & bit).astype(bool).sum())
+                       for bit, name in FLAG_NAMES.items() if (flags & bit).any()},
+            "flags": flags.tolist(),
+            "flagged": [[int(i), bars[i].get("date", ""), flag_names(int(flags[i]))] for i in marked],
+        }
+    with open(path or FLAGS_PATH, "w", encoding="utf-8") as f:
+        json.dump(doc, f, separators=(",", ":"))
+    return doc
+
+
+def load_flags(path=None):
+    """{sym: np.ndarray de flags}; vazio se o arquivo nao existe."""
+    path = path or FLAGS_PATH
+    if not Path(path).exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    return {sym: np.asarray(v["flags"], dtype=np.uint16) for sym, v in doc.get("symbols", {}).items()}
+
+
 def load_cache():
     """Carrega ultimo preco bom conhecido."""
     if CACHE_PATH.exists():
@@ -138,99 +363,81 @@ def validate_and_fix():
         "details": {}
     }
 
+    # Uma passada vetorizada sobre o historico inteiro; a ultima barra decide o bloqueio
+    scanned = scan_history(data)
+    validation["history"] = {}
+
     for sym, d in data.items():
         # Skip metadata keys
-        if sym.startswith("_"):
+        if sym.startswith("_") or sym not in scanned:
             continue
-
-        # Handle both formats: list of bars or dict with bars key
-        if isinstance(d, list):
-            bars = d
-        elif isinstance(d, dict):
-            bars = d.get("bars", [])
-        else:
-            continue
-
+        bars = _bars(d)
         if len(bars) < 2:
             continue
+        flags, st = scanned[sym]
 
         validation["total"] += 1
         limit = DAILY_LIMITS.get(sym, 10.0)
         bounds = PRICE_BOUNDS.get(sym, (0, 999999))
 
-        current = bars[-1].get("close", 0)
-        prev = bars[-2].get("close", 0)
+        current = bars[-1].get("close", 0) or 0
+        prev = bars[-2].get("close", 0) or 0
+        last = int(flags[-1])
 
         # REGRA 1: Bounds absolutos
         bounds_issue = None
-        if not (bounds[0] <= current <= bounds[1]):
+        if last & FLAG_BOUNDS:
             bounds_issue = "Preco {} fora dos bounds validos [{}, {}]".format(
                 current, bounds[0], bounds[1])
 
         # REGRA 2: Variacao diaria
         variation_issues = []
-        if prev > 0:
-            daily_chg = abs((current - prev) / prev * 100)
-            if daily_chg > limit:
+        if st["limit_hit"][-1]:
+            variation_issues.append(
+                "Variacao diaria {:.1f}% excede limite de +-{}% para {}".format(
+                    abs(st["chg_pct"][-1]), limit, sym)
+            )
+
+        # REGRA 3: Variacao vs media 20 dias (override de volume 3x ja aplicado em series_flags:
+        # sigma em range comprimido e prone a falso positivo; volume > 3x confirma movimento real)
+        if st["sigma_raw"][-1]:
+            if not st["sigma_hit"][-1]:
+                print("[OVERRIDE-SIGMA] {}: {:.1f}sigma anulado por volume {:.1f}x media".format(
+                    sym, st["sigma"][-1], st["vol_ratio"][-1]))
+            else:
                 variation_issues.append(
-                    "Variacao diaria {:.1f}% excede limite de +-{}% para {}".format(
-                        daily_chg, limit, sym)
+                    "Preco {} e {:.1f}\u03c3 da media 20d ({:.2f})".format(
+                        current, st["sigma"][-1], st["mean20"][-1])
                 )
 
-        # REGRA 3: Variacao vs media 20 dias (com override de volume inline)
-        if len(bars) >= 20:
-            closes = [b.get("close", 0) for b in bars[-21:-1]]
-            closes = [c for c in closes if c > 0]
-            if closes:
-                avg = sum(closes) / len(closes)
-                std = (sum((c - avg) ** 2 for c in closes) / len(closes)) ** 0.5
-                if std > 0 and abs(current - avg) > 3 * std:
-                    # Override de volume (threshold mais permissivo 3x -- sigma em range
-                    # comprimido e prone a falso positivo). REGRA 2 mantem limite 5x
-                    # via REGRA 4b global. Se volume hoje > 3x media 20d, sigma e
-                    # movimento real confirmado por fluxo, nao dado corrompido.
-                    vols_r3 = [b.get("volume", 0) or 0 for b in bars[-21:-1]]
-                    vols_r3 = [v for v in vols_r3 if v > 0]
-                    cur_vol_r3 = bars[-1].get("volume", 0) or 0
-                    vol_confirms = False
-                    if vols_r3 and cur_vol_r3 > 0:
-                        avg_vol_r3 = sum(vols_r3) / len(vols_r3)
-                        if avg_vol_r3 > 0 and cur_vol_r3 > 3 * avg_vol_r3:
-                            vol_confirms = True
-                            print("[OVERRIDE-SIGMA] {}: {:.1f}sigma anulado por volume {:.1f}x media".format(
-                                sym, abs(current - avg) / std, cur_vol_r3 / avg_vol_r3))
-                    if not vol_confirms:
-                        variation_issues.append(
-                            "Preco {} e {:.1f}\u03c3 da media 20d ({:.2f})".format(
-                                current, abs(current - avg) / std, avg)
-                        )
-
         # REGRA 4a (rollover): gap por troca de contrato NAO e suspeito.
         # Checa antes do override de volume porque e fingerprint mais especifico.
         is_rollover_gap = False
         rollover_info = None
-        if variation_issues:
-            is_roll, vr, pr = detect_rollover(bars, len(bars) - 1)
-            if is_roll:
-                is_rollover_gap = True
-                rollover_info = {"vol_ratio": round(vr, 2), "prior_ratio": round(pr, 2)}
-                variation_issues = []
-                validation["rollovers"] += 1
-                print("[ROLLOVER] {}: gap por troca de contrato (vol {:.1f}x, prior {:.2f}x)".format(
-                    sym, vr, pr))
+        if variation_issues and st["rollover_gap"][-1]:
+            vr, pr = st["vol_ratio"][-1], st["prior_ratio"][-1]
+            is_rollover_gap = True
+            rollover_info = {"vol_ratio": round(float(vr), 2), "prior_ratio": round(float(pr), 2)}
+            variation_issues = []
+            validation["rollovers"] += 1
+            print("[ROLLOVER] {}: gap por troca de contrato (vol {:.1f}x, prior {:.2f}x)".format(
+                sym, vr, pr))
 
         # REGRA 4b (override de volume): so se NAO for rollover.
         # volume do dia > 5x media 20d anula flags de variacao (news flow).
-        if variation_issues and not is_rollover_gap and len(bars) >= 20:
-            current_vol = bars[-1].get("volume", 0) or 0
-            vols = [b.get("volume", 0) or 0 for b in bars[-21:-1]]
-            vols = [v for v in vols if v > 0]
-            if vols and current_vol > 0:
-                avg_vol = sum(vols) / len(vols)
-                if avg_vol > 0 and current_vol > 5 * avg_vol:
-                    print("[OVERRIDE] {}: variacao anulada por volume {:.1f}x media (movimento real)".format(
-                        sym, current_vol / avg_vol))
-                    variation_issues = []
+        if variation_issues and st["vol_override"][-1]:
+            print("[OVERRIDE] {}: variacao anulada por volume {:.1f}x media (movimento real)".format(
+                sym, st["vol_ratio"][-1]))
+            variation_issues = []
+
+        # Historico: barras antigas marcadas (nao bloqueiam o preco atual)
+        history_bad = int((~clean_mask(flags[:-1])).sum())
+        validation["history"][sym] = {
+            "bars": len(bars),
+            "flagged": history_bad,
+            "counts": {name: int((flags & bit).astype(bool).sum())
+                       for bit, name in FLAG_NAMES.items() if (flags & bit).any()},
+        }
 
         issues = ([bounds_issue] if bounds_issue else []) + variation_issues
 
@@ -247,6 +454,10 @@ def validate_and_fix():
         if is_rollover_gap:
             detail["is_rollover_gap"] = True
             detail["rollover_info"] = rollover_info
+        if last & STRUCTURAL_FLAGS:
+            detail["warnings"] = flag_names(last & STRUCTURAL_FLAGS)
+            validation["warned"] += 1
+            print("[WARN] {}: ultima barra com {}".format(sym, detail["warnings"]))
 
         if issues:
             # DADO SUSPEITO -- usar cache se disponivel
@@ -292,6 +503,12 @@ def validate_and_fix():
     # Salvar cache atualizado
     save_cache(new_cache)
 
+    # Bitmask por barra para as analises (mascara limpa)
+    try:
+        save_flags(data, scanned)
+    except OSError as e:
+        print("[WARN] price_flags.json nao salvo: {}".format(e))
+
     # Salvar relatorio de validacao
     with open(VAL_PATH, "w", encoding="utf-8") as f:
         json.dump(validation, f, indent=2)
@@ -301,6 +518,8 @@ def validate_and_fix():
     print("  Aprovados: {}".format(validation["passed"]))
     print("  Bloqueados: {}".format(validation["blocked"]))
     print("  Rollovers: {}".format(validation["rollovers"]))
+    print("  Barras historicas marcadas: {}".format(
+        sum(h["flagged"] for h in validation["history"].values())))
 
     blocked_syms = [
         s for s, v in validation["details"].items()
@@ -0,0 +1,340 @@
+"""
+AgriMacro - Weather Archive
+Historico diario local (observado + previsao) por regiao agricola, em
+formato colunar compacto: um .npz por regiao em data/weather_archive/ com
+colunas date (dias desde 1970), tmax, tmin, precip (float32), kind (0 =
+observado, 1 = previsao) e issued (dia em que a previsao foi emitida).
+
+Append incremental: observado sempre vence previsao; previsao mais nova
+vence a mais antiga. Regioes = collect_weather.REGIONS.
+
+Indicadores vetorizados (numpy) sobre o historico armazenado:
+  gdd          graus-dia acumulados (base/teto por cultura)
+  anomalia     chuva de N dias vs normal 1991-2020 do mesmo periodo do ano
+  dry spells   sequencia seca atual, dias secos e maior sequencia na janela
+Acumulados so saem com a janela toda observada (cobertura vai junto);
+dia sem dado nao vira 0 mm nem dia seco.
+
+Uso:
+  python pipeline/weather_archive.py --backfill 1991   # normais (archive API, 1 chamada/bloco)
+  python pipeline/weather_archive.py --update          # observado recente + previsao (1 chamada)
+  python pipeline/weather_archive.py                   # sinais de estresse por regiao
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+ARCHIVE_DIR = Path(__file__).parent.parent / "data" / "weather_archive"
+ARCHIVE_API = "https://archive-api.open-meteo.com/v1/archive"
+FORECAST_API = "https://api.open-meteo.com/v1/forecast"
+DAILY = "temperature_2m_max,temperature_2m_min,precipitation_sum"
+
+OBSERVED, FORECAST = 0, 1
+NORMALS = (1991, 2020)
+MIN_NORMAL_YEARS = 10        # menos que isso: sem anomalia
+NORMAL_SMOOTH_DAYS = 15      # janela circular da climatologia diaria
+DRY_DAY_MM = 1.0
+MAX_PAST_DAYS = 92           # limite do past_days do endpoint de previsao
+BACKFILL_CHUNK_YEARS = 10
+
+COLUMNS = ("date", "tmax", "tmin", "precip", "kind", "issued")
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(d):
+    return (d - EPOCH).days
+
+
+def day_date(n):
+    return EPOCH + timedelta(days=int(n))
+
+
+def _regions():
+    from collect_weather import REGIONS
+    return REGIONS
+
+
+# ── armazenamento ──
+
+def _path(region):
+    return ARCHIVE_DIR / f"{region}.npz"
+
+
+def _empty():
+    return {
+        "date": np.empty(0, np.int32), "tmax": np.empty(0, np.float32),
+        "tmin": np.empty(0, np.float32), "precip": np.empty(0, np.float32),
+        "kind": np.empty(0, np.uint8), "issued": np.empty(0, np.int32),
+    }
+
+
+def load(region):
+    """Colunas da regiao (ordenadas por data); vazio se ainda nao houver arquivo."""
+    p = _path(region)
+    if not p.exists():
+        return _empty()
+    with np.load(p) as z:
+        return {c: z[c] for c in COLUMNS}
+
+
+def save(region, cols):
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = _path(region).with_suffix(".tmp.npz")
+    np.savez_compressed(tmp, **cols)
+    os.replace(tmp, _path(region))
+
+
+def merge(old, new):
+    """
+    Une dois blocos de colunas, uma linha por data. Prioridade: observado >
+    previsao; entre previsoes, a de issued mais recente; empate -> bloco novo.
+    """
+    cols = {c: np.concatenate([old[c], new[c].astype(old[c].dtype)]) for c in COLUMNS}
+    n_old = len(old["date"])
+    is_new = np.arange(len(cols["date"])) >= n_old
+    prio = (cols["kind"] == OBSERVED).astype(np.int64) * 2 ** 40 + cols["issued"].astype(np.int64) * 2 + is_new
+    order = np.lexsort((prio, cols["date"]))
+    dates = cols["date"][order]
+    last = np.r_[dates[1:] != dates[:-1], True]       # ultima linha (maior prioridade) de cada data
+    keep = order[last]
+    return {c: cols[c][keep] for c in COLUMNS}
+
+
+def append(region, dates, tmax, tmin, precip, kind, issued=None):
+    """Append incremental de dias (datas ISO ou date) na regiao."""
+    n = len(dates)
+    if not n:
+        return load(region)
+    issued = day_number(date.today()) if issued is None else issued
+    new = {
+        "date": np.array([day_number(d if isinstance(d, date) else date.fromisoformat(d[:10])) for d in dates], np.int32),
+        "tmax": np.array([np.nan if v is None else v for v in tmax], np.float32),
+        "tmin": np.array([np.nan if v is None else v for v in tmin], np.float32),
+        "precip": np.array([np.nan if v is None else v for v in precip], np.float32),
+        "kind": np.full(n, kind, np.uint8),
+        "issued": np.full(n, issued, np.int32),
+    }
+    cols = merge(load(region), new)
+    save(region, cols)
+    return cols
+
+
+def append_forecasts(regions_data):
+    """Previsoes ja coletadas pelo collect_weather (regions[k]["forecast_15d"])."""
+    for key, reg in regions_data.items():
+        fc = reg.get("forecast_15d") or []
+        if fc:
+            append(key, [f["date"] for f in fc], [f.get("temp_max") for f in fc],
+                   [f.get("temp_min") for f in fc], [f.get("precip_mm") for f in fc], FORECAST)
+
+
+# ── coleta (Open-Meteo multi-coordenada: uma chamada para todas as regioes) ──
+
+def _fetch(url, regions, **params):
+    keys = list(regions)
+    resp = requests.get(url, params={
+        "latitude": ",".join(str(regions[k]["lat"]) for k in keys),
+        "longitude": ",".join(str(regions[k]["lon"]) for k in keys),
+        "daily": DAILY, "timezone": "auto", **params,
+    }, timeout=60)
+    resp.raise_for_status()
+    data = resp.json()
+    data = [data] if isinstance(data, dict) else data
+    return {k: d.get("daily", {}) for k, d in zip(keys, data)}
+
+
+def _store(key, daily, kind_of):
+    dates = daily.get("time", [])
+    if not dates:
+        return 0
+    today = date.today().isoformat()
+    kinds = np.array([kind_of(d, today) for d in dates], np.uint8)
+    for kind in (OBSERVED, FORECAST):
+        idx = np.flatnonzero(kinds == kind)
+        if len(idx):
+            append(key, [dates[i] for i in idx],
+                   [daily["temperature_2m_max"][i] for i in idx],
+                   [daily["temperature_2m_min"][i] for i in idx],
+                   [daily["precipitation_sum"][i] for i in idx], kind)
+    return len(dates)
+
+
+def backfill(start_year=NORMALS[0], end=None, regions=None):
+    """Historico observado (ERA5) desde start_year, em blocos de BACKFILL_CHUNK_YEARS."""
+    regions = regions or _regions()
+    end = end or date.today() - timedelta(days=6)   # archive API atrasa ~5 dias
+    y = start_year
+    while y <= end.year:
+        chunk_end = min(date(y + BACKFILL_CHUNK_YEARS - 1, 12, 31), end)
+        got = _fetch(ARCHIVE_API, regions, start_date=f"{y}-01-01", end_date=chunk_end.isoformat())
+        n = sum(_store(k, d, lambda _d, _t: OBSERVED) for k, d in got.items())
+        print(f"  [backfill] {y}..{chunk_end.year}: {n} dias")
+        y += BACKFILL_CHUNK_YEARS
+
+
+def update(regions=None):
+    """
+    Observado desde o ultimo dia arquivado + previsao 16 dias, numa chamada
+    so; no-op se todas as regioes ja tem observado ate ontem.
+    """
+    regions = regions or _regions()
+    today = day_number(date.today())
+    last_obs = []
+    for k in regions:
+        cols = load(k)
+        obs = cols["date"][cols["kind"] == OBSERVED]
+        last_obs.append(int(obs.max()) if len(obs) else today - MAX_PAST_DAYS)
+    if min(last_obs) >= today - 1:
+        print("  [update] observado ja ate ontem -- nada a buscar")
+        return 0
+    past = int(min(MAX_PAST_DAYS, max(1, today - min(last_obs))))
+    got = _fetch(FORECAST_API, regions, past_days=past, forecast_days=16)
+    n = sum(_store(k, d, lambda d_, t: OBSERVED if d_ < t else FORECAST) for k, d in got.items())
+    print(f"  [update] {len(got)} regioes, {past} dias observados + previsao ({n} linhas)")
+    return n
+
+
+# ── indicadores vetorizados ──
+
+def window(cols, start=None, end=None):
+    """Serie diaria densa [start, end] (NaN onde faltar), sem buracos de data."""
+    if not len(cols["date"]):
+        return None
+    start = day_number(start) if isinstance(start, date) else int(cols["date"][0] if start is None else start)
+    end = day_number(end) if isinstance(end, date) else int(cols["date"][-1] if end is None else end)
+    n = end - start + 1
+    out = {"date": np.arange(start, end + 1, dtype=np.int32)}
+    sel = (cols["date"] >= start) & (cols["date"] <= end)
+    pos = cols["date"][sel] - start
+    for c in ("tmax", "tmin", "precip"):
+        a = np.full(n, np.nan, np.float32)
+        a[pos] = cols[c][sel]
+        out[c] = a
+    kind = np.full(n, 255, np.uint8)
+    kind[pos] = cols["kind"][sel]
+    out["kind"] = kind
+    return out
+
+
+def gdd(tmax, tmin, base=10.0, cap=30.0):
+    """Graus-dia diarios (metodo 86/50 em C): temperaturas limitadas a [base, cap]."""
+    tx = np.clip(tmax, base, cap)
+    tn = np.clip(tmin, base, cap)
+    return np.nan_to_num((tx + tn) / 2 - base)
+
+
+def _doy(days):
+    """Dia do ano 0..365 para dias desde 1970."""
+    d = days.astype("datetime64[D]")
+    return (d - d.astype("datetime64[Y]")).astype(int)
+
+
+def daily_normals(cols, years=NORMALS):
+    """
+    Climatologia diaria de chuva (mm/dia por dia do ano, 366) nos anos de
+    `years`, suavizada com media circular de NORMAL_SMOOTH_DAYS. None se
+    houver menos de MIN_NORMAL_YEARS anos observados.
+    """
+    obs = cols["kind"] == OBSERVED
+    d = cols["date"][obs]
+    yr = d.astype("datetime64[D]").astype("datetime64[Y]").astype(int) + 1970
+    sel = (yr >= years[0]) & (yr <= years[1]) & ~np.isnan(cols["precip"][obs])
+    if len(np.unique(yr[sel])) < MIN_NORMAL_YEARS:
+        return None
+    doy = _doy(d[sel])
+    total = np.bincount(doy, weights=cols["precip"][obs][sel], minlength=366)
+    count = np.bincount(doy, minlength=366)
+    mean = np.divide(total, count, out=np.zeros(366), where=count > 0)
+    k = NORMAL_SMOOTH_DAYS
+    padded = np.r_[mean[-k:], mean, mean[:k]]
+    kernel = np.ones(2 * k + 1) / (2 * k + 1)
+    return np.convolve(padded, kernel, mode="same")[k:-k]
+
+
+def dry_spells(precip, dry_mm=DRY_DAY_MM):
+    """Comprimento da sequencia seca terminando em cada dia (NaN interrompe a sequencia)."""
+    wet = ~(precip < dry_mm)
+    idx = np.arange(len(precip))
+    last_wet = np.maximum.accumulate(np.where(wet, idx, -1))
+    return idx - last_wet
+
+
+def stress_signals(region, asof=None, season_start=None, lookback=30, cols=None,
+                   gdd_base=10.0, gdd_cap=30.0):
+    """
+    Sinais de estresse da regiao na data `asof` (padrao: ultimo observado).
+    season_start (date) define o acumulado de chuva/GDD da safra. So dias
+    observados entram; *_obs_days / *_days dao a cobertura e acumulados de
+    janela incompleta saem None.
+    """
+    cols = load(region) if cols is None else cols
+    obs = cols["date"][cols["kind"] == OBSERVED]
+    if not len(obs):
+        return None
+    end = day_number(asof) if asof else int(obs.max())
+    start = day_number(season_start) if season_start else end - lookback + 1
+    start = min(start, end - lookback + 1, end - 60 + 1)
+    w = window(cols, start, end)
+    seen = w["kind"] == OBSERVED
+    p = np.where(seen, w["precip"], np.nan)
+    temp_seen = seen & ~np.isnan(w["tmax"]) & ~np.isnan(w["tmin"])
+    spell = dry_spells(p)
+    recent = slice(len(p) - lookback, len(p))
+    recent_obs = int((~np.isnan(p[recent])).sum())
+    out = {
+        "asof": day_date(end).isoformat(),
+        "precip_%dd_mm" % lookback: round(float(np.nansum(p[recent])), 1) if recent_obs == lookback else None,
+        "obs_days_%dd" % lookback: recent_obs,
+        "dry_spell_days": int(spell[-1]),
+        "dry_days_%dd" % lookback: int((p[recent] < DRY_DAY_MM).sum()),
+        "max_dry_spell_60d": int(spell[-60:].max()),
+    }
+    normals = daily_normals(cols)
+    if normals is not None:
+        doy = _doy(w["date"])
+        normal_recent = float(normals[doy[recent]].sum())
+        precip_recent = out["precip_%dd_mm" % lookback]
+        out["normal_%dd_mm" % lookback] = round(normal_recent, 1)
+        out["anomaly_%dd_pct" % lookback] = round((precip_recent / normal_recent - 1) * 100, 1) \
+            if normal_recent and precip_recent is not None else None
+    if season_start:
+        s = slice(max(0, day_number(season_start) - start), len(p))
+        n_days = len(p) - s.start
+        obs_days = int((~np.isnan(p[s])).sum())
+        temp_days = int(temp_seen[s].sum())
+        out["season_days"] = n_days
+        out["season_obs_days"] = obs_days
+        out["season_precip_mm"] = round(float(np.nansum(p[s])), 1) if obs_days == n_days else None
+        out["season_gdd"] = round(float(gdd(w["tmax"][s], w["tmin"][s], gdd_base, gdd_cap).sum()), 0) \
+            if temp_days == n_days else None
+        if normals is not None:
+            out["season_normal_mm"] = round(float(normals[_doy(w["date"][s])].sum()), 1)
+    fc = cols["kind"] == FORECAST
+    ahead = fc & (cols["date"] > end)
+    if ahead.any():
+        out["forecast_precip_mm"] = round(float(np.nansum(cols["precip"][ahead])), 1)
+        out["forecast_days"] = int(ahead.sum())
+    return out
+
+
+if __name__ == "__main__":
+    if "--backfill" in sys.argv:
+        i = sys.argv.index("--backfill")
+        start = int(sys.argv[i + 1]) if i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() else NORMALS[0]
+        backfill(start)
+    if "--update" in sys.argv:
+        update()
+    t0 = datetime.now()
+    for key in _regions():
+        print(f"  {key:<14} {stress_signals(key)}")
+    print(f"  ({(datetime.now() - t0).total_seconds() * 1000:.0f} ms)")
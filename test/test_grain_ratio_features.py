@@ -0,0 +1,175 @@
+"""
+Guarda do feature frame colunar do grain_ratio_engine: mesmo resultado das
+versoes linha-a-linha antigas (crush via df.apply, COP ano a ano, COT por
+registro) e build dentro do FEATURE_BUDGET_MS, sobre um fixture sintetico
+(sem rede, sem caches).
+
+  python -m pytest test/test_grain_ratio_features.py -q
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "pipeline"))
+
+import grain_ratio_engine as gre
+from utils import calculate_crush_spread
+
+START, END = "2000-01-01", "2025-12-01"
+BASE_PRICES = {   # ordem de grandeza das unidades do engine (graos em USD/bu)
+    "corn": 4.5, "soy": 11.0, "wheat": 6.0, "soymeal": 3.3, "soyoil": 45.0,
+    "live_cattle": 150.0, "crude_oil": 70.0, "wheat_kc": 6.5,
+}
+
+
+# ── implementacoes linha-a-linha antigas (referencia) ──
+
+def old_crush(df):
+    return df.apply(lambda r: calculate_crush_spread(r["soymeal"] * 100, r["soyoil"], r["soy"] * 100), axis=1)
+
+
+def old_cop(df, ers_cop):
+    cop = {int(y): [np.nan if v is None else v for v in vals] for y, vals in ers_cop.items()}
+
+    def _cop_lookup(_year, _idx):
+        if _year in cop and not pd.isna(cop[_year][_idx]):
+            return cop[_year][_idx]
+        for _y in range(_year - 1, 1989, -1):
+            if _y in cop and not pd.isna(cop[_y][_idx]):
+                return cop[_y][_idx]
+        return float("nan")
+
+    return {col: df.index.map(lambda d, i=i: _cop_lookup(d.year, i)).to_numpy(float)
+            for i, col in enumerate(gre.COP_COLS)}
+
+
+def _extract_mm_cot(rec):
+    for mk in ["managed_money_net", "mm_net", "noncommercial_net", "net_position"]:
+        v = gre.safe_float(rec.get(mk, np.nan))
+        if not np.isnan(v): return v
+    for lk, sk in [("managed_money_long", "managed_money_short"), ("mm_long", "mm_short"),
+                   ("noncommercial_long", "noncommercial_short")]:
+        lng = gre.safe_float(rec.get(lk, np.nan))
+        sht = gre.safe_float(rec.get(sk, np.nan))
+        if not np.isnan(lng) and not np.isnan(sht):
+            return lng - sht
+    return np.nan
+
+
+def _cot_date(rec):
+    for dk in ["date", "report_date", "as_of_date", "week_ending", "week"]:
+        try:
+            dt = pd.to_datetime(rec.get(dk, ""))
+            if pd.notna(dt): return dt
+        except (ValueError, TypeError):
+            pass
+    return None
+
+
+def old_cot_monthly(report):
+    """mm_net mensal (ultimo report do mes) pelo parse registro a registro."""
+    rows = []
+    for rec in report["history"] + [report["latest"]]:
+        dt, mm = _cot_date(rec), _extract_mm_cot(rec)
+        if dt is not None and not np.isnan(mm):
+            rows.append((dt, mm))
+    s = pd.Series(dict(rows)).sort_index()
+    s = s.groupby(s.index.to_period("M")).last()
+    s.index = s.index.to_timestamp()
+    return s
+
+
+# ── fixture ──
+
+def synthetic_sources(seed=7):
+    rng = np.random.default_rng(seed)
+    months = pd.date_range(START, END, freq="MS")
+    prices = {}
+    for name, base in BASE_PRICES.items():
+        path = base * np.exp(np.cumsum(rng.normal(0, 0.04, len(months))))
+        prices[name] = [[d.strftime("%Y-%m-%d"), float(v)] for d, v in zip(months, path)]
+    # COP com anos e culturas faltando (testa o fallback para o ano anterior)
+    ers_cop = {}
+    for y in range(1996, 2025):
+        if y in (2003, 2011):
+            continue
+        vals = [round(float(v), 2) for v in rng.uniform([3, 8, 4], [5, 12, 7])]
+        if y % 5 == 0:
+            vals[1] = None
+        ers_cop[str(y)] = vals
+    return {"prices": prices, "ers_cop": ers_cop, "bdi": None, "basis_gulf": None, "fas_exports": None}
+
+
+def synthetic_cot(seed=11):
+    """Reports semanais com formatos mistos: net direto, long/short, string com virgula, chaves de data."""
+    rng = np.random.default_rng(seed)
+    weeks = pd.date_range("2015-01-06", "2025-12-30", freq="W-TUE")
+    comms = {}
+    for ticker in ("ZC", "ZS", "ZW"):
+        history = []
+        for i, d in enumerate(weeks):
+            net = int(rng.integers(-200_000, 300_000))
+            if i % 3 == 0:
+                rec = {"date": d.strftime("%Y-%m-%d"), "managed_money_net": net}
+            elif i % 3 == 1:
+                rec = {"report_date": d.strftime("%Y-%m-%d"),
+                       "managed_money_long": f"{net + 400_000:,}", "managed_money_short": "400,000"}
+            else:
+                rec = {"as_of_date": d.strftime("%Y-%m-%d"), "mm_long": net + 50_000, "mm_short": 50_000}
+            history.append(rec)
+        latest = history.pop()
+        comms[ticker] = {"disaggregated": {"latest": latest, "history": history}}
+    return {"commodities": comms}
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Engine isolado: PROCESSED_DIR temporario so com o cot.json sintetico, sem log."""
+    cot = synthetic_cot()
+    (tmp_path / "cot.json").write_text(json.dumps(cot), encoding="utf-8")
+    monkeypatch.setattr(gre, "PROCESSED_DIR", tmp_path)
+    return cot
+
+
+# ── testes ──
+
+def test_feature_frame_matches_row_wise(engine):
+    sources = synthetic_sources()
+    df, meta = gre.build_feature_frame(sources, quiet=True)
+    assert len(df) == len(pd.date_range(START, END, freq="MS"))
+
+    np.testing.assert_allclose(df["crush_spread"].to_numpy(float), old_crush(df).to_numpy(float))
+
+    for col, ref in old_cop(df, sources["ers_cop"]).items():
+        np.testing.assert_allclose(df[col].to_numpy(float), ref, equal_nan=True, err_msg=col)
+
+    for grain, ticker in [("corn", "ZC"), ("soy", "ZS"), ("wheat", "ZW")]:
+        ref = old_cot_monthly(engine["commodities"][ticker]["disaggregated"])
+        got = df[f"{grain}_mm_net"]
+        np.testing.assert_allclose(got.to_numpy(float), ref.reindex(df.index).to_numpy(float),
+                                   equal_nan=True, err_msg=grain)
+        assert meta["current_cot"][grain]["mm_net"] == round(float(ref.iloc[-1]), 0)
+
+
+def test_feature_frame_budget(engine):
+    sources = synthetic_sources()
+    weekly = {}
+    for name, rows in sources["prices"].items():
+        s = pd.Series({pd.Timestamp(d): v for d, v in rows}).sort_index().resample("W-FRI").ffill()
+        weekly[name] = [[d.strftime("%Y-%m-%d"), float(v)] for d, v in s.dropna().items()]
+
+    gre.build_feature_frame(sources, quiet=True)      # aquece imports/caches do pandas
+    for label, srcs in [("mensal", sources), ("semanal", {**sources, "prices": weekly})]:
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            gre.build_feature_frame(srcs, quiet=True)
+            best = min(best, (time.perf_counter() - t0) * 1000)
+        assert best <= gre.FEATURE_BUDGET_MS, f"{label}: {best:.0f}ms > {gre.FEATURE_BUDGET_MS}ms"
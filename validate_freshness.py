@@ -1,87 +1,70 @@
 ﻿import json
 import os
-from datetime import datetime, timezone
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline"))
+from collector_schedule import RULES
+from freshness_manifest import age_hours, entry, refresh
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "agrimacro-dash", "public", "data", "processed")
 
-# Limites de frescor por fonte (em horas)
+# Limites de frescor por fonte (em horas). A data de origem de cada arquivo
+# vem do freshness manifest (source_ts: updated_at, _meta, report_date, ...)
 FRESHNESS_LIMITS = {
-    "futures_contracts.json":   {"max_hours": 24,   "fields": ["updated_at", "timestamp"]},
-    "cot.json":                 {"max_hours": 120,  "fields": ["updated_at", "report_date"]},
-    "psd_ending_stocks.json":   {"max_hours": 720,  "fields": ["updated_at"]},
-    "spreads.json":             {"max_hours": 24,   "fields": ["updated_at", "timestamp"]},
-    "seasonality.json":         {"max_hours": 168,  "fields": ["updated_at"]},
-    "physical_br.json":         {"max_hours": 48,   "fields": ["updated_at", "date"]},
-    "physical_intl.json":       {"max_hours": 48,   "fields": ["updated_at", "date"]},
-    "bcb_data.json":            {"max_hours": 48,   "fields": ["updated_at"]},
-    "ibge_data.json":           {"max_hours": 720,  "fields": ["updated_at"]},
-    "eia_data.json":            {"max_hours": 96,   "fields": ["updated_at", "date"]},
-    "conab_data.json":          {"max_hours": 720,  "fields": ["updated_at"]},
-    "nasa_power.json":          {"max_hours": 48,   "fields": ["updated_at"]},
-    "news.json":                {"max_hours": 24,   "fields": ["updated_at", "generated_at"]},
-    "cross_signals.json":       {"max_hours": 24,   "fields": ["updated_at"]},
-    "ibkr_portfolio.json":      {"max_hours": 4,    "fields": ["updated_at", "timestamp"]},
-    "price_history.json":       {"max_hours": 24,   "fields": ["updated_at"]},
-    "daily_reading.json":       {"max_hours": 24,   "fields": ["updated_at", "generated_at"]},
-    "weather_agro.json":        {"max_hours": 48,   "fields": ["updated_at"]},
-    "calendar.json":            {"max_hours": 168,  "fields": ["updated_at"]},
-    "usda_fas.json":            {"max_hours": 168,  "fields": ["updated_at"]},
+    "futures_contracts.json":   {"max_hours": 24},
+    "cot.json":                 {"max_hours": 120},
+    "psd_ending_stocks.json":   {"max_hours": 720},
+    "spreads.json":             {"max_hours": 24},
+    "seasonality.json":         {"max_hours": 168},
+    "physical_br.json":         {"max_hours": 48},
+    "physical_intl.json":       {"max_hours": 48},
+    "bcb_data.json":            {"max_hours": 48},
+    "ibge_data.json":           {"max_hours": 720},
+    "eia_data.json":            {"max_hours": 96},
+    "conab_data.json":          {"max_hours": 720},
+    "nasa_power.json":          {"max_hours": 48},
+    "news.json":                {"max_hours": 24},
+    "cross_signals.json":       {"max_hours": 24},
+    "ibkr_portfolio.json":      {"max_hours": 4},
+    "price_history.json":       {"max_hours": 24},
+    "daily_reading.json":       {"max_hours": 24},
+    "weather_agro.json":        {"max_hours": 48},
+    "calendar.json":            {"max_hours": 168},
+    "usda_fas.json":            {"max_hours": 168},
+}
+
+# Artefatos que o collector_schedule so recoleta no proximo release: o limite
+# vem do max_age_h da regra (nunca menor), para os dois nao divergirem.
+# Alem do artifact da regra, outros arquivos gravados pelo mesmo collector.
+SCHEDULED = {
+    **{r["artifact"].split("/", 1)[1]: name for name, r in RULES.items() if r["artifact"].startswith("processed/")},
+    "cot.json": "cot",
+    "psd_ending_stocks.json": "usda_fas",
 }
+for _fname, _rule in SCHEDULED.items():
+    if _fname in FRESHNESS_LIMITS:
+        FRESHNESS_LIMITS[_fname]["max_hours"] = max(FRESHNESS_LIMITS[_fname]["max_hours"], RULES[_rule]["max_age_h"])
 
 STATUS_OK    = "✅"
 STATUS_WARN  = "⚠️ "
 STATUS_ERROR = "🔴"
 STATUS_INVAL = "🔴🔴"
 
-def parse_date(value):
-    if not value:
-        return None
-    for fmt in [
-        "%Y-%m-%dT%H:%M:%S.%fZ",
-        "%Y-%m-%dT%H:%M:%SZ",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d",
-    ]:
-        try:
-            dt = datetime.strptime(str(value)[:26], fmt)
-            return dt.replace(tzinfo=timezone.utc)
-        except:
-            continue
-    return None
-
-def check_file(filename, config):
-    path = os.path.join(DATA_PATH, filename)
-    if not os.path.exists(path):
+def check_file(filename, config, manifest=None):
+    key = f"processed/{filename}"
+    e = entry(key, manifest if manifest is not None else refresh([key]))
+    if e is None:
         return {"file": filename, "status": STATUS_ERROR, "message": "ARQUIVO NAO ENCONTRADO", "hours_old": None}
     
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        return {"file": filename, "status": STATUS_INVAL, "message": f"JSON INVALIDO: {e}", "hours_old": None}
+    if e.get("error"):
+        return {"file": filename, "status": STATUS_INVAL, "message": f"JSON INVALIDO: {e['error']}", "hours_old": None}
     
-    date_value = None
-    for field in config["fields"]:
-        val = data.get(field)
-        if val:
-            date_value = parse_date(val)
-            if date_value:
-                break
-        # tenta dentro de _meta
-        meta = data.get("_meta", {})
-        if isinstance(meta, dict):
-            val = meta.get(field)
-            if val:
-                date_value = parse_date(val)
-                if date_value:
-                    break
-
+    date_value = e.get("source_ts")
     if not date_value:
         return {"file": filename, "status": STATUS_WARN, "message": "DATA NAO ENCONTRADA NO JSON", "hours_old": None}
     
-    now = datetime.now(timezone.utc)
-    hours_old = (now - date_value).total_seconds() / 3600
+    hours_old = age_hours(e, field="source_ts")
     max_h = config["max_hours"]
     
     if hours_old > max_h * 3:
@@ -107,8 +90,9 @@ def main():
     print(f"{'='*65}\n")
     
     results = []
+    manifest = refresh([f"processed/{filename}" for filename in FRESHNESS_LIMITS])
     for filename, config in FRESHNESS_LIMITS.items():
-        result = check_file(filename, config)
+        result = check_file(filename, config, manifest)
         results.append(result)
     
     # Separar por status